@@ -93,6 +93,8 @@ with tab1.query() as q:
 name = "doctable"
 
 from .connectcore import ConnectCore, TableAlreadyExistsError, TableDoesNotExistError
+from .reflectcache import ReflectionCache
+from .locking import LockSettings, LockStats
 from .query import *
 from .schema import *
 from .dbtable import *
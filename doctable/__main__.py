@@ -3,6 +3,7 @@ import click
 import inspect
 
 from .connectcore import ConnectCore
+from .schema import FileTypeControl
 from .dbtable import ReflectedDBTable
 from .exposed import f, exp
 
@@ -33,6 +34,8 @@ def greet():
 @click.option('-d', '--dialect', default='sqlite')
 @click.option('--docs', is_flag=True, default=False)
 @click.option('-t', '--table', default=None)
+@click.option('-c', '--cache', default=None, help='File used to cache reflected tables between calls (sqlite only).')
+@click.option('--lazy', is_flag=True, default=False, help='Only reflect the table passed to --table instead of all tables (c.metadata.tables then holds just that table).')
 @click.argument('expression')
 def execute(**kwargs) -> None:
     
@@ -40,9 +43,11 @@ def execute(**kwargs) -> None:
     
     locals['c'] = ConnectCore.open(
         target=kwargs['target'], 
-        dialect=kwargs['dialect']
+        dialect=kwargs['dialect'],
+        reflection_cache_path=kwargs['cache'],
     )
-    locals['c'].metadata_reflect()
+    if not kwargs['lazy']:
+        locals['c'].metadata_reflect()
     
     if kwargs['table'] is not None:
         locals['t'] = ReflectedDBTable.from_existing_table(
@@ -58,6 +63,20 @@ def execute(**kwargs) -> None:
     exec(f'print({exp_string})', {}, locals)    
 
 
+@greet.command(help='Move files stored by a file column type at PATH into a sharded folder layout (use --shard-levels 0 for flat).')
+@click.argument('path')
+@click.option('-l', '--shard-levels', default=2, type=int)
+@click.option('-w', '--shard-width', default=2, type=int)
+def migrate_files(**kwargs) -> None:
+    control = FileTypeControl(
+        path=kwargs['path'],
+        shard_levels=kwargs['shard_levels'],
+        shard_width=kwargs['shard_width'],
+    )
+    moved = control.migrate_layout()
+    print(f'moved {moved} files')
+
+
 if __name__ == '__main__':
     greet()
     
\ No newline at end of file
@@ -2,6 +2,8 @@ from __future__ import annotations
 import typing
 import dataclasses
 import os
+import re
+import hashlib
 import sqlalchemy
 import sqlalchemy.exc
 
@@ -9,6 +11,30 @@ import functools
 
 from .dbtable import DDLEmitter
 from .query import ConnectQuery
+from .reflectcache import ReflectionCache
+from .locking import LockSettings, LockStats, install_lock_handling
+
+# one round-trip for all column and index info (ordered so index columns are grouped)
+BULK_SCHEMA_QUERY = '''
+SELECT m.name, 'column', '', c.cid, c.name, c.type, c."notnull", c.dflt_value, c.pk, NULL, NULL
+FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS c
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+UNION ALL
+SELECT m.name, 'index', l.name, i.seqno, l.name, i.name, NULL, NULL, NULL, l."unique", l.partial
+FROM sqlite_master AS m JOIN pragma_index_list(m.name) AS l JOIN pragma_index_info(l.name) AS i
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND l.origin = 'c'
+ORDER BY 1, 2, 3, 4
+'''
+
+# schema version and the definitions of all schema entries, in one round-trip
+SCHEMA_FINGERPRINT_QUERY = '''
+SELECT (SELECT schema_version FROM pragma_schema_version), 
+    (SELECT group_concat(type || ' ' || name || ' ' || coalesce(sql, ''), char(10)) 
+    FROM (SELECT type, name, sql FROM sqlite_master ORDER BY type, name))
+'''
+
+# statements after which cached inspection results may be out of date
+SCHEMA_CHANGE_PATTERN = re.compile(r'^\s*(CREATE|DROP|ALTER|ANALYZE|ATTACH|DETACH|VACUUM|REINDEX)\b', re.IGNORECASE)
 
 class TableAlreadyExistsError(Exception):
     pass
@@ -25,6 +51,15 @@ class ConnectCore:
     dialect: str
     engine: sqlalchemy.engine.Engine
     metadata: sqlalchemy.MetaData
+    reflection_cache_path: typing.Optional[str] = None # sqlite only: file used to cache reflected tables
+    lock_settings: LockSettings = dataclasses.field(default_factory=LockSettings)
+    lock_stats: LockStats = dataclasses.field(default_factory=LockStats)
+    attached: typing.Dict[str, str] = dataclasses.field(default_factory=dict) # sqlite only: schema alias -> database file
+    _reflection_cache: typing.Optional[ReflectionCache] = dataclasses.field(default=None, init=False, repr=False)
+    _inspector: typing.Optional[sqlalchemy.engine.Inspector] = dataclasses.field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        sqlalchemy.event.listen(self.engine, 'after_cursor_execute', self._clear_inspector_on_ddl)
 
     ################# Init #################
     @classmethod
@@ -40,14 +75,33 @@ class ConnectCore:
         return cls.open(target=target, dialect=dialect, echo=echo, **engine_kwargs)
     
     @classmethod
-    def open(cls, target: str, dialect: str, echo: bool = False, **engine_kwargs) -> ConnectCore:
-        '''Connect to a database, creating it if it doesn't exist (in the case of sqlite).'''
+    def open(cls, 
+        target: str, 
+        dialect: str, 
+        echo: bool = False, 
+        reflection_cache_path: typing.Optional[str] = None, 
+        lock_settings: typing.Optional[LockSettings] = None,
+        **engine_kwargs
+    ) -> ConnectCore:
+        '''Connect to a database, creating it if it doesn't exist (in the case of sqlite).
+            Provide reflection_cache_path to cache reflected tables on disk (sqlite files only).
+            Provide lock_settings to configure busy timeout, BEGIN IMMEDIATE, and retries (sqlite only).
+        '''
+        if reflection_cache_path is not None and (not dialect.startswith('sqlite') or target == ':memory:'):
+            raise ValueError('The reflection cache can only be used with sqlite database files.')
         engine, meta = cls.new_sqlalchemy_engine(target=target, dialect=dialect, echo=echo, **engine_kwargs)
+        
+        lock_settings = lock_settings if lock_settings is not None else LockSettings()
+        if dialect.startswith('sqlite'):
+            install_lock_handling(engine, lock_settings)
+        
         return cls(
             target=target,
             dialect=dialect,
             engine=engine,
             metadata=meta,
+            reflection_cache_path=reflection_cache_path,
+            lock_settings=lock_settings,
         )
         
     @staticmethod
@@ -72,7 +126,52 @@ class ConnectCore:
         
     def query(self) -> ConnectQuery:
         '''Create a connection and interface that can be used to make queries.'''
-        return ConnectQuery(self.engine.connect())
+        return ConnectQuery(
+            conn=self.engine.connect(),
+            lock_settings=self.lock_settings,
+            lock_stats=self.lock_stats,
+        )
+
+    ################# Attached Databases #################
+    def attach(self, target: str, alias: str) -> None:
+        '''Attach another sqlite database file under a schema alias (sqlite only).
+            Tables in the attached database can be addressed by passing schema=alias 
+            when creating or reflecting tables, so joins and INSERT ... SELECT 
+            statements can run across database files. Connections already checked 
+            out (e.g. by an open ConnectQuery) will not see the new database.
+        '''
+        if not self.dialect.startswith('sqlite'):
+            raise ValueError('Only sqlite databases can be attached.')
+        if not alias.isidentifier() or alias.lower() in ('main', 'temp'):
+            raise ValueError(f'"{alias}" is not a valid schema alias.')
+        if alias in self.attached:
+            raise ValueError(f'A database is already attached as "{alias}".')
+        
+        if not self.attached:
+            sqlalchemy.event.listen(self.engine, 'checkout', self._sync_attached)
+        self.attached[alias] = target if target == ':memory:' else os.path.abspath(target)
+        self.clear_inspector_cache()
+    
+    def detach(self, alias: str) -> None:
+        '''Detach a database that was attached with attach().'''
+        try:
+            del self.attached[alias]
+        except KeyError as e:
+            raise KeyError(f'No database is attached as "{alias}".') from e
+        self.clear_inspector_cache()
+    
+    def _sync_attached(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        '''Attach or detach databases on pooled connections as they are checked out.'''
+        current = connection_record.info.setdefault('doctable_attached', dict())
+        cursor = dbapi_connection.cursor()
+        for alias in [a for a in current if self.attached.get(a) != current[a]]:
+            cursor.execute(f'DETACH DATABASE "{alias}"')
+            del current[alias]
+        for alias, target in self.attached.items():
+            if alias not in current:
+                cursor.execute(f'ATTACH DATABASE ? AS "{alias}"', (target,))
+                current[alias] = target
+        cursor.close()
 
     ################# Tables #################
     # NOTE: TODO
@@ -107,13 +206,24 @@ class ConnectCore:
     def reflect_sqlalchemy_table(self, table_name: str, **kwargs) -> sqlalchemy.Table:
         '''Reflect a table that already exists in the database.
             Note: if table already exists as part of the metadata, it will return that table instance.
+            If a reflection cache is configured, the table is rebuilt from the cache when possible.
         '''
-        return self._sqlalchemy_table(table_name, [], autoload_with=self.engine, **kwargs)
-        #try:
-        #    return sqlalchemy.Table(table_name, self.metadata, autoload_with=self.engine, **kwargs)
-        #except sqlalchemy.exc.NoSuchTableError as e:
-        #    raise TableDoesNotExistError(f'The table {table_name} does not exist. '
-        #        'To create a new table, use sqlalchemy_table().') from e
+        if self.reflection_cache_path is None or table_name in self.metadata.tables or kwargs:
+            return self._sqlalchemy_table(table_name, [], autoload_with=self.engine, **kwargs)
+
+        with self.engine.connect() as conn:
+            cache = self.reflection_cache(conn)
+            table = cache.get_table(table_name, self.metadata)
+            if table is None:
+                try:
+                    cache.reflect_table(table_name, conn)
+                except sqlalchemy.exc.NoSuchTableError as nste:
+                    raise TableDoesNotExistError(f'The table {table_name} does not exist. '
+                        'To create a new table, use create_sqlalchemy_table().') from nste
+                cache.save()
+                table = cache.get_table(table_name, self.metadata)
+        self._bind_column_methods(table)
+        return table
             
     def _sqlalchemy_table(self, table_name: str, table_args: list[sqlalchemy.Column], **kwargs) -> sqlalchemy.Table:
         '''Base method for creating a new sqlalchemy table and handling exceptions that may be raised.'''
@@ -189,14 +299,65 @@ class ConnectCore:
     
     def metadata_reflect(self, **kwargs) -> None:
         ''' Will register all existing tables using metadata.reflect().
+            If a reflection cache is configured, tables are rebuilt from the cache when possible.
         '''
         #for tabname in self.list_tables():
         #    self.add_table(tabname, **kwargs)
-        return self.metadata.reflect(self.engine, **kwargs)
+        if self.reflection_cache_path is None or kwargs:
+            return self.metadata.reflect(self.engine, **kwargs)
+        
+        with self.engine.connect() as conn:
+            cache = self.reflection_cache(conn)
+            if not cache.complete:
+                cache.reflect_all(conn)
+                cache.save()
+        
+        for table_name in cache.table_names():
+            if table_name not in self.metadata.tables:
+                self._bind_column_methods(cache.get_table(table_name, self.metadata))
+    
+    def reflection_cache(self, conn: typing.Optional[sqlalchemy.engine.Connection] = None) -> typing.Optional[ReflectionCache]:
+        ''' Get the on-disk reflection cache, reloading it if the schema version changed.
+            Returns None if no reflection_cache_path was provided.
+            Args:
+                conn: connection used to read the schema fingerprint (a new one is opened if not provided).
+        '''
+        if self.reflection_cache_path is None:
+            return None
+        version, schema_hash = self.schema_fingerprint(conn)
+        cache = self._reflection_cache
+        if cache is None or cache.schema_version != version or cache.schema_hash != schema_hash:
+            self._reflection_cache = ReflectionCache.open(
+                path=self.reflection_cache_path,
+                db_key=os.path.abspath(self.target),
+                schema_version=version,
+                schema_hash=schema_hash,
+            )
+        return self._reflection_cache
+    
+    def schema_version(self, conn: typing.Optional[sqlalchemy.engine.Connection] = None) -> int:
+        ''' Get sqlite PRAGMA schema_version, which is incremented on every schema change.
+        '''
+        if conn is None:
+            with self.engine.connect() as conn:
+                return self.schema_version(conn)
+        return conn.exec_driver_sql('PRAGMA schema_version').scalar()
+
+    def schema_fingerprint(self, conn: typing.Optional[sqlalchemy.engine.Connection] = None) -> typing.Tuple[int, str]:
+        ''' Get sqlite PRAGMA schema_version and an md5 hash of the sql of all schema 
+            entries. The hash tells apart a database file that was rebuilt with a 
+            different schema but reached the same schema version.
+        '''
+        if conn is None:
+            with self.engine.connect() as conn:
+                return self.schema_fingerprint(conn)
+        version, schema_sql = conn.exec_driver_sql(SCHEMA_FINGERPRINT_QUERY).one()
+        return version, hashlib.md5((schema_sql or '').encode()).hexdigest()
     
     def create_all_tables(self) -> None:
         ''' Create all tables in metadata. Must be used when creating new tables!!
         '''
+        self.clear_inspector_cache()
         return self.metadata.create_all(self.engine)
 
     ################# Inspection methods #################
@@ -223,11 +384,60 @@ class ConnectCore:
         '''Provide a list of table names by wrapping Inspector.get_table_names(tabname).'''
         return self.inspector().get_table_names()
     
+    def inspect_schema_bulk(self) -> typing.Dict[str, typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]]:
+        '''Get column and index info for all tables in a single round-trip (sqlite only).
+            Reads sqlite_master joined with the pragma table-valued functions. Column 
+            types are returned as the declared type strings rather than sqlalchemy types.
+            Returns {table_name: {'columns': [...], 'indices': [...]}}.
+        '''
+        if not self.dialect.startswith('sqlite'):
+            raise NotImplementedError('Bulk schema inspection is only supported for sqlite. '
+                'Use inspect_columns_all() and inspect_indices_all() instead.')
+        
+        schema = dict()
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(BULK_SCHEMA_QUERY).all()
+        
+        for table_name, kind, _, _, name, coltype, notnull, default, pk, unique, partial in rows:
+            info = schema.setdefault(table_name, {'columns': list(), 'indices': list()})
+            if kind == 'column':
+                info['columns'].append({
+                    'name': name,
+                    'type': coltype,
+                    'nullable': not notnull,
+                    'default': default,
+                    'primary_key': pk,
+                })
+            elif kind == 'index':
+                if not info['indices'] or info['indices'][-1]['name'] != name:
+                    info['indices'].append({
+                        'name': name,
+                        'column_names': list(),
+                        'unique': bool(unique),
+                        'partial': bool(partial),
+                    })
+                if coltype is not None: # expression index columns have no name
+                    info['indices'][-1]['column_names'].append(coltype)
+        return schema
+    
     def inspector(self) -> sqlalchemy.engine.Inspector:
-        '''Get engine for this inspector.
+        '''Get cached inspector for this engine. The inspector caches results, so 
+            it is cleared whenever a schema-changing statement runs through this 
+            engine. Call clear_inspector_cache() after the schema is changed by 
+            another engine or process.
         https://docs.sqlalchemy.org/en/14/core/reflection.html#sqlalchemy.engine.reflection.Inspector
         '''
-        return sqlalchemy.inspect(self.engine)
+        if self._inspector is None:
+            self._inspector = sqlalchemy.inspect(self.engine)
+        return self._inspector
+    
+    def clear_inspector_cache(self) -> None:
+        '''Discard the cached inspector so the next inspection reads the database.'''
+        self._inspector = None
+
+    def _clear_inspector_on_ddl(self, conn, cursor, statement: str, parameters, context, executemany: bool) -> None:
+        if SCHEMA_CHANGE_PATTERN.match(statement):
+            self._inspector = None
 
     ################# Low-level execution methods #################
     def enable_foreign_keys(self) -> sqlalchemy.engine.ResultProxy:
@@ -236,6 +446,7 @@ class ConnectCore:
     def execute(self, query: str, *args, **kwargs) -> sqlalchemy.engine.CursorResult:
         '''Execute query using a temporary connection.
         '''
+        self.clear_inspector_cache() # the query could change the schema
         with self.engine.begin() as conn:
             return conn.execute(sqlalchemy.text(query), *args, **kwargs)
 
@@ -3,3 +3,4 @@ from .dbtable import DBTable
 from .reflecteddbtable import ReflectedDBTable
 from .ddlemitter import DDLEmitter
 
+from .tablestats import TableStats, ColumnStats
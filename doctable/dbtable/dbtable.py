@@ -5,8 +5,6 @@ import typing
 import dataclasses
 import os
 import sqlalchemy
-import pandas as pd
-import copy
 
 from .dbtablebase import DBTableBase
 
@@ -14,6 +12,8 @@ if typing.TYPE_CHECKING:
     from ..connectcore import ConnectCore
 
 from ..schema import TableSchema, Container, get_schema
+from ..schema.column.column_types.zstd_dict_types import ZstdDictTypeBase
+from ..schema.column.column_types.categorical_types import Categorical
 from ..query import TableQuery
 
 @dataclasses.dataclass
@@ -27,8 +27,13 @@ class DBTable(DBTableBase, typing.Generic[Container]):
         core: ConnectCore, 
         **kwargs
     ) -> DBTable[Container]:
-        '''Create new table.'''
-        schema = get_schema(copy.deepcopy(container_type))
+        '''Create new table, or connect to the table already built from this 
+            schema in the core's metadata.
+        '''
+        schema = get_schema(container_type)
+        table = schema.cached_table(core.metadata) if not len(kwargs) else None
+        if table is not None:
+            return cls(schema=schema, table=table, core=core)
         return cls.from_schema(schema, core, core.extend_sqlalchemy_table, **kwargs)
         
     @classmethod
@@ -38,7 +43,7 @@ class DBTable(DBTableBase, typing.Generic[Container]):
         **kwargs
     ) -> DBTable[Container]:
         '''Create new table.'''
-        schema = get_schema(copy.deepcopy(container_type))
+        schema = get_schema(container_type)
         return cls.from_schema(schema, core, core.create_sqlalchemy_table, **kwargs)
         
     @classmethod
@@ -52,9 +57,23 @@ class DBTable(DBTableBase, typing.Generic[Container]):
             make_table_func is either core.create_sqlalchemy_table or core.extend_sqlalchemy_table
         '''
         name, args, table_kwargs = schema.sqlalchemy_table_args(**kwargs)
+        table = make_table_func(name, args, **table_kwargs)
+        if schema.fts is not None:
+            try:
+                schema.fts.attach(table)
+            except (KeyError, ValueError):
+                core.metadata.remove(table) # so it is not created without its index
+                raise
+        schema.cache_table(core.metadata, table)
+        
+        # dictionary-compressed and categorical columns load their dictionaries from this database
+        for col in table.columns:
+            if isinstance(col.type, (ZstdDictTypeBase, Categorical)):
+                col.type.control.bind(core.engine)
+        
         return cls(
             schema = schema,
-            table = make_table_func(name, args, **table_kwargs),
+            table = table,
             core=core,
         )
         
@@ -62,3 +81,16 @@ class DBTable(DBTableBase, typing.Generic[Container]):
     def query(self) -> TableQuery:
         '''Return a TableQuery object for querying this table.'''
         return TableQuery.from_dbtable(self)
+
+    ############################ Full-Text Search ############################
+    def rebuild_fts(self) -> None:
+        '''Create the full-text search table and triggers if they do not exist 
+            (e.g. fts was added to an existing table) and reindex all rows.
+        '''
+        if self.schema.fts is None:
+            raise ValueError(f'{self.name} has no full-text search index. Use table_schema(fts=...).')
+        fts = self.schema.fts
+        with self.core.begin() as conn:
+            for statement in fts.ddl(self.name, fts.rowid_column(self.table).name):
+                conn.execute(sqlalchemy.text(statement))
+            conn.execute(sqlalchemy.text(fts.rebuild_statement(self.name)))
@@ -1,6 +1,8 @@
 
 import typing
 import dataclasses
+import heapq
+import itertools
 from typing import Any
 
 #if typing.TYPE_CHECKING:
@@ -9,6 +11,7 @@ import sqlalchemy
 
 if typing.TYPE_CHECKING:
     from ..connectcore import ConnectCore
+    from .tablestats import TableStats
 
 @dataclasses.dataclass
 class DBTableBase:
@@ -66,4 +69,202 @@ class DBTableBase:
     def name(self) -> str:
         return self.table.name
 
+    ################# Statistics #################
+    def analyze(self, optimize: bool = True) -> None:
+        '''Collect planner statistics for this table and its indices (ANALYZE), 
+            which SQLite stores in sqlite_stat1 and uses to choose between indices.
+            On SQLite, also runs PRAGMA optimize when optimize=True.
+        '''
+        with self.core.begin() as conn:
+            name = conn.dialect.identifier_preparer.format_table(self.table)
+            if conn.dialect.name == 'mysql':
+                conn.exec_driver_sql(f'ANALYZE TABLE {name}')
+            else:
+                conn.exec_driver_sql(f'ANALYZE {name}')
+            if optimize and conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('PRAGMA optimize')
+
+    def stats(self, sample_size: int = 10000, seed: typing.Optional[int] = None) -> 'TableStats':
+        '''Per-column counts, null fractions, min/max and stored bytes from a 
+            single aggregate scan, and distinct counts estimated from a random 
+            sample of sample_size rows (exact when the table fits in the sample).
+            Use TableStats.chunksize() to pick a chunksize for select_chunks.
+        '''
+        from .tablestats import collect_stats
+        with self.core.connect() as conn:
+            return collect_stats(self.table, conn, sample_size=sample_size, seed=seed)
+
+    ################# File Column Maintenance #################
+    def gc_file_columns(self, dry_run: bool = False, batch_size: int = 1000) -> typing.Dict[str, int]:
+        '''Delete files in the folders of this table's file columns that are no 
+            longer referenced by any row (left behind by deleted or updated rows).
+            Referenced names are streamed from the database in sorted order and 
+            merged with a sorted walk of each folder, so memory use stays bounded.
+            Columns that share a folder are collected together; folders must not 
+            be shared with other tables, and no other connection may write to 
+            them while this runs.
+        Args:
+            dry_run: only count orphaned files and their size without deleting them
+            batch_size: number of files deleted at a time (in parallel when workers > 1)
+        '''
+        from ..schema.column.column_types.file_types import FileTypeBase, unreferenced
+        controls = dict()
+        for col in self.table.columns:
+            if isinstance(col.type, FileTypeBase):
+                controls.setdefault(id(col.type.control), (col.type.control, list()))[1].append(col)
+
+        stats = {'orphaned': 0, 'reclaimed_bytes': 0}
+        with self.core.connect() as conn:
+            for control, cols in controls.values():
+                # sqlite sorts with temp files as needed, so results stream in bounded memory
+                streams = list()
+                for col in cols:
+                    raw_col = sqlalchemy.type_coerce(col, sqlalchemy.String)
+                    q = sqlalchemy.select(raw_col).where(raw_col != None).distinct().order_by(raw_col)
+                    streams.append(conn.execute(q).scalars())
+                
+                orphans = unreferenced(heapq.merge(*streams), control.iter_sorted_names())
+                while len(batch := list(itertools.islice(orphans, batch_size))):
+                    stats['orphaned'] += len(batch)
+                    stats['reclaimed_bytes'] += control.remove_files(batch, dry_run=dry_run)
+        return stats
+
+    ################# Dictionary Compression #################
+    def train_zstd_dict(self, 
+        column: typing.Union[str, sqlalchemy.Column], 
+        sample_size: int = 10000, 
+        dict_size: int = 2**16, 
+        recompress: bool = True,
+        batch_size: int = 1000,
+    ) -> typing.Dict[str, int]:
+        '''Train a new zstd dictionary for a dictionary-compressed column from a 
+            random sample of its values, and use it for values inserted from now on.
+            With recompress=True, existing values are then recompressed with the new
+            dictionary in batches of batch_size rows, each in its own transaction.
+        Args:
+            sample_size: number of values the dictionary is trained on
+            dict_size: maximum size of the dictionary in bytes
+        '''
+        from ..schema.column.column_types.zstd_dict_types import ZstdDictTypeBase
+        from .tablestats import sample_rows
+        col = self.table.c[column] if isinstance(column, str) else column
+        if not isinstance(col.type, ZstdDictTypeBase):
+            raise ValueError(f'Column {col.name} is not a zstd dictionary column type.')
+        pk_cols = list(self.table.primary_key.columns)
+        if recompress and len(pk_cols) != 1:
+            raise ValueError(f'Recompressing {self.name} requires a single-column primary key.')
+        control = col.type.control
+        
+        # read and write stored values as plain blobs to bypass the column type
+        raw_col = sqlalchemy.type_coerce(col, sqlalchemy.LargeBinary)
+        dialect = self.core.engine.dialect
+        with self.core.begin() as conn:
+            rows = sample_rows(self.table, conn, [raw_col], sample_size, where=raw_col != None)
+            samples = [control.decompress(r[0], dialect) for r in rows]
+            if not len(samples):
+                raise ValueError(f'Column {col.name} has no values to train a dictionary on.')
+            dict_id = control.train(samples, dict_size, conn)
+        control.set_current(dict_id, dialect)
+        
+        stats = {'dict_id': dict_id, 'recompressed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        if not recompress:
+            return stats
+        
+        # keyset scan over the primary key so every batch is an index range
+        pk = pk_cols[0]
+        stmt = (sqlalchemy.update(self.table)
+            .where(pk == sqlalchemy.bindparam('_pk'))
+            .values({col.name: sqlalchemy.bindparam('_value', type_=sqlalchemy.LargeBinary)}))
+        last_key = None
+        while True:
+            with self.core.begin() as conn:
+                q = sqlalchemy.select(pk, raw_col).where(raw_col != None)
+                if last_key is not None:
+                    q = q.where(pk > last_key)
+                rows = conn.execute(q.order_by(pk).limit(batch_size)).all()
+                if not len(rows):
+                    break
+                last_key = rows[-1][0]
+                
+                params = list()
+                for key, value in rows:
+                    if control.dict_id(value) != dict_id:
+                        new_value = control.compress(control.decompress(value, dialect), dialect)
+                        stats['bytes_before'] += len(value)
+                        stats['bytes_after'] += len(new_value)
+                        params.append({'_pk': key, '_value': new_value})
+                if len(params):
+                    conn.execute(stmt, params)
+                    stats['recompressed'] += len(params)
+        return stats
+
+    ################# Packed Column Maintenance #################
+    def compact_packed_column(self, column: typing.Union[str, sqlalchemy.Column], batch_size: int = 1000) -> typing.Dict[str, int]:
+        '''Rewrite values still referenced by a packed column into new segments and
+            delete the old segments, dropping space held by deleted or updated rows.
+            Rows are rewritten in batches of batch_size, and values with equal 
+            hashes are stored once. Other columns of this table that share the 
+            same store are compacted too; the store must not be shared with other 
+            tables, and no other connection may write to it while this runs.
+        '''
+        from ..schema.column.column_types.packed_types import PackedTypeBase, PackedRef
+        col = self.table.c[column] if isinstance(column, str) else column
+        if not isinstance(col.type, PackedTypeBase):
+            raise ValueError(f'Column {col.name} is not a packed column type.')
+        control = col.type.control
+        cols = [c for c in self.table.columns if isinstance(c.type, PackedTypeBase) and c.type.control is control]
+        pk_cols = list(self.table.primary_key.columns)
+        key = pk_cols[0] if len(pk_cols) == 1 else sqlalchemy.literal_column('rowid')
+
+        # read and write references as plain strings to bypass the packed type
+        raw_cols = [sqlalchemy.type_coerce(c, sqlalchemy.String) for c in cols]
+        stmt = (sqlalchemy.update(self.table)
+            .where(key == sqlalchemy.bindparam('_key'))
+            .values({c.name: sqlalchemy.bindparam(f'_{c.name}', type_=sqlalchemy.String) for c in cols}))
+        
+        # new references by hash of the value, kept in the database so memory stays bounded
+        copies = sqlalchemy.Table('_doctable_packed_copies', sqlalchemy.MetaData(),
+            sqlalchemy.Column('hash', sqlalchemy.String, primary_key=True),
+            sqlalchemy.Column('ref', sqlalchemy.String, nullable=False),
+            prefixes=['TEMPORARY'],
+        )
+
+        bytes_before = control.size_on_disk()
+        old_segments = control.start_segment()
+        with self.core.begin() as conn:
+            copies.create(conn)
+            
+            # keyset scan so every batch is an index range and every update a key lookup
+            last_key = None
+            while True:
+                q = sqlalchemy.select(key, *raw_cols).where(sqlalchemy.or_(*[rc != None for rc in raw_cols]))
+                if last_key is not None:
+                    q = q.where(key > last_key)
+                rows = conn.execute(q.order_by(key).limit(batch_size)).all()
+                if not len(rows):
+                    break
+                last_key = rows[-1][0]
+
+                refs = {r: PackedRef.from_str(r) for row in rows for r in row[1:] if r is not None}
+                hashes = list({ref.hash for ref in refs.values()})
+                new_refs = dict(conn.execute(sqlalchemy.select(copies.c.hash, copies.c.ref).where(copies.c.hash.in_(hashes))).all())
+                added = dict()
+                for ref in sorted(refs.values(), key=lambda r: (r.segment, r.offset)):
+                    if ref.hash not in new_refs:
+                        new_refs[ref.hash] = added[ref.hash] = control.copy(ref)
+                if len(added):
+                    conn.execute(sqlalchemy.insert(copies), [{'hash': h, 'ref': r} for h, r in added.items()])
+                
+                conn.execute(stmt, [
+                    {'_key': row[0], **{f'_{c.name}': new_refs[refs[r].hash] if r is not None else None for c, r in zip(cols, row[1:])}}
+                    for row in rows
+                ])
+            live_values = conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(copies)).scalar_one()
+            copies.drop(conn)
+        control.remove_segments(old_segments)
 
+        return {
+            'live_values': live_values,
+            'bytes_before': bytes_before,
+            'bytes_after': control.size_on_disk(),
+        }
@@ -41,10 +41,10 @@ class DDLEmitter:
         )
     
     def reflect_table(self, table_name: str, **kwargs) -> ReflectedDBTable:
-        '''Create a new table from a Schema class.'''
+        '''Reflect an existing table. Use schema=alias for tables in attached databases.'''
         return ReflectedDBTable.from_existing_table(
             table_name=table_name,
-            cc=self.core,
+            core=self.core,
             **kwargs
         )
         
@@ -4,7 +4,6 @@ import typing
 import dataclasses
 import os
 import sqlalchemy
-import pandas as pd
 from .dbtablebase import DBTableBase
 
 if typing.TYPE_CHECKING:
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import math
+import random
+import typing
+import sqlalchemy
+
+from ..schema.column.column_types.epoch_types import EpochDateTime, EpochDate
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# types whose stored values sort the same way as their python values
+ORDERED_TYPES = (
+    sqlalchemy.types.Integer, sqlalchemy.types.Float, sqlalchemy.types.Numeric, sqlalchemy.types.String,
+    sqlalchemy.types.Boolean, sqlalchemy.types.Date, sqlalchemy.types.DateTime,
+    sqlalchemy.types.Time, EpochDateTime, EpochDate,
+)
+ROWID_BATCH_SIZE = 500 # rowids per IN (...) lookup when sampling
+
+# largest integers stored in 1, 2, 3, 4 and 6 bytes by the sqlite record format (0 and 1 take no bytes)
+SQLITE_INT_SIZES = ((127, 1), (2**15 - 1, 2), (2**23 - 1, 3), (2**31 - 1, 4), (2**47 - 1, 6))
+
+@dataclasses.dataclass
+class ColumnStats:
+    '''Statistics of one column. min and max are only computed for types that
+        sort by value (numbers, strings, dates), and stored_bytes only on SQLite, 
+        where it is the total size of the values in the record format.
+    '''
+    name: str
+    count: int # non-null values
+    null_fraction: float
+    distinct: int
+    distinct_exact: bool
+    min: typing.Any = None
+    max: typing.Any = None
+    stored_bytes: typing.Optional[int] = None
+
+    def info_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'Column': self.name,
+            'Count': self.count,
+            'Null Fraction': self.null_fraction,
+            'Distinct': self.distinct if self.distinct_exact else f'~{self.distinct}',
+            'Min': self.min,
+            'Max': self.max,
+            'Stored Bytes': self.stored_bytes,
+        }
+
+
+@dataclasses.dataclass
+class TableStats:
+    '''Statistics of a table from one aggregate pass (counts, nulls, min/max,
+        stored bytes) plus a random row sample (distinct counts).
+    '''
+    table_name: str
+    row_count: int
+    sample_size: int
+    columns: typing.Dict[str, ColumnStats]
+    table_bytes: typing.Optional[int] = None # on-disk size from dbstat, if available
+    index_bytes: typing.Optional[int] = None
+
+    def __getitem__(self, column_name: str) -> ColumnStats:
+        return self.columns[column_name]
+
+    def column_info(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        return [cs.info_dict() for cs in self.columns.values()]
+
+    def column_info_df(self) -> pd.DataFrame:
+        import pandas as pd
+        return pd.DataFrame(self.column_info())
+
+    def avg_row_bytes(self) -> typing.Optional[float]:
+        '''Average bytes per row, from the on-disk size or else the stored column bytes.'''
+        if not self.row_count:
+            return None
+        if self.table_bytes is not None:
+            return self.table_bytes / self.row_count
+        sizes = [cs.stored_bytes for cs in self.columns.values()]
+        if any(s is None for s in sizes):
+            return None
+        return sum(sizes) / self.row_count
+
+    def chunksize(self, chunk_bytes: int = 2**24, default: int = 100) -> int:
+        '''Rows per chunk so that each chunk of select_chunks holds roughly
+            chunk_bytes of stored data.
+        '''
+        row_bytes = self.avg_row_bytes()
+        if not row_bytes:
+            return default
+        return max(1, int(chunk_bytes // row_bytes))
+
+
+def collect_stats(table: sqlalchemy.Table, conn: sqlalchemy.engine.Connection, sample_size: int = 10000, seed: typing.Optional[int] = None) -> TableStats:
+    '''Compute TableStats in one aggregate pass and one sample of at most sample_size rows.'''
+    is_sqlite = conn.dialect.name == 'sqlite'
+    cols = list(table.columns)
+    rowid_alias = sqlite_rowid_alias(table, conn.dialect) if is_sqlite else None
+
+    # counts, min/max and stored sizes of all columns in a single scan
+    aggregates = [sqlalchemy.func.count()]
+    for c in cols:
+        aggregates.append(sqlalchemy.func.count(c))
+        if isinstance(c.type, ORDERED_TYPES):
+            aggregates += [sqlalchemy.func.min(c), sqlalchemy.func.max(c)]
+        if is_sqlite and c is not rowid_alias:
+            aggregates.append(sqlalchemy.func.sum(sqlite_value_size(c)))
+    values = iter(conn.execute(sqlalchemy.select(*aggregates).select_from(table)).one())
+    row_count = next(values)
+    aggregated = dict()
+    for c in cols:
+        count = next(values)
+        lo, hi = (next(values), next(values)) if isinstance(c.type, ORDERED_TYPES) else (None, None)
+        if not is_sqlite:
+            stored = None
+        else: # the rowid alias is stored as NULL in the record
+            stored = (next(values) or 0) if c is not rowid_alias else 0
+        aggregated[c.name] = (count, lo, hi, stored)
+
+    # distinct values are counted on raw stored values of the sample
+    raw_cols = [sqlalchemy.type_coerce(c, sqlalchemy.types.NullType()).label(c.name) for c in cols]
+    sample = sample_rows(table, conn, raw_cols, sample_size, seed=seed, row_count=row_count)
+
+    columns = dict()
+    for i, c in enumerate(cols):
+        count, lo, hi, stored = aggregated[c.name]
+        counts = collections.Counter(row[i] for row in sample if row[i] is not None)
+        exact = len(sample) >= row_count
+        columns[c.name] = ColumnStats(
+            name=c.name,
+            count=count,
+            null_fraction=(row_count - count) / row_count if row_count else 0.0,
+            distinct=len(counts) if exact else estimate_distinct(counts, count),
+            distinct_exact=exact,
+            min=lo,
+            max=hi,
+            stored_bytes=stored,
+        )
+
+    table_bytes, index_bytes = disk_usage(table, conn) if is_sqlite else (None, None)
+    return TableStats(
+        table_name=table.name,
+        row_count=row_count,
+        sample_size=len(sample),
+        columns=columns,
+        table_bytes=table_bytes,
+        index_bytes=index_bytes,
+    )
+
+def sqlite_rowid_alias(table: sqlalchemy.Table, dialect: sqlalchemy.engine.Dialect) -> typing.Optional[sqlalchemy.Column]:
+    '''The INTEGER PRIMARY KEY column that aliases the rowid, if the table has one.'''
+    pk_cols = list(table.primary_key.columns)
+    if len(pk_cols) != 1 or not table.dialect_options['sqlite'].get('with_rowid', True):
+        return None
+    if pk_cols[0].type.compile(dialect=dialect).upper() != 'INTEGER':
+        return None
+    return pk_cols[0]
+
+def sqlite_value_size(col: sqlalchemy.Column) -> sqlalchemy.ColumnElement:
+    '''Bytes a value takes in an sqlite record (not counting its header byte): 
+        1 to 8 for integers by magnitude, 8 for reals, and the encoded length of 
+        text and blobs. An INTEGER PRIMARY KEY is stored as the rowid and 
+        takes no bytes in the record (see sqlite_rowid_alias).
+    '''
+    raw = sqlalchemy.type_coerce(col, sqlalchemy.types.NullType()) # compare stored values, not python values
+    int_size = sqlalchemy.case(
+        (raw.between(sqlalchemy.literal_column('0'), sqlalchemy.literal_column('1')), sqlalchemy.literal_column('0')),
+        *[(raw.between(sqlalchemy.literal_column(str(-n - 1)), sqlalchemy.literal_column(str(n))), sqlalchemy.literal_column(str(size))) 
+            for n, size in SQLITE_INT_SIZES],
+        else_=sqlalchemy.literal_column('8'),
+    )
+    return sqlalchemy.case(
+        (sqlalchemy.func.typeof(raw) == sqlalchemy.literal_column("'integer'"), int_size),
+        (sqlalchemy.func.typeof(raw) == sqlalchemy.literal_column("'real'"), sqlalchemy.literal_column('8')),
+        else_=sqlalchemy.func.coalesce(sqlalchemy.func.length(sqlalchemy.cast(raw, sqlalchemy.LargeBinary)), sqlalchemy.literal_column('0')),
+    )
+
+def sample_rows(table: sqlalchemy.Table, 
+    conn: sqlalchemy.engine.Connection, 
+    cols: typing.List, 
+    sample_size: int, 
+    seed: typing.Optional[int] = None,
+    row_count: typing.Optional[int] = None,
+    where: typing.Optional[sqlalchemy.ColumnElement] = None,
+) -> typing.List[sqlalchemy.Row]:
+    '''Random sample of at most sample_size rows (matching where, if given). 
+        On SQLite, rows are looked up by random rowids so the table is not 
+        scanned (gaps in the rowids or rows not matching where give smaller 
+        samples); elsewhere rows are ordered by random(). Provide row_count if 
+        it is known so small tables are read without sampling.
+    '''
+    q = sqlalchemy.select(*cols).select_from(table)
+    if where is not None:
+        q = q.where(where)
+    if row_count is not None and row_count <= sample_size:
+        return conn.execute(q).all()
+
+    if conn.dialect.name == 'sqlite':
+        rowid = sqlalchemy.literal_column('rowid')
+        try:
+            lo, hi = conn.execute(sqlalchemy.select(sqlalchemy.func.min(rowid), sqlalchemy.func.max(rowid)).select_from(table)).one()
+        except sqlalchemy.exc.OperationalError: # WITHOUT ROWID table
+            pass
+        else:
+            if lo is None:
+                return list()
+            if hi - lo + 1 <= sample_size:
+                return conn.execute(q).all()
+            rowids = sorted(random.Random(seed).sample(range(lo, hi + 1), sample_size))
+            rows = list()
+            for i in range(0, len(rowids), ROWID_BATCH_SIZE):
+                rows += conn.execute(q.where(rowid.in_(rowids[i:i + ROWID_BATCH_SIZE]))).all()
+            return rows
+
+    return conn.execute(q.order_by(sqlalchemy.func.random()).limit(sample_size)).all()
+
+def estimate_distinct(counts: typing.Mapping[typing.Any, int], count: int) -> int:
+    '''Guaranteed-error estimator (Charikar et al. 2000): values seen once in a
+        sample of n out of count values are scaled by sqrt(count/n), values seen
+        more often are counted once.
+    '''
+    n = sum(counts.values())
+    if not n:
+        return 0
+    once = sum(1 for v in counts.values() if v == 1)
+    estimate = math.sqrt(count / n) * once + (len(counts) - once)
+    return int(round(min(max(estimate, len(counts)), count)))
+
+def disk_usage(table: sqlalchemy.Table, conn: sqlalchemy.engine.Connection) -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+    '''Bytes used by the table and by its indices, from the dbstat virtual table.
+        Returns (None, None) if SQLite was built without dbstat.
+    '''
+    try:
+        rows = conn.exec_driver_sql(
+            'SELECT m.type, SUM(s.pgsize) FROM dbstat AS s '
+            'JOIN sqlite_master AS m ON s.name = m.name '
+            'WHERE m.tbl_name = ? GROUP BY m.type', (table.name,)
+        ).all()
+    except sqlalchemy.exc.OperationalError:
+        return None, None
+    sizes = dict(rows)
+    return sizes.get('table'), sizes.get('index', 0)
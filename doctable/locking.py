@@ -0,0 +1,115 @@
+from __future__ import annotations
+import typing
+import dataclasses
+import random
+import threading
+import time
+import sqlalchemy
+import sqlalchemy.exc
+
+T = typing.TypeVar('T')
+
+# key in Connection.info telling the begin event to emit BEGIN IMMEDIATE
+BEGIN_IMMEDIATE_KEY = '_doctable_begin_immediate'
+
+LOCK_ERROR_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+@dataclasses.dataclass
+class LockSettings:
+    '''Controls how sqlite lock contention between connections is handled.
+    Args:
+        busy_timeout: seconds sqlite waits for a lock before raising (None keeps the driver default)
+        begin_immediate: take the write lock when a write transaction begins instead of on first write
+        max_retries: number of times to retry idempotent statements that fail with a lock error 
+            (commits are not retried; the busy timeout applies to them)
+        backoff_base: maximum wait before the first retry; doubles with every retry
+        backoff_max: cap on the maximum wait between two retries
+    '''
+    busy_timeout: typing.Optional[float] = None
+    begin_immediate: bool = False
+    max_retries: int = 0
+    backoff_base: float = 0.05
+    backoff_max: float = 2.0
+
+    def backoff(self, attempt: int) -> float:
+        '''Seconds to wait before the given retry (full jitter exponential backoff).'''
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+@dataclasses.dataclass
+class LockStats:
+    '''Counters for lock contention, shared by all queries from one ConnectCore.'''
+    lock_errors: int = 0 # statements that failed with a lock error
+    retries: int = 0 # retries attempted after lock errors
+    failures: int = 0 # statements that still failed after all retries
+    wait_time: float = 0.0 # total seconds spent backing off between retries
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.lock_errors += 1
+            self.retries += 1
+            self.wait_time += seconds
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.lock_errors += 1
+            self.failures += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.lock_errors, self.retries, self.failures, self.wait_time = 0, 0, 0, 0.0
+
+    def as_dict(self) -> typing.Dict[str, typing.Union[int, float]]:
+        return {
+            'lock_errors': self.lock_errors,
+            'retries': self.retries,
+            'failures': self.failures,
+            'wait_time': self.wait_time,
+        }
+
+def is_lock_error(error: Exception) -> bool:
+    '''Check if an exception was raised because the database was locked.'''
+    if not isinstance(error, sqlalchemy.exc.OperationalError):
+        return False
+    message = str(error.orig).lower()
+    return any(m in message for m in LOCK_ERROR_MESSAGES)
+
+def run_with_retry(func: typing.Callable[[], T], settings: LockSettings, stats: LockStats, retry: bool = True) -> T:
+    '''Call func, retrying with jittered backoff while it fails with lock errors.'''
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except sqlalchemy.exc.OperationalError as e:
+            if not is_lock_error(e):
+                raise e
+            if not retry or attempt >= settings.max_retries:
+                stats.record_failure()
+                raise e
+
+            wait = settings.backoff(attempt)
+            stats.record_wait(wait)
+            time.sleep(wait)
+            attempt += 1
+
+def install_lock_handling(engine: sqlalchemy.engine.Engine, settings: LockSettings) -> None:
+    '''Register sqlite connection events that apply the busy timeout and transaction mode.'''
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        if settings.busy_timeout is not None:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'PRAGMA busy_timeout = {int(settings.busy_timeout * 1000)}')
+            cursor.close()
+        if settings.begin_immediate:
+            # disable pysqlite's own BEGIN so the begin event below controls it
+            dbapi_connection.isolation_level = None
+
+    if settings.begin_immediate:
+        @sqlalchemy.event.listens_for(engine, 'begin')
+        def on_begin(conn: sqlalchemy.engine.Connection):
+            if conn.info.get(BEGIN_IMMEDIATE_KEY, False):
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+                del conn.info[BEGIN_IMMEDIATE_KEY] # only after the lock was acquired
+            else:
+                conn.exec_driver_sql('BEGIN')
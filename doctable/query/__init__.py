@@ -2,4 +2,6 @@
 from .connectquery import *
 from .statementbuilder import *
 from .tablequery import *
+from .deferred import Deferred
+from .queryplan import QueryPlan, IndexAdvisor, IndexSuggestion, WorkloadLog
 
@@ -4,17 +4,23 @@ import dataclasses
 import typing
 import sqlalchemy
 import sqlalchemy.exc
-import pandas as pd
 
 from .statementbuilder import StatementBuilder
+from .queryplan import QueryPlan
+from ..locking import LockSettings, LockStats, run_with_retry, is_lock_error, BEGIN_IMMEDIATE_KEY
+from ..schema.column.column_types.file_types import write_file_columns
+from ..schema.column.column_types.categorical_types import Categorical, encode_category_columns
 
 if typing.TYPE_CHECKING:
+    import pandas as pd
     from ..dbtable import DBTable
 
 @dataclasses.dataclass
 class ConnectQuery:
     '''Query interface that is not associated with a particular db table.'''
     conn: sqlalchemy.engine.Connection
+    lock_settings: LockSettings = dataclasses.field(default_factory=LockSettings)
+    lock_stats: LockStats = dataclasses.field(default_factory=LockStats)
 
     #################### Context Manager ####################
     def __enter__(self) -> ConnectQuery:
@@ -25,7 +31,18 @@ class ConnectQuery:
         self.commit()
 
     def commit(self) -> None:
-        return self.conn.commit()
+        '''Commit the transaction. A COMMIT that fails with a lock error cannot 
+            be retried (SQLAlchemy invalidates the transaction), so the 
+            transaction is rolled back and the error raised. Set 
+            LockSettings.busy_timeout to let the commit wait for readers.
+        '''
+        try:
+            self.conn.commit()
+        except sqlalchemy.exc.OperationalError as e:
+            if is_lock_error(e):
+                self.lock_stats.record_failure()
+                self.conn.rollback()
+            raise e
 
     #################### Select Queries ####################
     def select_chunks(self, 
@@ -90,14 +107,21 @@ class ConnectQuery:
         )
         
         result = self.execute_statement(q, **kwargs)
-        result = self.bind_as_dataframe(result)
+        result = self.bind_as_dataframe(result, cols)
         return result
     
     @staticmethod
-    def bind_as_dataframe(result: sqlalchemy.CursorResult) -> sqlalchemy.CursorResult:
-        '''Bind a new method to the result that converts it to a dataframe.'''
+    def bind_as_dataframe(result: sqlalchemy.CursorResult, cols: typing.Optional[typing.List[sqlalchemy.Column]] = None) -> sqlalchemy.CursorResult:
+        '''Bind a new method to the result that converts it to a dataframe.
+            Categorical columns become pandas categoricals.
+        '''
         def as_dataframe() -> pd.DataFrame:
-            return pd.DataFrame(result.all())
+            import pandas as pd # imported here so pandas only loads when needed
+            df = pd.DataFrame(result.all())
+            for col in (cols if cols is not None else []):
+                if isinstance(getattr(col, 'type', None), Categorical) and col.name in df.columns:
+                    df[col.name] = pd.Categorical(df[col.name], categories=col.type.control.categories(result.context.dialect))
+            return df
         result.df = as_dataframe
         return result
         
@@ -110,10 +134,13 @@ class ConnectQuery:
         **kwargs
     ) -> sqlalchemy.engine.CursorResult:
         '''Insert multiple rows into the database using executemany-style 
-            parameter binding.
+            parameter binding. Files for file columns with workers > 1 are 
+            written concurrently before the statement is executed.
         '''
         if not self.is_sequence(data):
             raise TypeError('insert_multi accepts a sequence of rows to insert.')
+        data = write_file_columns(dtable.table, data)
+        data = encode_category_columns(dtable.table, data, self.conn)
         q = StatementBuilder.insert_query(dtable.table, ifnotunique=ifnotunique)
         return self.execute_statement(q, data, **kwargs)
 
@@ -128,12 +155,33 @@ class ConnectQuery:
             the single using .values instead of binding the data. To avoid 
             this cost, past a single-element list to insert_multi instead.
         '''
+        data, = encode_category_columns(dtable.table, [data], self.conn)
         q = StatementBuilder.insert_query(
             dtable.table, 
             ifnotunique=ifnotunique
         ).values(**data)
         return self.execute_statement(q, **kwargs)
 
+    def insert_from_select(self, 
+        dtable: DBTable,
+        select: sqlalchemy.sql.Select,
+        col_names: typing.Optional[typing.List[str]] = None,
+        ifnotunique: typing.Literal['FAIL', 'IGNORE', 'REPLACE'] = 'fail',
+        **kwargs
+    ) -> sqlalchemy.engine.CursorResult:
+        '''Insert the results of a select statement (INSERT ... SELECT) without 
+            passing rows through python. Selected columns are matched to col_names 
+            by position, which default to the names of the selected columns. 
+            Works across attached databases (see ConnectCore.attach).
+        '''
+        q = StatementBuilder.insert_from_select_query(
+            dtable.table, 
+            select=select, 
+            col_names=col_names, 
+            ifnotunique=ifnotunique,
+        )
+        return self.execute_statement(q, **kwargs)
+
     #################### Insert Queries ####################
     def update_single(self, 
         dtable: DBTable,
@@ -143,6 +191,7 @@ class ConnectQuery:
         **kwargs
     ) -> sqlalchemy.engine.CursorResult:
         '''Update row(s) using the .values() clause.'''
+        values, = encode_category_columns(dtable.table, [values], self.conn)
         q = StatementBuilder.update_query(
             table = dtable.table,
             where = where,
@@ -177,11 +226,14 @@ class ConnectQuery:
             ...         ],
             ...     )
         '''
+        if self.is_sequence(values):
+            values = encode_category_columns(dtable.table, values, self.conn)
+        else:
+            values, = encode_category_columns(dtable.table, [values], self.conn)
         q = StatementBuilder.update_query(
             table = dtable.table,
             where = where,
             wherestr = wherestr,
-            preserve_parameter_order = self.is_sequence(values),
         )
         return self.execute_statement(q, values, **kwargs)
 
@@ -205,19 +257,46 @@ class ConnectQuery:
         return self.execute_statement(q, **kwargs)
 
 
+    #################### Query Plans ####################
+    def explain(self, statement: sqlalchemy.sql.Select) -> QueryPlan:
+        '''Get the query plan of a statement (EXPLAIN QUERY PLAN, SQLite only).'''
+        return QueryPlan.from_statement(self.conn, statement)
+
     #################### Query Execution ####################
     def execute_statement(self, 
         query: typing.Union[sqlalchemy.sql.Insert, sqlalchemy.sql.Select, sqlalchemy.sql.Update, sqlalchemy.sql.Delete], 
         *args, 
+        retry: typing.Optional[bool] = None,
         **kwargs
     ) -> sqlalchemy.engine.CursorResult:
-        '''Execute a query using a query builder object.'''
-        return self.conn.execute(query, *args, **kwargs)
+        '''Execute a query using a query builder object.
+        Args:
+            retry: retry the statement if the database is locked (see lock_settings). 
+                Selects are retried by default; pass retry=True for other idempotent statements.
+        '''
+        if retry is None:
+            retry = isinstance(query, sqlalchemy.sql.Select)
+        
+        if self.lock_settings.begin_immediate and not self.conn.in_transaction():
+            if isinstance(query, (sqlalchemy.sql.Insert, sqlalchemy.sql.Update, sqlalchemy.sql.Delete)):
+                self.conn.info[BEGIN_IMMEDIATE_KEY] = True
+        
+        return run_with_retry(
+            lambda: self.conn.execute(query, *args, **kwargs), 
+            self.lock_settings, 
+            self.lock_stats, 
+            retry=retry,
+        )
     
-    def execute_sql(self, query_str: str, *args, **kwargs) -> sqlalchemy.engine.CursorResult:
-        '''Execute raw sql query.'''
+    def execute_sql(self, query_str: str, *args, retry: bool = False, **kwargs) -> sqlalchemy.engine.CursorResult:
+        '''Execute raw sql query. Use retry=True for idempotent queries to retry when the database is locked.'''
         query_str = ' '.join(query_str.split('\n'))
-        result = self.conn.execute(sqlalchemy.text(query_str), *args, **kwargs)
+        result = run_with_retry(
+            lambda: self.conn.execute(sqlalchemy.text(query_str), *args, **kwargs),
+            self.lock_settings,
+            self.lock_stats,
+            retry=retry,
+        )
         self.bind_as_dataframe(result)
         return result
 
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import sqlalchemy
+
+from ..schema.column.column_types.file_types import FileTypeBase
+
+if typing.TYPE_CHECKING:
+    from ..dbtable import DBTable
+
+_NOT_LOADED = object()
+LOAD_BATCH_SIZE = 500 # primary keys per IN (...) when loading deferred values
+
+class Deferred:
+    '''Placeholder for a selected column value that is loaded on first use.
+        Attribute access, indexing, iteration, len, comparison and str are passed
+        through to the loaded value; call load() to get the value itself. The 
+        placeholder is not an instance of the value's type, so isinstance checks 
+        and serializers such as json.dumps fail on it unless load() is called first.
+    '''
+    __slots__ = ('_loader', '_value')
+
+    def __init__(self, loader: typing.Callable[[], typing.Any]):
+        self._loader = loader
+        self._value = _NOT_LOADED
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not _NOT_LOADED
+
+    def load(self) -> typing.Any:
+        '''Load the value (only the first time) and return it.'''
+        if self._value is _NOT_LOADED:
+            self._value = self._loader()
+            self._loader = None
+        return self._value
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __getitem__(self, key: typing.Any) -> typing.Any:
+        return self.load()[key]
+
+    def __iter__(self) -> typing.Iterator:
+        return iter(self.load())
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    def __contains__(self, item: typing.Any) -> bool:
+        return item in self.load()
+
+    def __bool__(self) -> bool:
+        return bool(self.load())
+
+    def __eq__(self, other: typing.Any) -> bool:
+        return self.load() == (other.load() if isinstance(other, Deferred) else other)
+
+    __hash__ = None
+
+    def __str__(self) -> str:
+        return str(self.load())
+
+    def __repr__(self) -> str:
+        # does not load, so printing containers stays cheap
+        return f'Deferred({self._value!r})' if self.loaded else 'Deferred(<not loaded>)'
+
+
+@dataclasses.dataclass
+class DeferredColumns:
+    '''Columns that are selected as cheap placeholders and loaded on first use.
+        File columns select only the file name and read the file when loaded.
+        Other columns are left out of the select and fetched by primary key: the
+        first value used loads that column for every row fetched with it.
+    '''
+    dtable: DBTable
+    conn: sqlalchemy.engine.Connection
+    file_types: typing.Dict[str, FileTypeBase]
+    db_cols: typing.List[sqlalchemy.Column]
+    pk_cols: typing.List[sqlalchemy.Column]
+
+    @classmethod
+    def from_names(cls,
+        dtable: DBTable,
+        conn: sqlalchemy.engine.Connection,
+        cols: typing.List[sqlalchemy.Column],
+        defer: typing.List[typing.Union[str, sqlalchemy.Column]],
+    ) -> typing.Tuple[typing.List[sqlalchemy.Column], DeferredColumns]:
+        '''Replace deferred columns in a select list. Returns the new select
+            list and the object used to wrap the fetched rows.
+        '''
+        defer_names = {c if isinstance(c, str) else c.name for c in defer}
+        for name in defer_names:
+            dtable[name] # raises KeyError for unknown columns
+
+        new_cols, file_types, db_cols = list(), dict(), list()
+        for col in cols:
+            if getattr(col, 'name', None) not in defer_names:
+                new_cols.append(col)
+            elif isinstance(col.type, FileTypeBase):
+                new_cols.append(sqlalchemy.type_coerce(col, sqlalchemy.String).label(col.name))
+                file_types[col.name] = col.type
+            else:
+                db_cols.append(col)
+
+        pk_cols = list(dtable.table.primary_key.columns)
+        if len(db_cols):
+            if not len(pk_cols):
+                raise ValueError(f'Cannot defer non-file columns of {dtable.name} because it has no primary key.')
+            selected = {c.name for c in new_cols if hasattr(c, 'name')}
+            new_cols += [c for c in pk_cols if c.name not in selected]
+
+        return new_cols, cls(dtable=dtable, conn=conn, file_types=file_types, db_cols=db_cols, pk_cols=pk_cols)
+
+    def wrap_rows(self, rows: typing.List[typing.Dict[str, typing.Any]]) -> None:
+        '''Replace deferred values in row dictionaries with Deferred placeholders.'''
+        for name, col_type in self.file_types.items():
+            for row in rows:
+                if row[name] is not None:
+                    row[name] = Deferred(lambda h=row[name], t=col_type: t.process_result_value(h, None))
+
+        if len(self.db_cols):
+            keys = [tuple(row[c.name] for c in self.pk_cols) for row in rows]
+            for col in self.db_cols:
+                batch = DeferredBatch(columns=self, col=col, keys=keys)
+                for row, key in zip(rows, keys):
+                    row[col.name] = Deferred(lambda b=batch, k=key: b.get(k))
+
+    def load_values(self, col: sqlalchemy.Column, keys: typing.List[typing.Tuple]) -> typing.Dict[typing.Tuple, typing.Any]:
+        '''Fetch values of a column by primary key, on the query connection while it is open.'''
+        if len(self.pk_cols) == 1:
+            key_expr, params = self.pk_cols[0], [k[0] for k in keys]
+        else:
+            key_expr, params = sqlalchemy.tuple_(*self.pk_cols), keys
+        
+        if not self.conn.closed:
+            return self._load_values(self.conn, col, key_expr, params)
+        with self.dtable.core.connect() as conn:
+            return self._load_values(conn, col, key_expr, params)
+
+    def _load_values(self, conn: sqlalchemy.engine.Connection, col: sqlalchemy.Column, key_expr: sqlalchemy.ColumnElement, params: typing.List) -> typing.Dict[typing.Tuple, typing.Any]:
+        values = dict()
+        for i in range(0, len(params), LOAD_BATCH_SIZE):
+            q = sqlalchemy.select(*self.pk_cols, col).where(key_expr.in_(params[i:i + LOAD_BATCH_SIZE]))
+            for row in conn.execute(q):
+                values[tuple(row[:-1])] = row[-1]
+        return values
+
+
+@dataclasses.dataclass
+class DeferredBatch:
+    '''Values of one deferred column for a batch of fetched rows, loaded together.'''
+    columns: DeferredColumns
+    col: sqlalchemy.Column
+    keys: typing.List[typing.Tuple]
+    values: typing.Optional[typing.Dict[typing.Tuple, typing.Any]] = None
+
+    def get(self, key: typing.Tuple) -> typing.Any:
+        if self.values is None:
+            self.values = self.columns.load_values(self.col, self.keys)
+            self.keys = None
+        return self.values[key]
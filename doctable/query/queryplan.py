@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import re
+import sqlalchemy
+import sqlalchemy.sql.operators
+import sqlalchemy.sql.visitors
+
+from ..schema.tableschema.index import Index, IndexParams
+
+if typing.TYPE_CHECKING:
+    from ..connectcore import ConnectCore
+
+SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\S+)(?: AS \S+)?$') # SCAN without an index (TABLE in older versions)
+TEMP_BTREE_PATTERN = re.compile(r'^USE TEMP B-TREE FOR (.+)$')
+
+EQUALITY_OPERATORS = (sqlalchemy.sql.operators.eq, sqlalchemy.sql.operators.in_op, sqlalchemy.sql.operators.is_)
+RANGE_OPERATORS = (
+    sqlalchemy.sql.operators.lt, sqlalchemy.sql.operators.le,
+    sqlalchemy.sql.operators.gt, sqlalchemy.sql.operators.ge,
+    sqlalchemy.sql.operators.between_op,
+)
+
+@dataclasses.dataclass
+class PlanStep:
+    '''One row of EXPLAIN QUERY PLAN output.'''
+    id: int
+    parent: int
+    detail: str
+
+    def full_scan_table(self) -> typing.Optional[str]:
+        '''Name of the table if this step reads a whole table without an index.'''
+        m = SCAN_PATTERN.match(self.detail)
+        return m.group(1) if m is not None else None
+
+    def temp_btree(self) -> typing.Optional[str]:
+        '''What a temporary b-tree is built for (e.g. "ORDER BY"), if any.'''
+        m = TEMP_BTREE_PATTERN.match(self.detail)
+        return m.group(1) if m is not None else None
+
+
+@dataclasses.dataclass
+class QueryPlan:
+    '''Query plan of a statement from SQLite's EXPLAIN QUERY PLAN.'''
+    sql: str
+    steps: typing.List[PlanStep]
+
+    @classmethod
+    def from_statement(cls, conn: sqlalchemy.engine.Connection, statement: sqlalchemy.sql.Executable) -> QueryPlan:
+        if conn.dialect.name != 'sqlite':
+            raise NotImplementedError(f'Query plans are only supported for SQLite, not {conn.dialect.name}.')
+        # expanding parameters (e.g. from in_()) are rendered as one placeholder per value
+        compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+        sql = str(compiled)
+
+        # the plan can depend on the values (e.g. LIKE prefixes), so the real ones are bound
+        params = bound_parameters(compiled, conn.dialect)
+        if compiled.positional:
+            params = tuple(params[k] for k in compiled.positiontup)
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).all()
+        return cls(
+            sql=sql,
+            steps=[PlanStep(id=r[0], parent=r[1], detail=r[-1]) for r in rows],
+        )
+
+    def full_scans(self) -> typing.List[str]:
+        '''Tables that are read without using an index.'''
+        return [t for s in self.steps if (t := s.full_scan_table()) is not None]
+
+    def temp_btrees(self) -> typing.List[str]:
+        '''Sorting or grouping done in temporary b-trees (e.g. "ORDER BY").'''
+        return [t for s in self.steps if (t := s.temp_btree()) is not None]
+
+    def uses_index(self) -> bool:
+        return any('INDEX' in s.detail for s in self.steps)
+
+    def __str__(self) -> str:
+        depth = {0: -1}
+        lines = list()
+        for s in self.steps:
+            depth[s.id] = depth.get(s.parent, -1) + 1
+            lines.append('  ' * depth[s.id] + s.detail)
+        return '\n'.join(lines)
+
+
+def bound_parameters(compiled: sqlalchemy.engine.Compiled, dialect: sqlalchemy.engine.Dialect) -> typing.Dict[str, typing.Any]:
+    '''Parameter values of a statement compiled with render_postcompile, 
+        converted by the bind processors of their types as they would be 
+        when executed.
+    '''
+    params = dict()
+    for name, value in compiled.params.items():
+        bind = compiled.binds.get(name)
+        if bind is None: # one value of an expanding parameter (name_1, name_2, ...)
+            bind = compiled.binds.get(name.rsplit('_', 1)[0])
+        process = bind.type.dialect_impl(dialect).bind_processor(dialect) if bind is not None else None
+        params[name] = process(value) if process is not None and value is not None else value
+    return params
+
+
+@dataclasses.dataclass
+class IndexSuggestion:
+    '''An index that would avoid a full scan or temporary b-tree.'''
+    table_name: str
+    column_names: typing.Tuple[str, ...]
+    desc: typing.Tuple[str, ...]
+    reasons: typing.List[str]
+    count: int = 1 # number of statements it would help
+
+    def index_name(self) -> str:
+        return f'ix_{self.table_name}_' + '_'.join(self.column_names)
+
+    def index(self) -> IndexParams:
+        '''Index definition to add to table_schema(indices=...).'''
+        return Index(*self.column_names, desc=self.desc)
+
+    def schema_entry(self) -> typing.Dict[str, IndexParams]:
+        return {self.index_name(): self.index()}
+
+    def info_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'table': self.table_name,
+            'name': self.index_name(),
+            'columns': ', '.join(f'{c} DESC' if c in self.desc else c for c in self.column_names),
+            'count': self.count,
+            'reasons': '; '.join(sorted(set(self.reasons))),
+        }
+
+
+@dataclasses.dataclass
+class WorkloadLog:
+    '''Records select statements executed through an engine so they can be
+        analyzed later with IndexAdvisor.advise. Use as a context manager.
+    '''
+    engine: sqlalchemy.engine.Engine
+    statements: typing.List[sqlalchemy.sql.Select] = dataclasses.field(default_factory=list)
+    max_statements: typing.Optional[int] = None
+
+    def __enter__(self) -> WorkloadLog:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        sqlalchemy.event.listen(self.engine, 'before_execute', self.record)
+
+    def stop(self) -> None:
+        if sqlalchemy.event.contains(self.engine, 'before_execute', self.record):
+            sqlalchemy.event.remove(self.engine, 'before_execute', self.record)
+
+    def record(self, conn, clauseelement, multiparams, params, execution_options) -> None:
+        if isinstance(clauseelement, sqlalchemy.sql.Select):
+            if self.max_statements is None or len(self.statements) < self.max_statements:
+                self.statements.append(clauseelement)
+
+
+@dataclasses.dataclass
+class IndexAdvisor:
+    '''Finds full table scans and temporary b-trees in query plans and proposes
+        indices on the filtered and sorted columns. Suggestions are heuristic:
+        equality-filtered columns first, then one range-filtered column, then
+        ORDER BY columns. SQLite only.
+    '''
+    core: ConnectCore
+
+    def capture(self, max_statements: typing.Optional[int] = None) -> WorkloadLog:
+        '''Record the select statements executed while the returned log is open.'''
+        return WorkloadLog(engine=self.core.engine, max_statements=max_statements)
+
+    def explain(self, statement: sqlalchemy.sql.Select) -> QueryPlan:
+        with self.core.connect() as conn:
+            return QueryPlan.from_statement(conn, statement)
+
+    def advise(self, statements: typing.Iterable[sqlalchemy.sql.Select]) -> typing.List[IndexSuggestion]:
+        '''Index suggestions for a workload, most useful first.'''
+        merged: typing.Dict[typing.Tuple, IndexSuggestion] = dict()
+        plans: typing.Dict[str, QueryPlan] = dict()
+        with self.core.connect() as conn:
+            for statement in statements:
+                sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True}))
+                if sql not in plans:
+                    plans[sql] = QueryPlan.from_statement(conn, statement)
+                for s in self.suggest(statement, plans[sql]):
+                    key = (s.table_name, s.column_names, s.desc)
+                    if key in merged:
+                        merged[key].count += 1
+                        merged[key].reasons += s.reasons
+                    else:
+                        merged[key] = s
+        return sorted(merged.values(), key=lambda s: -s.count)
+
+    def suggest(self, statement: sqlalchemy.sql.Select, plan: QueryPlan) -> typing.List[IndexSuggestion]:
+        '''Suggestions for a single statement given its plan.'''
+        sorts = plan.temp_btrees()
+        suggestions = list()
+        for table in self.tables(statement):
+            reasons = list()
+            if table.name in plan.full_scans():
+                reasons.append(f'full scan of {table.name}')
+            if len(sorts) and len(plan.full_scans()) <= 1:
+                reasons += [f'temp b-tree for {s}' for s in sorts]
+            if not len(reasons):
+                continue
+
+            equality, ranges = self.filter_columns(statement, table)
+            order, desc = self.order_columns(statement, table) if len(sorts) else (list(), list())
+            columns = list(dict.fromkeys(equality + ranges[:1] + order))
+            if len(columns) and not self.is_indexed(table, columns):
+                suggestions.append(IndexSuggestion(
+                    table_name=table.name,
+                    column_names=tuple(columns),
+                    desc=tuple(c for c in desc if c in columns),
+                    reasons=reasons,
+                ))
+        return suggestions
+
+    @staticmethod
+    def tables(statement: sqlalchemy.sql.Select) -> typing.List[sqlalchemy.Table]:
+        tables = list()
+        for f in statement.get_final_froms():
+            tables += [t for t in sqlalchemy.sql.visitors.iterate(f) if isinstance(t, sqlalchemy.Table)]
+        return list(dict.fromkeys(tables))
+
+    @staticmethod
+    def filter_columns(statement: sqlalchemy.sql.Select, table: sqlalchemy.Table) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        '''Names of columns of table compared by equality and by range in the where clause.'''
+        equality, ranges = list(), list()
+        if statement.whereclause is None:
+            return equality, ranges
+        for element in sqlalchemy.sql.visitors.iterate(statement.whereclause):
+            if not isinstance(element, sqlalchemy.sql.expression.BinaryExpression):
+                continue
+            col = element.left
+            if not isinstance(col, sqlalchemy.Column) or col.table is not table:
+                continue
+            if element.operator in EQUALITY_OPERATORS:
+                equality.append(col.name)
+            elif element.operator in RANGE_OPERATORS:
+                ranges.append(col.name)
+        return equality, ranges
+
+    @staticmethod
+    def order_columns(statement: sqlalchemy.sql.Select, table: sqlalchemy.Table) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        '''Names of ORDER BY columns of table, and those sorted in descending order.'''
+        order, desc = list(), list()
+        for clause in getattr(statement, '_order_by_clauses', tuple()):
+            col, is_desc = clause, False
+            if isinstance(clause, sqlalchemy.sql.expression.UnaryExpression):
+                col, is_desc = clause.element, clause.modifier is sqlalchemy.sql.operators.desc_op
+            if isinstance(col, sqlalchemy.Column) and col.table is table:
+                order.append(col.name)
+                if is_desc:
+                    desc.append(col.name)
+        return order, desc
+
+    @staticmethod
+    def is_indexed(table: sqlalchemy.Table, columns: typing.List[str]) -> bool:
+        '''Whether an existing index starts with these columns.'''
+        for ix in table.indexes:
+            names = [getattr(c, 'name', None) for c in ix.expressions]
+            if names[:len(columns)] == columns:
+                return True
+        return False
+
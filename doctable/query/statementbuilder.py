@@ -75,6 +75,19 @@ class StatementBuilder:
         q = q.prefix_with('OR {}'.format(ifnotunique.upper()))
         return q
 
+    @staticmethod
+    def insert_from_select_query(
+        table: sqlalchemy.Table,
+        select: sqlalchemy.sql.Select,
+        col_names: typing.Optional[typing.List[str]],
+        ifnotunique: typing.Optional[typing.Literal['FAIL', 'IGNORE', 'REPLACE']],
+    ) -> sqlalchemy.sql.Insert:
+        '''Build INSERT ... SELECT. Selected columns are matched to col_names by position.'''
+        if col_names is None:
+            col_names = [c.name for c in select.selected_columns]
+        q = StatementBuilder.insert_query(table, ifnotunique=ifnotunique)
+        return q.from_select(col_names, select)
+
     @staticmethod
     def delete_query(
         table: sqlalchemy.Table,
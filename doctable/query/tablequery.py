@@ -5,6 +5,10 @@ import typing
 import sqlalchemy
 
 from .connectquery import ConnectQuery
+from .deferred import DeferredColumns
+from .statementbuilder import StatementBuilder
+from .queryplan import QueryPlan
+from ..schema.column.column_types.file_types import defer_batched_columns, load_batched_columns
 
 if typing.TYPE_CHECKING:
     from ..dbtable import DBTable
@@ -39,18 +43,13 @@ class TableQuery(typing.Generic[T]):
         cols: typing.List[sqlalchemy.Column] = None,
         chunksize: int = 100, 
         limit: int = None, 
+        defer: typing.Optional[typing.List[typing.Union[str, sqlalchemy.Column]]] = None,
         **select_kwargs,
     ) -> typing.Generator[typing.List[T]]:
         ''' Performs select while querying only a subset of the results at a time. 
             Use when results set will take too much memory.
         '''
-        if cols is None:
-            cols = self.dtable.all_cols()
-        else:
-            try:
-                cols = [self.dtable[col] if isinstance(col, str) else col for col in cols]
-            except NotImplementedError as e:
-                raise NotImplementedError(f'Did you mean to pass a list to select?') from e
+        cols, batched, lazy = self.select_columns(cols, defer)
             
         result_gen = self.cquery.select_chunks(
             cols=cols,
@@ -59,7 +58,7 @@ class TableQuery(typing.Generic[T]):
             **select_kwargs,
         )
         for results in result_gen:
-            yield [self.dtable.schema.container_from_row(row) for row in results]
+            yield self.containers_from_rows(results, batched, lazy)
 
     def select(self, 
         cols: typing.Optional[typing.List[str]] = None,
@@ -69,16 +68,15 @@ class TableQuery(typing.Generic[T]):
         limit: typing.Optional[int] = None,
         wherestr: typing.Optional[str] = None,
         offset: typing.Optional[int] = None,
+        defer: typing.Optional[typing.List[typing.Union[str, sqlalchemy.Column]]] = None,
         **kwargs
     ) -> typing.List[T]:
-        '''Select elements from table, wrap result in container objects.'''
-        if cols is None:
-            cols = self.dtable.all_cols()
-        else:
-            try:
-                cols = [self.dtable[col] if isinstance(col, str) else col for col in cols]
-            except NotImplementedError as e:
-                raise NotImplementedError(f'Did you mean to pass a list to select?') from e
+        '''Select elements from table, wrap result in container objects.
+        Args:
+            defer: columns that are not loaded until first used. The container 
+                attributes hold Deferred placeholders instead (see Deferred).
+        '''
+        cols, batched, lazy = self.select_columns(cols, defer)
             
         result = self.cquery.select(
             cols=cols,
@@ -90,7 +88,117 @@ class TableQuery(typing.Generic[T]):
             offset=offset,
             **kwargs
         )
-        return [self.dtable.schema.container_from_row(row) for row in result.all()]
+        return self.containers_from_rows(result.all(), batched, lazy)
+    
+    def explain(self, 
+        cols: typing.Optional[typing.List[str]] = None,
+        where: typing.Optional[sqlalchemy.sql.expression.BinaryExpression] = None,
+        order_by: typing.Optional[typing.List[sqlalchemy.Column]] = None,
+        group_by: typing.Optional[typing.List[sqlalchemy.Column]] = None,
+        limit: typing.Optional[int] = None,
+        wherestr: typing.Optional[str] = None,
+        offset: typing.Optional[int] = None,
+    ) -> QueryPlan:
+        '''Query plan of the statement select() would run with these arguments.
+            Use str() on the result for a readable tree, or IndexAdvisor for 
+            index suggestions.
+        '''
+        cols = self.dtable.all_cols() if cols is None else [self.dtable[c] if isinstance(c, str) else c for c in cols]
+        q = StatementBuilder.select_query(
+            cols=cols,
+            where=where,
+            order_by=order_by,
+            group_by=group_by,
+            limit=limit,
+            wherestr=wherestr,
+            offset=offset,
+        )
+        return self.cquery.explain(q)
+
+    def search(self, 
+        query: str,
+        cols: typing.Optional[typing.List[typing.Union[str, sqlalchemy.Column]]] = None,
+        match_cols: typing.Optional[typing.List[str]] = None,
+        where: typing.Optional[sqlalchemy.sql.expression.BinaryExpression] = None,
+        rank: bool = True,
+        limit: typing.Optional[int] = None,
+        offset: typing.Optional[int] = None,
+        **kwargs
+    ) -> typing.List[T]:
+        '''Full-text search using the table's FTS5 index (see table_schema(fts=...)).
+        Args:
+            query: FTS5 query, e.g. 'climate AND "sea level"' or 'econom*'.
+            cols: columns to select (as in select).
+            match_cols: only match query terms in these indexed columns.
+            where: additional filter on the main table.
+            rank: order results by relevance (bm25) instead of table order.
+        '''
+        fts = self.dtable.schema.fts
+        if fts is None:
+            raise ValueError(f'{self.dtable.name} has no full-text search index. Use table_schema(fts=...).')
+        if match_cols is not None:
+            query = f'{{{" ".join(match_cols)}}} : ({query})'
+        
+        cols, batched, lazy = self.select_columns(cols, None)
+        fts_table = fts.sqlalchemy_table(self.dtable.name)
+        rowid = fts.rowid_column(self.dtable.table)
+        q = (sqlalchemy.select(*cols)
+            .select_from(self.dtable.table.join(fts_table, rowid == fts_table.c.rowid))
+            .where(sqlalchemy.literal_column(fts_table.name).op('MATCH')(query))
+        )
+        if where is not None:
+            q = q.where(where)
+        if rank:
+            q = q.order_by(fts_table.c.rank)
+        if limit is not None:
+            q = q.limit(limit)
+        if offset is not None:
+            q = q.offset(offset)
+        
+        rows = self.cquery.execute_statement(q, **kwargs).all()
+        return self.containers_from_rows(rows, batched, lazy)
+
+    def select_columns(self, 
+        cols: typing.Optional[typing.List[typing.Union[str, sqlalchemy.Column]]],
+        defer: typing.Optional[typing.List[typing.Union[str, sqlalchemy.Column]]],
+    ) -> typing.Tuple[typing.List[sqlalchemy.Column], typing.Dict[str, typing.Any], typing.Optional[DeferredColumns]]:
+        '''Get the columns to select, replacing deferred and batched columns.'''
+        if cols is None:
+            cols = self.dtable.all_cols()
+        else:
+            try:
+                cols = [self.dtable[col] if isinstance(col, str) else col for col in cols]
+            except NotImplementedError as e:
+                raise NotImplementedError(f'Did you mean to pass a list to select?') from e
+        
+        lazy = None
+        if defer is not None and len(defer):
+            cols, lazy = DeferredColumns.from_names(self.dtable, self.cquery.conn, cols, defer)
+        cols, batched = defer_batched_columns(cols)
+        return cols, batched, lazy
+
+    def containers_from_rows(self, 
+        rows: typing.List[sqlalchemy.Row], 
+        batched: typing.Dict[str, typing.Any], 
+        lazy: typing.Optional[DeferredColumns] = None,
+    ) -> typing.List[T]:
+        '''Wrap rows in containers, first decoding batched columns a whole batch at a time.'''
+        if not len(rows):
+            return list()
+        
+        if not len(batched) and lazy is None:
+            make = self.dtable.schema.container_factory(rows[0]._fields)
+            return [make(row) for row in rows]
+        
+        if len(batched):
+            rows = load_batched_columns(rows, batched)
+        else:
+            rows = [dict(row._mapping) for row in rows]
+        
+        if lazy is not None:
+            lazy.wrap_rows(rows)
+        make = self.dtable.schema.container_factory(list(rows[0].keys()))
+        return [make(r.values()) for r in rows]
     
     #################### Insert Queries ####################
 
@@ -122,6 +230,22 @@ class TableQuery(typing.Generic[T]):
             ifnotunique=ifnotunique,
             **kwargs
         )
+
+    def insert_from_select(self, 
+        select: sqlalchemy.sql.Select,
+        col_names: typing.Optional[typing.List[str]] = None,
+        ifnotunique: typing.Literal['FAIL', 'IGNORE', 'REPLACE'] = 'FAIL',
+        **kwargs
+    ) -> sqlalchemy.engine.CursorResult:
+        '''Insert the results of a select statement (INSERT ... SELECT).'''
+        return self.cquery.insert_from_select(
+            dtable=self.dtable,
+            select=select,
+            col_names=col_names,
+            ifnotunique=ifnotunique,
+            **kwargs
+        )
+
     #################### Update Queries ####################
     def update_single(self, 
         values: typing.Dict[typing.Union[str,sqlalchemy.Column], typing.Any], 
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import typing
+import dataclasses
+import os
+import pickle
+import pathlib
+import sqlalchemy
+
+
+@dataclasses.dataclass
+class ReflectionCache:
+    '''On-disk cache of reflected tables so they can be rebuilt without inspector round-trips.
+        Entries are keyed by the absolute path of the database file, the sqlite
+        PRAGMA schema_version, which sqlite increments on every schema change, and
+        a hash of the schema itself, since a rebuilt file can reach the same version.
+    '''
+    path: pathlib.Path # location of the cache file
+    db_key: str # absolute path of the database file
+    schema_version: int
+    schema_hash: str # md5 of the sql of all entries in sqlite_master
+    metadata: sqlalchemy.MetaData # holds copies of reflected tables
+    complete: bool = False # True if every table in the database has been cached
+
+    @classmethod
+    def open(cls, path: typing.Union[str, pathlib.Path], db_key: str, schema_version: int, schema_hash: str) -> ReflectionCache:
+        '''Load the cache from disk, or start an empty one if it is missing or stale.'''
+        path = pathlib.Path(path)
+        try:
+            with path.open('rb') as f:
+                cache = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError):
+            cache = None
+
+        if (isinstance(cache, cls) and cache.db_key == db_key and cache.schema_version == schema_version 
+                and getattr(cache, 'schema_hash', None) == schema_hash):
+            cache.path = path
+            return cache
+
+        return cls(
+            path=path,
+            db_key=db_key,
+            schema_version=schema_version,
+            schema_hash=schema_hash,
+            metadata=sqlalchemy.MetaData(),
+        )
+
+    def save(self) -> None:
+        '''Write the cache atomically so concurrent readers never see a partial file.'''
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with tmp_path.open('wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, self.path)
+
+    def get_table(self, table_name: str, metadata: sqlalchemy.MetaData) -> typing.Optional[sqlalchemy.Table]:
+        '''Copy a cached table into the provided metadata, or return None if it was not cached.'''
+        try:
+            table = self.metadata.tables[table_name]
+        except KeyError:
+            return None
+
+        # referenced tables are loaded along with the table, as reflection would do
+        for fkc in table.foreign_key_constraints:
+            ref_name = fkc.elements[0].target_fullname.split('.')[0]
+            if ref_name not in metadata.tables and ref_name in self.metadata.tables:
+                self.metadata.tables[ref_name].to_metadata(metadata)
+        return table.to_metadata(metadata)
+
+    def reflect_table(self, table_name: str, bind: typing.Union[sqlalchemy.engine.Engine, sqlalchemy.engine.Connection]) -> None:
+        '''Reflect a single table (and any tables it references) into the cache.'''
+        sqlalchemy.Table(table_name, self.metadata, autoload_with=bind)
+
+    def reflect_all(self, bind: typing.Union[sqlalchemy.engine.Engine, sqlalchemy.engine.Connection]) -> None:
+        '''Reflect every table in the database into the cache.'''
+        self.metadata.reflect(bind)
+        self.complete = True
+
+    def table_names(self) -> typing.List[str]:
+        return list(self.metadata.tables.keys())
+
@@ -1,7 +1,15 @@
 
 from .fieldargs import FieldArgs
 from .column import Column
-from .column_types import type_mappings, JSON, PickleType
+from .column_types import type_mappings, JSON, PickleType, ColumnTypeMatcher
+from .column_types import FileTypeControl, TextFileType, PickleFileType, JSONFileType
+from .column_types import PackedStoreControl, PackedBlobType, PackedPickleType
+from .column_types import Codec, CompressedBytes, CompressedText, CompressedJSON, CompressedPickle
+from .column_types import ZstdDictControl, ZstdDictText, ZstdDictJSON
+from .column_types import NDArray, NDArrayFileType
+from .column_types import SerializedJSON, Serializer
+from .column_types import CategoryControl, Categorical
+from .column_types import EpochDateTime, EpochDate
 from .columninfo import ColumnInfo
 from .columnargs import ColumnArgs
 
@@ -2,4 +2,11 @@
 from .mappings import type_mappings, JSON, PickleType, ColumnTypeMatcher
 
 from .file_types import FileTypeControl, TextFileType, PickleFileType, JSONFileType
+from .packed_types import PackedStoreControl, PackedBlobType, PackedPickleType
+from .gzip_types import Codec, CompressedBytes, CompressedText, CompressedJSON, CompressedPickle
+from .zstd_dict_types import ZstdDictControl, ZstdDictText, ZstdDictJSON
+from .array_types import NDArray, NDArrayFileType
+from .serializers import SerializedJSON, Serializer, get_serializer
+from .categorical_types import CategoryControl, Categorical
+from .epoch_types import EpochDateTime, EpochDate
 
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import typing
+import struct
+import sqlalchemy
+
+from .file_types import FileTypeBase, FileTypeControl
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+# header: dtype string length, ndim, dtype string, shape, order ('C' or 'F')
+HEAD = struct.Struct('<BB')
+MAX_HEADER_SIZE = HEAD.size + 255 + 8*255 + 1
+
+def encode_array(arr: np.ndarray) -> bytes:
+    '''Serialize an array as a compact header followed by its raw buffer.'''
+    import numpy as np # imported here so numpy only loads when needed
+    arr = np.asarray(arr)
+    if arr.dtype.hasobject:
+        raise ValueError('Arrays with object dtype cannot be stored as raw buffers. Use a pickle type instead.')
+    order = 'F' if arr.flags.f_contiguous and not arr.flags.c_contiguous else 'C'
+    dtype_str = arr.dtype.str.encode()
+    header = (
+        HEAD.pack(len(dtype_str), arr.ndim)
+        + dtype_str
+        + struct.pack(f'<{arr.ndim}q', *arr.shape)
+        + order.encode()
+    )
+    return header + arr.tobytes(order=order)
+
+def decode_header(data: bytes) -> typing.Tuple[str, typing.Tuple[int, ...], str, int]:
+    '''Parse the header, returning (dtype, shape, order, header size).'''
+    dtype_len, ndim = HEAD.unpack_from(data)
+    pos = HEAD.size
+    dtype_str = bytes(data[pos:pos+dtype_len]).decode()
+    pos += dtype_len
+    shape = struct.unpack_from(f'<{ndim}q', data, pos)
+    pos += 8*ndim
+    order = chr(data[pos])
+    return dtype_str, shape, order, pos + 1
+
+def decode_array(data: bytes) -> np.ndarray:
+    '''Read-only view of the array stored in data (no copy is made).'''
+    import numpy as np
+    dtype_str, shape, order, offset = decode_header(data)
+    return np.frombuffer(data, dtype=dtype_str, offset=offset).reshape(shape, order=order)
+
+
+class NDArray(sqlalchemy.types.TypeDecorator):
+    '''Stores numpy arrays as a small header (dtype, shape, order) plus the raw
+        buffer. Selected arrays are read-only views of the fetched bytes.
+    '''
+    impl = sqlalchemy.types.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: typing.Any, dialect: str):
+        if value is not None:
+            return encode_array(value)
+        else:
+            return None
+
+    def process_result_value(self, value: bytes, dialect: str):
+        if value is not None:
+            return decode_array(value)
+        else:
+            return None
+
+
+class NDArrayFileType(FileTypeBase):
+    '''Stores numpy arrays in files (same format as NDArray) and returns
+        read-only np.memmap views, so data is only read from disk when used.
+        The control must not use a codec.
+    '''
+    cache_ok = False
+
+    @classmethod
+    def write_data(cls, data: np.ndarray, control: FileTypeControl, dialect: str) -> bytes:
+        cls.check_control(control)
+        return control.write_bytes(encode_array(data))
+
+    @classmethod
+    def read_data(cls, hash_value: bytes, control: FileTypeControl, dialect: str) -> np.memmap:
+        import numpy as np
+        cls.check_control(control)
+        with control.open(hash_value, 'rb') as f:
+            dtype_str, shape, order, offset = decode_header(f.read(MAX_HEADER_SIZE))
+        return np.memmap(control.joinpath(hash_value), dtype=dtype_str, mode='r', offset=offset, shape=shape, order=order)
+
+    @staticmethod
+    def check_control(control: FileTypeControl) -> None:
+        if control.codec is not None:
+            raise ValueError('NDArrayFileType cannot memory-map compressed files: use a control without a codec.')
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import threading
+import weakref
+import sqlalchemy
+import sqlalchemy.exc
+
+# doctable-managed side table holding the categories of all categorical columns
+CATEGORY_TABLE_NAME = '_doctable_categories'
+category_metadata = sqlalchemy.MetaData()
+category_table = sqlalchemy.Table(CATEGORY_TABLE_NAME, category_metadata,
+    sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column('name', sqlalchemy.String, nullable=False),
+    sqlalchemy.Column('value', sqlalchemy.String, nullable=False),
+    sqlalchemy.UniqueConstraint('name', 'value'),
+    sqlite_autoincrement=True, # ids are never reused
+)
+
+class CategoryId(int):
+    '''Id of a category that was already encoded. Passed through unchanged when bound.'''
+    pass
+
+UNKNOWN_ID = -1 # bound for values that are not categories, so comparisons match no rows
+
+Bind = typing.Union[sqlalchemy.engine.Engine, sqlalchemy.engine.Connection, sqlalchemy.engine.Dialect]
+
+class Categorical(sqlalchemy.types.TypeDecorator):
+    '''Stores low-cardinality strings as small integer ids. The id to string
+        mapping is kept in a doctable-managed side table of each database and
+        cached in memory. New strings are added to the side table on the 
+        connection that inserts or updates them, in its transaction. Strings 
+        compared to the column (e.g. in where clauses) are only looked up: 
+        unknown strings match nothing.
+    '''
+    impl = sqlalchemy.types.Integer
+    cache_ok = False # the control object is not hashable
+    lookup_only = False
+
+    def __init__(self, category_control: CategoryControl, *arg, **kwargs):
+        self.control = category_control
+        super().__init__(*arg, **kwargs)
+
+    def coerce_compared_value(self, op, value) -> sqlalchemy.types.TypeEngine:
+        return CategoricalLookup(self.control)
+
+    def process_bind_param(self, value: typing.Optional[str], dialect: sqlalchemy.engine.Dialect):
+        if value is None:
+            return None
+        elif isinstance(value, CategoryId):
+            return int(value)
+        elif self.lookup_only:
+            return self.control.lookup(value, dialect)
+        else:
+            return self.control.encode(value, dialect)
+
+    def process_result_value(self, value: typing.Optional[int], dialect: sqlalchemy.engine.Dialect):
+        if value is not None:
+            return self.control.decode(value, dialect)
+        else:
+            return None
+
+class CategoricalLookup(Categorical):
+    '''Type of values compared to a categorical column: never adds categories.'''
+    cache_ok = False
+    lookup_only = True
+
+
+@dataclasses.dataclass
+class CategoryState:
+    '''Categories of a control in one database.'''
+    engine: weakref.ref # the engine is owned by its ConnectCore
+    ids: typing.Dict[str, int] = dataclasses.field(default_factory=dict)
+    values: typing.Dict[int, str] = dataclasses.field(default_factory=dict)
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock)
+
+    def clear(self, *args) -> None:
+        '''Empty the in-memory cache (it is reloaded when needed).'''
+        with self.lock:
+            self.ids.clear()
+            self.values.clear()
+
+    def update(self, rows: typing.List[typing.Tuple[int, str]]) -> None:
+        with self.lock:
+            for category_id, value in rows:
+                self.ids[value] = category_id
+                self.values[category_id] = value
+
+
+@dataclasses.dataclass
+class CategoryControl:
+    '''Categories of one categorical column (or several columns sharing a name).
+        Categories are loaded from the side table of each database the column is 
+        used in, when they are first needed. Values are matched to their database 
+        by the dialect sqlalchemy passes to the type, which belongs to a single 
+        engine, so one schema can be used with several databases.
+    '''
+    name: str # key of the categories in the side table
+    _states: weakref.WeakKeyDictionary = dataclasses.field(default_factory=weakref.WeakKeyDictionary, init=False, repr=False, compare=False)
+
+    def bind(self, engine: sqlalchemy.engine.Engine) -> None:
+        '''Load categories for values of this engine from its database.'''
+        if engine.dialect not in self._states:
+            self._states[engine.dialect] = CategoryState(engine=weakref.ref(engine))
+        track_executing_connections(engine)
+
+    def state(self, bind: typing.Optional[Bind] = None) -> CategoryState:
+        '''State of the database of an engine, connection or dialect. Can be 
+            omitted when the control is used with a single database.
+        '''
+        if bind is None:
+            if len(self._states) != 1:
+                raise ValueError(f'Category control "{self.name}" is used with {len(self._states)} '
+                    'databases. Pass the engine or connection to use.')
+            return next(iter(self._states.values()))
+        try:
+            return self._states[getattr(bind, 'dialect', bind)]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'Category control "{self.name}" is not bound to this database. '
+                'Use it in a table created with ConnectCore.') from e
+
+    def clear(self, bind: typing.Optional[Bind] = None) -> None:
+        '''Empty the in-memory cache of a database (it is reloaded when needed).'''
+        self.state(bind).clear()
+
+    ################# Encoding #################
+    def encode(self, value: str, bind: Bind) -> int:
+        '''Id of a category, adding it to the side table if it is new. New 
+            categories are added on the connection executing the statement 
+            being bound; outside of an execution they are only looked up.
+        '''
+        state = self.state(bind)
+        try:
+            return state.ids[value]
+        except KeyError:
+            pass
+        conn = executing_connection(getattr(bind, 'dialect', bind))
+        if conn is None:
+            return self.lookup(value, bind)
+        self.register([value], conn)
+        return state.ids[value]
+
+    def lookup(self, value: str, bind: Bind) -> int:
+        '''Id of a category, or UNKNOWN_ID if it is not in the side table.'''
+        state = self.state(bind)
+        if value not in state.ids:
+            self.load(bind)
+        return state.ids.get(value, UNKNOWN_ID)
+
+    def decode(self, category_id: int, bind: Bind) -> str:
+        state = self.state(bind)
+        try:
+            return state.values[category_id]
+        except KeyError:
+            pass
+        self.load(bind)
+        try:
+            return state.values[category_id]
+        except KeyError as e:
+            raise KeyError(f'Category {category_id} of "{self.name}" is not in {CATEGORY_TABLE_NAME}.') from e
+
+    def register(self, values: typing.Iterable[str], conn: sqlalchemy.engine.Connection) -> None:
+        '''Make sure all values have ids, adding new ones to the side table on conn.
+            The cache is cleared if the transaction of conn is rolled back.
+        '''
+        state = self.state(conn)
+        missing = list(dict.fromkeys(v for v in values if isinstance(v, str) and v not in state.ids))
+        if not len(missing):
+            return
+
+        category_metadata.create_all(conn)
+        q = sqlalchemy.insert(category_table).prefix_with('OR IGNORE')
+        conn.execute(q, [{'name': self.name, 'value': v} for v in missing])
+        sqlalchemy.event.listen(conn, 'rollback', state.clear, once=True)
+
+        q = sqlalchemy.select(category_table.c.id, category_table.c.value).where(
+            category_table.c.name == self.name,
+            category_table.c.value.in_(missing),
+        )
+        state.update(conn.execute(q).all())
+
+    def encode_rows(self, name: str, rows: typing.List[typing.Dict[str, typing.Any]], conn: sqlalchemy.engine.Connection) -> None:
+        '''Replace values of column name in rows with their ids (in place).'''
+        self.register((row[name] for row in rows if name in row), conn)
+        ids = self.state(conn).ids
+        for row in rows:
+            if isinstance(row.get(name), str): # leaves None and sql expressions
+                row[name] = CategoryId(ids[row[name]])
+
+    ################# Loading #################
+    def categories(self, bind: typing.Optional[Bind] = None) -> typing.List[str]:
+        '''All categories of a database, in the order they were added.'''
+        state = self.state(bind)
+        self.load(bind)
+        return [state.values[i] for i in sorted(state.values)]
+
+    def load(self, bind: typing.Optional[Bind] = None) -> None:
+        '''Load all categories from the side table.'''
+        state = self.state(bind)
+        q = sqlalchemy.select(category_table.c.id, category_table.c.value).where(category_table.c.name == self.name)
+        with self.connect(state) as conn:
+            try:
+                state.update(conn.execute(q).all())
+            except sqlalchemy.exc.OperationalError: # side table was never created
+                pass
+
+    def connect(self, state: CategoryState) -> sqlalchemy.engine.Connection:
+        engine = state.engine()
+        if engine is None:
+            raise ValueError(f'The database of category control "{self.name}" was closed.')
+        return engine.connect()
+
+
+################# Executing Connections #################
+# connections executing a statement on this thread, innermost last. Bind 
+# parameters are processed during execution, so new categories can be 
+# added in the transaction of the statement that introduces them.
+_executing = threading.local()
+
+def track_executing_connections(engine: sqlalchemy.engine.Engine) -> None:
+    '''Register the execution events that track executing connections (once per engine).'''
+    if not sqlalchemy.event.contains(engine, 'before_execute', _push_connection):
+        sqlalchemy.event.listen(engine, 'before_execute', _push_connection)
+        sqlalchemy.event.listen(engine, 'after_execute', _pop_connection)
+        sqlalchemy.event.listen(engine, 'handle_error', _pop_failed_connection)
+
+def executing_connection(dialect: sqlalchemy.engine.Dialect) -> typing.Optional[sqlalchemy.engine.Connection]:
+    '''The connection executing a statement on this thread, if it belongs to dialect.'''
+    stack = getattr(_executing, 'stack', None)
+    if not stack:
+        return None
+    conn = stack[-1]
+    return conn if conn.dialect is dialect and not conn.closed else None
+
+def _push_connection(conn, clauseelement, multiparams, params, execution_options) -> None:
+    if not hasattr(_executing, 'stack'):
+        _executing.stack = list()
+    _executing.stack.append(conn)
+
+def _pop_connection(conn, clauseelement, multiparams, params, execution_options, result) -> None:
+    _remove_connection(conn)
+
+def _pop_failed_connection(exception_context) -> None:
+    _remove_connection(exception_context.connection)
+
+def _remove_connection(conn: sqlalchemy.engine.Connection) -> None:
+    stack = getattr(_executing, 'stack', [])
+    for i in reversed(range(len(stack))):
+        if stack[i] is conn:
+            del stack[i]
+            return
+
+
+def encode_category_columns(
+    table: sqlalchemy.Table,
+    rows: typing.List[typing.Dict[typing.Union[str, sqlalchemy.Column], typing.Any]],
+    conn: sqlalchemy.engine.Connection,
+) -> typing.List[typing.Dict[typing.Union[str, sqlalchemy.Column], typing.Any]]:
+    '''Encode categorical columns before an insert or update, adding new
+        categories on the same connection. Returns new rows.
+    '''
+    cols = [c for c in table.columns if isinstance(c.type, Categorical)]
+    if not len(cols):
+        return rows
+
+    rows = [dict(row) for row in rows]
+    for col in cols:
+        for key in (col.name, col):
+            if any(key in row for row in rows):
+                col.type.control.encode_rows(key, rows, conn)
+    return rows
+
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import typing
+import datetime
+import sqlalchemy
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+class EpochDateTime(sqlalchemy.types.TypeDecorator):
+    '''Stores datetimes as integer microseconds since 1970-01-01 UTC, so range
+        filters and ORDER BY compare integers and nothing is parsed on select.
+        Aware datetimes are converted to UTC; naive datetimes are taken to be UTC.
+        Args:
+            timezone: return aware UTC datetimes instead of naive ones.
+    '''
+    impl = sqlalchemy.types.BigInteger
+    cache_ok = True
+
+    def __init__(self, timezone: bool = False, *arg, **kwargs):
+        self.timezone = timezone
+        super().__init__(*arg, **kwargs)
+
+    def process_bind_param(self, value: typing.Optional[datetime.datetime], dialect: str):
+        if value is None:
+            return None
+        elif not isinstance(value, datetime.datetime):
+            raise TypeError(f'EpochDateTime columns accept datetime objects, not {type(value).__name__}.')
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (value - EPOCH) // MICROSECOND
+
+    def process_result_value(self, value: typing.Optional[int], dialect: str):
+        if value is None:
+            return None
+        dt = EPOCH + datetime.timedelta(microseconds=value)
+        return dt.replace(tzinfo=datetime.timezone.utc) if self.timezone else dt
+
+    @property
+    def python_type(self) -> typing.Type:
+        return datetime.datetime
+
+class EpochDate(sqlalchemy.types.TypeDecorator):
+    '''Stores dates as integer days since 1970-01-01.'''
+    impl = sqlalchemy.types.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value: typing.Optional[datetime.date], dialect: str):
+        if value is None:
+            return None
+        elif isinstance(value, datetime.datetime) or not isinstance(value, datetime.date):
+            raise TypeError(f'EpochDate columns accept date objects, not {type(value).__name__}.')
+        return (value - EPOCH_DATE).days
+
+    def process_result_value(self, value: typing.Optional[int], dialect: str):
+        if value is None:
+            return None
+        return EPOCH_DATE + datetime.timedelta(days=value)
+
+    @property
+    def python_type(self) -> typing.Type:
+        return datetime.date
+
@@ -5,26 +5,33 @@ import typing
 import pickle
 #import sqlalchemy.types as types
 import sqlalchemy
-import numpy as np
 from random import randrange
 import os
-import json
 import pathlib
 import hashlib
+import concurrent.futures
+import collections
+import threading
+
+from .gzip_types import Codec
+from .serializers import Serializer, get_serializer
 
 class FileTypeBase(sqlalchemy.types.TypeDecorator):
     '''Base class for file types. Stores data in files and records'''
     impl = sqlalchemy.types.String # just stores filename internally
+    cache_ok = False # the control object is not hashable (subclasses must set this too)
     
     def __init__(self, file_type_control: FileTypeControl, *arg, **kwargs):
         self.control = file_type_control
         self.control.create_folder()
         
-        super().__init__(self, *arg, **kwargs)
+        super().__init__(*arg, **kwargs)
     
     ################# Used by sqlalchemy #################    
     def process_bind_param(self, value: typing.Any, dialect: str):
-        if value is not None:
+        if isinstance(value, StoredFile): # already written by write_batch
+            return str(value)
+        elif value is not None:
             return self.write_data(value, self.control, dialect)
         else:
             return None
@@ -37,6 +44,24 @@ class FileTypeBase(sqlalchemy.types.TypeDecorator):
         else:
             return None
         
+    ################# Batched I/O #################
+    @property
+    def batched(self) -> bool:
+        '''Whether reads and writes for many rows should go through the thread pool.'''
+        return self.control.workers > 1 and not self.control.raw
+
+    def write_batch(self, values: typing.List[typing.Any], dialect: str = None) -> typing.List[typing.Optional[StoredFile]]:
+        '''Write files for many values concurrently, returning names that are bound as-is.'''
+        def write(value):
+            if value is None or isinstance(value, StoredFile):
+                return value
+            return StoredFile(self.write_data(value, self.control, dialect))
+        return self.control.map(write, values)
+
+    def read_batch(self, hash_values: typing.List[typing.Optional[str]], dialect: str = None) -> typing.List[typing.Any]:
+        '''Read files for many rows concurrently.'''
+        return self.control.map(lambda h: self.process_result_value(h, dialect), hash_values)
+
     ################# Implemented by Subclass #################
     @classmethod
     def write_data(cls, data: typing.Any, control: FileTypeControl, dialect: str) -> bytes:
@@ -49,71 +74,333 @@ class FileTypeBase(sqlalchemy.types.TypeDecorator):
         raise NotImplementedError
 
 
+class StoredFile(str):
+    '''Name of a file that has already been written, so it is bound without writing again.'''
+
+
 class TextFileType(FileTypeBase):
+    cache_ok = False
+
     @classmethod
     def write_data(cls, data: str, control: FileTypeControl, dialect: str) -> bytes:
-        hash_value = control.get_md5(data)
-        if not control.exists(hash_value):
-            with control.open(hash_value, 'w') as f:
-                f.write(data)
-        return hash_value
+        return control.write_bytes(data.encode())
     
     @classmethod
     def read_data(cls, hash_value: bytes, control: FileTypeControl, dialect: str) -> str:
-        with control.open(hash_value, 'rb') as f:
-            return f.read()
+        return control.read_value(hash_value, 'text', bytes.decode)
 
 class PickleFileType(FileTypeBase):
+    cache_ok = False
+
     @classmethod
     def write_data(cls, data: typing.Any, control: FileTypeControl, dialect: str) -> bytes:
-        pickle_bytes = pickle.dumps(data)
-        hash_value = control.get_md5(pickle_bytes)
-        if not control.exists(hash_value):
-            with control.open(hash_value, 'wb') as f:
-                f.write(pickle_bytes)
-        return hash_value
+        return control.write_bytes(pickle.dumps(data))
     
     @classmethod
     def read_data(cls, hash_value: bytes, control: FileTypeControl, dialect: str) -> str:
-        with control.open(hash_value, 'rb') as f:
-            return pickle.load(f)
+        return control.read_value(hash_value, 'pickle', pickle.loads)
 
 class JSONFileType(FileTypeBase):
-    @classmethod
-    def write_data(cls, data: typing.Dict, control: FileTypeControl, dialect: str) -> bytes:
-        json_str = json.dumps(data)
-        hash_value = control.get_md5(json_str)
-        if not control.exists(hash_value):
-            with control.open(hash_value, 'w') as f:
-                f.write(json_str)
-        return hash_value
+    '''Stores JSON-like values using a selectable serializer (json, orjson or msgpack).'''
+    cache_ok = False
+
+    def __init__(self, file_type_control: FileTypeControl, serializer: typing.Union[str, Serializer] = 'json', *arg, **kwargs):
+        self.serializer = get_serializer(serializer)
+        super().__init__(file_type_control, *arg, **kwargs)
+
+    def write_data(self, data: typing.Dict, control: FileTypeControl, dialect: str) -> bytes:
+        return control.write_bytes(self.serializer.dumps(data))
     
-    @classmethod
-    def read_data(cls, hash_value: bytes, control: FileTypeControl, dialect: str) -> typing.Any:
-        with control.open(hash_value, 'r') as f:
-            return json.load(f)
+    def read_data(self, hash_value: bytes, control: FileTypeControl, dialect: str) -> typing.Any:
+        return control.read_value(hash_value, f'json:{self.serializer.name}', self.serializer.loads)
 
 
 @dataclasses.dataclass
 class FileTypeControl:
-    '''Controls behavior of a given file type.'''
+    '''Controls behavior of a given file type.
+        Files are stored flat in path (path/<hash>) by default. Set shard_levels to 
+        store them in nested folders named by hash prefixes instead, e.g. 
+        shard_levels=2 and shard_width=2 gives path/ab/cd/<hash>, so each folder 
+        holds at most 16**shard_width entries. Use migrate_layout() to convert 
+        files written with a different layout.
+        Set workers > 1 to read and write the files of a whole insert_multi or 
+        select batch concurrently in a thread pool of that size.
+        Set cache_bytes > 0 to keep the contents of recently read files in memory, 
+        up to that many bytes of (decompressed) data. Only the immutable bytes are 
+        cached, so every read still parses a new object that callers may modify. 
+        Also set cache_values=True to cache the parsed values instead, so hits 
+        skip parsing; reads of the same file then return the same shared object, 
+        which callers must not modify. Entries are sized by their file contents. 
+        Files are content-addressed so entries never go stale.
+        Set codec (see Codec) to compress file contents. Files are still named by 
+        the hash of the uncompressed data; the codec must not change once the 
+        folder holds files.
+    '''
     path: pathlib.Path # path to folder where files are stored
-    raw: bool # access raw filenames instead of data
+    raw: bool = False # access raw filenames instead of data
+    shard_levels: int = 0 # number of nested folders between path and each file
+    shard_width: int = 2 # number of hash characters used to name each folder level
+    workers: int = 1 # threads used for batched reads and writes (1 means serial)
+    cache_bytes: int = 0 # size budget of the in-memory cache of file contents (0 disables it)
+    cache_values: bool = False # cache parsed values shared between reads instead of file contents
+    codec: typing.Optional[str] = None # compression codec for file contents (None stores them as-is)
+    level: typing.Optional[int] = None # compression level passed to the codec
+    _codec: typing.Optional[Codec] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _cache: typing.Optional[ValueCache] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _created_folders: typing.Set[pathlib.Path] = dataclasses.field(default_factory=set, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.path = pathlib.Path(self.path)
+        if self.shard_levels < 0 or self.shard_width < 1:
+            raise ValueError('shard_levels must be non-negative and shard_width must be positive.')
+        if self.workers < 1:
+            raise ValueError('workers must be positive.')
+        if self.cache_bytes > 0:
+            self._cache = ValueCache(self.cache_bytes)
+        if self.codec is not None:
+            self._codec = Codec(self.codec, self.level)
+
+    def write_bytes(self, data: bytes) -> str:
+        '''Write data to a file named by its hash (unless it exists) and return the name.'''
+        hash_value = self.get_md5(data)
+        if not self.exists(hash_value):
+            with self.open(hash_value, 'wb') as f:
+                f.write(self._codec.compress(data) if self._codec is not None else data)
+        return hash_value
+
+    def read_bytes(self, fname: str) -> bytes:
+        cache = self._cache if not self.cache_values else None
+        if cache is not None:
+            found, data = cache.get(fname)
+            if found:
+                return data
+        with self.open(fname, 'rb') as f:
+            data = f.read()
+        if self._codec is not None:
+            data = self._codec.decompress(data)
+        if cache is not None:
+            cache.put(fname, data, len(data))
+        return data
+
+    def read_value(self, fname: str, kind: str, loads: typing.Callable[[bytes], typing.Any]) -> typing.Any:
+        '''Read a file and parse it with loads. With cache_values, parsed values 
+            are cached by kind (how they were parsed) and file name.
+        '''
+        if self._cache is None or not self.cache_values:
+            return loads(self.read_bytes(fname))
+        found, value = self._cache.get((kind, fname))
+        if found:
+            return value
+        data = self.read_bytes(fname)
+        value = loads(data)
+        self._cache.put((kind, fname), value, len(data))
+        return value
 
     def exists(self, fname: str) -> bool:
         return self.joinpath(fname).exists()
 
     def open(self, fname: str, mode: str) -> typing.IO:
-        return self.joinpath(fname).open(mode)
+        fpath = self.joinpath(fname)
+        if self.shard_levels > 0 and mode[0] in 'wax' and fpath.parent not in self._created_folders:
+            fpath.parent.mkdir(parents=True, exist_ok=True)
+            self._created_folders.add(fpath.parent)
+        return fpath.open(mode)
 
-    def joinpath(self, fname):
-        return self.path.joinpath(fname)
+    def joinpath(self, fname: str) -> pathlib.Path:
+        return self.path.joinpath(*self.shard_folders(fname), fname)
+    
+    def shard_folders(self, fname: str) -> typing.List[str]:
+        '''Names of the nested folders that contain the given file.'''
+        w = self.shard_width
+        return [fname[i*w:(i+1)*w] for i in range(self.shard_levels)]
     
     def create_folder(self):
         self.path.mkdir(parents=True, exist_ok=True)
 
+    ################# Read Cache #################
+    def cache_info(self) -> typing.Dict[str, int]:
+        '''Hits, misses and current size of the read cache.'''
+        return self._cache.info() if self._cache is not None else dict()
+    
+    def clear_cache(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+
+    ################# Thread Pool #################
+    def map(self, func: typing.Callable[[typing.Any], typing.Any], items: typing.Iterable) -> typing.List[typing.Any]:
+        '''Apply func to every item, using the thread pool when workers > 1.'''
+        if self.workers == 1:
+            return [func(item) for item in items]
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        return list(self._executor.map(func, items))
+
+    def close(self) -> None:
+        '''Shut down the thread pool, if one was started.'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     @staticmethod
-    def get_md5(dumped_string: typing.Hashable):
+    def get_md5(dumped_string: typing.Union[str, bytes]):
+        if isinstance(dumped_string, str):
+            dumped_string = dumped_string.encode()
         return hashlib.md5(dumped_string).hexdigest()
     
-    
\ No newline at end of file
+    ################# Garbage Collection #################
+    def iter_sorted_names(self) -> typing.Generator[str, None, None]:
+        '''Iterate over names of files stored in this layout in sorted order, 
+            listing one folder at a time. Folder names are hash prefixes, so 
+            walking them in order yields globally sorted names.
+        '''
+        def walk(folder: pathlib.Path, level: int):
+            try:
+                names = sorted(os.listdir(folder))
+            except FileNotFoundError:
+                return
+            for name in names:
+                if level < self.shard_levels:
+                    if len(name) == self.shard_width:
+                        yield from walk(folder.joinpath(name), level + 1)
+                elif is_md5_hex(name):
+                    yield name
+        yield from walk(self.path, 0)
+
+    def remove_files(self, fnames: typing.List[str], dry_run: bool = False) -> int:
+        '''Delete files (in parallel when workers > 1) and return the bytes freed.'''
+        def remove(fname: str) -> int:
+            fpath = self.joinpath(fname)
+            try:
+                size = fpath.stat().st_size
+                if not dry_run:
+                    fpath.unlink()
+            except FileNotFoundError:
+                return 0
+            return size
+        return sum(self.map(remove, fnames))
+
+    ################# Layout Migration #################
+    def iter_files(self) -> typing.Generator[pathlib.Path, None, None]:
+        '''Iterate over all stored files in any layout (names must be md5 hex digests).'''
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for fname in filenames:
+                if is_md5_hex(fname):
+                    yield pathlib.Path(dirpath, fname)
+
+    def migrate_layout(self) -> int:
+        '''Move files written with any other layout (e.g. flat) into this layout, in place.
+            Folders left empty are removed. Returns the number of files moved.
+        '''
+        moved = 0
+        for fpath in list(self.iter_files()):
+            new_path = self.joinpath(fpath.name)
+            if fpath != new_path:
+                new_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(fpath, new_path)
+                moved += 1
+        
+        for dirpath, dirnames, filenames in os.walk(self.path, topdown=False):
+            if dirpath != str(self.path) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        self._created_folders.clear()
+        return moved
+
+@dataclasses.dataclass
+class ValueCache:
+    '''Thread-safe least-recently-used cache of file contents (or parsed values)
+        with a budget on their total size.
+    '''
+    max_bytes: int
+    nbytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    _entries: typing.OrderedDict[typing.Hashable, typing.Tuple[typing.Any, int]] = dataclasses.field(default_factory=collections.OrderedDict, repr=False)
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def get(self, key: typing.Hashable) -> typing.Tuple[bool, typing.Any]:
+        '''Return (True, value) on a hit and (False, None) on a miss.'''
+        with self._lock:
+            try:
+                value, size = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key: typing.Hashable, value: typing.Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.nbytes -= old_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self) -> typing.Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'nbytes': self.nbytes}
+
+def unreferenced(referenced: typing.Iterable[str], stored: typing.Iterable[str]) -> typing.Generator[str, None, None]:
+    '''Merge two sorted streams of names, yielding stored names that are not referenced.'''
+    referenced = iter(referenced)
+    ref = next(referenced, None)
+    for name in stored:
+        while ref is not None and ref < name:
+            ref = next(referenced, None)
+        if ref != name:
+            yield name
+
+def is_md5_hex(fname: str) -> bool:
+    '''Check whether a filename looks like an md5 hex digest.'''
+    return len(fname) == 32 and all(c in '0123456789abcdef' for c in fname)
+
+
+################# Batched Row Processing #################
+def write_file_columns(table: sqlalchemy.Table, rows: typing.List[typing.Dict[str, typing.Any]]) -> typing.List[typing.Dict[str, typing.Any]]:
+    '''Write the files of all batched file columns before an executemany insert.
+        Returns new rows holding the written file names.
+    '''
+    batched = [c for c in table.columns if isinstance(c.type, FileTypeBase) and c.type.batched]
+    batched = [c for c in batched if any(c.name in row for row in rows)]
+    if not len(batched):
+        return rows
+    
+    rows = [dict(row) for row in rows]
+    for col in batched:
+        idx = [i for i, row in enumerate(rows) if col.name in row]
+        for i, fname in zip(idx, col.type.write_batch([rows[i][col.name] for i in idx])):
+            rows[i][col.name] = fname
+    return rows
+
+def defer_batched_columns(cols: typing.List[sqlalchemy.Column]) -> typing.Tuple[typing.List[sqlalchemy.Column], typing.Dict[str, typing.Any]]:
+    '''Replace columns of batched types (file types with workers > 1, serialized 
+        types) with ones that select raw values, to be loaded afterwards with 
+        load_batched_columns.
+    '''
+    new_cols, deferred = list(), dict()
+    for col in cols:
+        col_type = getattr(col, 'type', None)
+        if getattr(col_type, 'batched', False):
+            new_cols.append(sqlalchemy.type_coerce(col, col_type.impl).label(col.name))
+            deferred[col.name] = col_type
+        else:
+            new_cols.append(col)
+    return new_cols, deferred
+
+def load_batched_columns(rows: typing.List[sqlalchemy.Row], deferred: typing.Dict[str, typing.Any]) -> typing.List[typing.Dict[str, typing.Any]]:
+    '''Decode raw values of deferred columns one batch at a time and return rows as dicts.'''
+    rows = [dict(row._mapping) for row in rows]
+    for name, col_type in deferred.items():
+        for row, value in zip(rows, col_type.read_batch([row[name] for row in rows])):
+            row[name] = value
+    return rows
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import pickle
+import json
+import sqlalchemy
+import gzip
+import zlib
+import lzma
+
+CODECS = ('gzip', 'zlib', 'lzma', 'zstd')
+
+@dataclasses.dataclass(frozen=True)
+class Codec:
+    '''Compression algorithm and level used by compressed column types.
+        The zstd codec requires the zstandard package.
+    '''
+    name: str = 'zlib'
+    level: typing.Optional[int] = None # None uses the default level of the codec
+
+    def __post_init__(self):
+        if self.name not in CODECS:
+            raise ValueError(f'Unknown codec "{self.name}". Choose one of {CODECS}.')
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == 'zlib':
+            return zlib.compress(data, -1 if self.level is None else self.level)
+        elif self.name == 'gzip':
+            # mtime=0 so equal values give equal bytes (and equal file hashes)
+            return gzip.compress(data, compresslevel=9 if self.level is None else self.level, mtime=0)
+        elif self.name == 'lzma':
+            return lzma.compress(data, preset=self.level)
+        else:
+            return zstd_module().ZstdCompressor(level=3 if self.level is None else self.level).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.name == 'zlib':
+            return zlib.decompress(data)
+        elif self.name == 'gzip':
+            return gzip.decompress(data)
+        elif self.name == 'lzma':
+            return lzma.decompress(data)
+        else:
+            return zstd_module().ZstdDecompressor().decompress(data)
+
+def zstd_module():
+    '''Import zstandard when it is first needed.'''
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError('The zstd codec requires the zstandard package: pip install zstandard') from e
+    return zstandard
+
+
+class CompressedTypeBase(sqlalchemy.types.TypeDecorator):
+    '''Base class for compressed types. Stores compressed blobs inline in the table.
+        The codec must not change once a column holds data.
+    '''
+    impl = sqlalchemy.types.LargeBinary
+    cache_ok = True
+
+    def __init__(self, codec: str = 'zlib', level: typing.Optional[int] = None, *arg, **kwargs):
+        self.codec = Codec(codec, level)
+        self.level = level
+        super().__init__(*arg, **kwargs)
+
+    ################# Used by sqlalchemy #################
+    def process_bind_param(self, value: typing.Any, dialect: str):
+        if value is not None:
+            return self.codec.compress(self.dumps(value))
+        else:
+            return None
+
+    def process_result_value(self, value: bytes, dialect: str):
+        if value is not None:
+            return self.loads(self.codec.decompress(value))
+        else:
+            return None
+
+    ################# Implemented by Subclass #################
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        '''Serialize a value to bytes.'''
+        raise NotImplementedError
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        '''Deserialize a value from bytes.'''
+        raise NotImplementedError
+
+
+class CompressedBytes(CompressedTypeBase):
+    cache_ok = True
+
+    @classmethod
+    def dumps(cls, data: bytes) -> bytes:
+        return bytes(data)
+
+    @classmethod
+    def loads(cls, data: bytes) -> bytes:
+        return data
+
+class CompressedText(CompressedTypeBase):
+    cache_ok = True
+
+    @classmethod
+    def dumps(cls, data: str) -> bytes:
+        return data.encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> str:
+        return data.decode()
+
+class CompressedJSON(CompressedTypeBase):
+    cache_ok = True
+
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        return json.dumps(data).encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        return json.loads(data)
+
+class CompressedPickle(CompressedTypeBase):
+    cache_ok = True
+
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        return pickle.dumps(data)
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        return pickle.loads(data)
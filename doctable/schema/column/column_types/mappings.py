@@ -10,6 +10,14 @@ import datetime
 from datetime import date, time, datetime
 from typing import Any
 
+from .array_types import NDArray
+from .epoch_types import EpochDateTime, EpochDate
+
+try:
+    from types import UnionType # X | Y hints (python 3.10+)
+except ImportError:
+    UnionType = None
+
 def type_mappings() -> typing.Dict[typing.Union[typing.Type,str], typing.Type[sqlalchemy.TypeClause]]:
     return ColumnTypeMatcher.type_hint_to_column_type_mapping
 
@@ -21,56 +29,193 @@ class PickleType(sqlalchemy.PickleType):
     '''Uses sqlalchemy's pickle mapping implementation.'''
     pass
 
+class TypeMappingDict(dict):
+    '''Mapping of type hints to column types that resets the lookup tables of 
+        ColumnTypeMatcher whenever it is changed.
+    '''
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        ColumnTypeMatcher.reset()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        ColumnTypeMatcher.reset()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        ColumnTypeMatcher.reset()
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        ColumnTypeMatcher.reset()
+        return value
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        ColumnTypeMatcher.reset()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        ColumnTypeMatcher.reset()
+        return item
+
+    def clear(self):
+        super().clear()
+        ColumnTypeMatcher.reset()
+
+
 class ColumnTypeMatcher:
-    type_hint_to_column_type_mapping = {
+    '''Resolves type hints to sqlalchemy column types. Hints are looked up as an
+        exact type, then along the MRO (so subclasses match their base type), then
+        by name for string hints. Optional[...], Annotated[...] and X | None are
+        unwrapped first. Results are memoized; changing the mapping (directly or 
+        through register()) resets the memo.
+    '''
+    type_hint_to_column_type_mapping = TypeMappingDict({
         int: sqlalchemy.Integer,
         float: sqlalchemy.Float,
-        bool: sqlalchemy.Boolean,
+        bool: sqlalchemy.Integer, # bool hints have always matched int (a base class); register(bool, sqlalchemy.Boolean) to change
         str: sqlalchemy.String,
         bytes: sqlalchemy.LargeBinary,
-        datetime: sqlalchemy.DateTime, # NOTE: datetime.datetime is subclass of datetime.date, so put it first
+        datetime: sqlalchemy.DateTime,
         time: sqlalchemy.Time,
         date: sqlalchemy.Date,
         PickleType: sqlalchemy.PickleType,
         #Any: sqlalchemy.PickleType,
-        'datetime.datetime': sqlalchemy.DateTime, # NOTE: datetime.datetime is subclass of datetime.date
-        'datetime.time': sqlalchemy.Time, # NOTE: datetime.datetime is subclass of datetime.date
-        'datetime.date': sqlalchemy.Date, # NOTE: datetime.datetime is subclass of datetime.date
+        'datetime.datetime': sqlalchemy.DateTime,
+        'datetime.time': sqlalchemy.Time,
+        'datetime.date': sqlalchemy.Date,
         #'Any': sqlalchemy.PickleType,
         JSON: sqlalchemy.types.JSON,
-    }
+        'numpy.ndarray': NDArray, # matched by name so numpy is only imported when used
+        'np.ndarray': NDArray,
+    })
+    _type_table: typing.Optional[typing.Dict[typing.Type, typing.Type[sqlalchemy.TypeClause]]] = None
+    _name_table: typing.Optional[typing.Dict[str, typing.Type[sqlalchemy.TypeClause]]] = None
+    _cache: typing.Dict[typing.Any, typing.Type[sqlalchemy.TypeClause]] = dict()
+
+    @classmethod
+    def register(cls, type_hint: typing.Union[typing.Type, str], column_type: typing.Type[sqlalchemy.TypeClause]) -> None:
+        '''Map a type (or a qualified name like 'numpy.ndarray') to a column type.'''
+        cls.type_hint_to_column_type_mapping[type_hint] = column_type
+
+    @classmethod
+    def reset(cls) -> None:
+        '''Discard the lookup tables and memoized results.'''
+        cls._type_table, cls._name_table = None, None
+        cls._cache.clear()
+
+    @classmethod
+    def use_epoch_types(cls, enable: bool = True) -> None:
+        '''Map datetime and date hints to EpochDateTime and EpochDate (integer
+            columns) instead of DateTime and Date. Column types are resolved when a 
+            schema first creates a table, so this affects schemas used afterwards.
+        '''
+        datetime_type, date_type = (EpochDateTime, EpochDate) if enable else (sqlalchemy.DateTime, sqlalchemy.Date)
+        for hint in (datetime, 'datetime.datetime'):
+            cls.register(hint, datetime_type)
+        for hint in (date, 'datetime.date'):
+            cls.register(hint, date_type)
 
     @classmethod
     def type_hint_to_column_type(cls, type_hint: typing.Union[typing.Type, str]) -> typing.Type[sqlalchemy.TypeClause]:
         '''Match type hint to sqlalchemy column type.'''
-        for mth, mct in cls.type_hint_to_column_type_mapping.items():
-            if cls.type_hint_matches(type_hint, mth):
-                #return (mct(**self.type_kwargs),)
-                return mct
-        raise TypeError(f'"{type_hint}" does not map to a valid column '
-            f'type. Choose one of {cls.type_hint_to_column_type_mapping.keys()}')
-            
-    @staticmethod
-    def type_hint_matches(type_hint: typing.Union[typing.Type, str], match_type_hint: typing.Type) -> bool:
-        '''Check if supplied type hint matches the given candidate.'''
-        
-        if type_hint == str(match_type_hint):
-            return True
-        
         try:
-            if type_hint == match_type_hint.__name__:
-                return True
-        except AttributeError as e:
+            return cls._cache[type_hint]
+        except KeyError:
             pass
+        except TypeError: # unhashable hint (e.g. Annotated with unhashable metadata)
+            return cls.resolve(type_hint)
         
-        try:
-            if issubclass(type_hint, match_type_hint): # type: ignore
-                return True
-            
-        except TypeError as e:
-            return False
+        column_type = cls.resolve(type_hint)
+        cls._cache[type_hint] = column_type
+        return column_type
 
-        return False
+    @classmethod
+    def resolve(cls, type_hint: typing.Union[typing.Type, str]) -> typing.Type[sqlalchemy.TypeClause]:
+        '''Resolve a hint without using the memo cache.'''
+        if cls._type_table is None:
+            cls.build_tables()
+        hint = cls.unwrap(type_hint)
+        
+        if isinstance(hint, str):
+            column_type = cls._name_table.get(hint)
+        elif isinstance(hint, type):
+            column_type = None
+            for t in hint.__mro__:
+                column_type = cls._type_table.get(t) or cls._name_table.get(f'{t.__module__}.{t.__qualname__}')
+                if column_type is not None:
+                    break
+        else:
+            column_type = None
+        
+        if column_type is None:
+            raise TypeError(f'"{type_hint}" does not map to a valid column '
+                f'type. Choose one of {cls.type_hint_to_column_type_mapping.keys()}')
+        return column_type
 
+    @classmethod
+    def build_tables(cls) -> None:
+        '''Split the mapping into an exact-type table and a name table.'''
+        type_table, name_table = dict(), dict()
+        for hint, column_type in cls.type_hint_to_column_type_mapping.items():
+            if isinstance(hint, str):
+                name_table[hint] = column_type
+            else:
+                type_table[hint] = column_type
+                for name in (hint.__name__, f'{hint.__module__}.{hint.__qualname__}', str(hint)):
+                    name_table.setdefault(name, column_type)
+        cls._type_table, cls._name_table = type_table, name_table
+
+    @classmethod
+    def unwrap(cls, type_hint: typing.Any) -> typing.Any:
+        '''Strip Optional, Annotated and quotes from a hint.'''
+        if isinstance(type_hint, str):
+            return cls.unwrap_str(type_hint)
+        
+        origin = typing.get_origin(type_hint)
+        if origin is typing.Annotated:
+            return cls.unwrap(typing.get_args(type_hint)[0])
+        elif origin is typing.Union or (UnionType is not None and origin is UnionType):
+            args = [a for a in typing.get_args(type_hint) if a is not type(None)]
+            if len(args) == 1:
+                return cls.unwrap(args[0])
+        return type_hint
 
+    @classmethod
+    def unwrap_str(cls, hint: str) -> str:
+        '''Strip Optional, Annotated and quotes from a string (postponed) annotation.'''
+        hint = hint.strip().strip('\'"').strip()
+        for prefix in ('typing.', 'typing_extensions.', 't.'):
+            if hint.startswith(prefix):
+                hint = hint[len(prefix):]
+        
+        if hint.endswith(']') and (hint.startswith('Optional[') or hint.startswith('Annotated[')):
+            inner = hint[hint.index('[')+1:-1]
+            return cls.unwrap_str(split_top_level(inner)[0])
+        
+        parts = split_top_level(hint, '|')
+        if len(parts) > 1:
+            parts = [p for p in parts if p.strip() != 'None']
+            if len(parts) == 1:
+                return cls.unwrap_str(parts[0])
+        return hint
 
+def split_top_level(hint: str, sep: str = ',') -> typing.List[str]:
+    '''Split a string hint on sep, ignoring separators inside brackets.'''
+    parts, depth, start = list(), 0, 0
+    for i, c in enumerate(hint):
+        if c == '[':
+            depth += 1
+        elif c == ']':
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(hint[start:i].strip())
+            start = i + 1
+    parts.append(hint[start:].strip())
+    return parts
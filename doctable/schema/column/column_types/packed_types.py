@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import pickle
+import sqlalchemy
+import os
+import re
+import pathlib
+import hashlib
+import threading
+
+from .gzip_types import Codec
+
+try:
+    import fcntl
+except ImportError: # not available on windows
+    fcntl = None
+
+SEGMENT_NAME_PATTERN = re.compile(r'^(\d+)\.seg$')
+
+class PackedTypeBase(sqlalchemy.types.TypeDecorator):
+    '''Base class for packed types. Appends serialized values to large segment
+        files and stores a "segment:offset:length:hash" reference in the column.
+    '''
+    impl = sqlalchemy.types.String # just stores reference internally
+    cache_ok = False # the control object is not hashable (subclasses must set this too)
+
+    def __init__(self, packed_store_control: PackedStoreControl, *arg, **kwargs):
+        self.control = packed_store_control
+        self.control.create_folder()
+
+        super().__init__(*arg, **kwargs)
+
+    ################# Used by sqlalchemy #################
+    def process_bind_param(self, value: typing.Any, dialect: str):
+        if value is not None:
+            return self.control.append(self.control.encode(self.dumps(value))).to_str()
+        else:
+            return None
+
+    def process_result_value(self, ref_str: str, dialect: str):
+        if self.control.raw:
+            return ref_str
+        elif ref_str is not None:
+            return self.loads(self.control.decode(self.control.read(PackedRef.from_str(ref_str))))
+        else:
+            return None
+
+    ################# Implemented by Subclass #################
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        '''Serialize a value to bytes.'''
+        raise NotImplementedError
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        '''Deserialize a value from bytes.'''
+        raise NotImplementedError
+
+
+class PackedBlobType(PackedTypeBase):
+    '''Stores raw bytes in segment files.'''
+    cache_ok = False
+
+    @classmethod
+    def dumps(cls, data: bytes) -> bytes:
+        return bytes(data)
+
+    @classmethod
+    def loads(cls, data: bytes) -> bytes:
+        return data
+
+class PackedPickleType(PackedTypeBase):
+    '''Stores pickled python objects in segment files.'''
+    cache_ok = False
+
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        return pickle.dumps(data)
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        return pickle.loads(data)
+
+
+@dataclasses.dataclass(frozen=True)
+class PackedRef:
+    '''Location of a value inside a segment file.'''
+    segment: int
+    offset: int
+    length: int
+    hash: str
+
+    @classmethod
+    def from_str(cls, ref_str: str) -> PackedRef:
+        segment, offset, length, hash_value = ref_str.split(':')
+        return cls(int(segment), int(offset), int(length), hash_value)
+
+    def to_str(self) -> str:
+        return f'{self.segment}:{self.offset}:{self.length}:{self.hash}'
+
+
+@dataclasses.dataclass
+class PackedStoreControl:
+    '''Controls a store that appends values to append-only segment files.
+        A new segment is started once the current one exceeds segment_size bytes.
+        Appends are serialized with a lock (and flock across processes where
+        available). Values are read with os.pread on cached file descriptors.
+        Space from deleted or updated rows is reclaimed with
+        DBTable.compact_packed_column(), which must not run alongside writers.
+        Set codec (see Codec) to compress each value; it must not change once 
+        the store holds data.
+    '''
+    path: pathlib.Path # path to folder where segments are stored
+    raw: bool = False # access raw references instead of data
+    segment_size: int = 2**28 # bytes after which a new segment is started
+    verify: bool = False # check the md5 hash of every value that is read
+    codec: typing.Optional[str] = None # compression codec for values (None stores them as-is)
+    level: typing.Optional[int] = None # compression level passed to the codec
+    _codec: typing.Optional[Codec] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _read_fds: typing.Dict[int, int] = dataclasses.field(default_factory=dict, init=False, repr=False, compare=False)
+    _write_fd: typing.Optional[int] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _write_segment: typing.Optional[int] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.path = pathlib.Path(self.path)
+        if self.codec is not None:
+            self._codec = Codec(self.codec, self.level)
+
+    def create_folder(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    ################# Segments #################
+    def segment_path(self, segment: int) -> pathlib.Path:
+        return self.path.joinpath(f'{segment:08d}.seg')
+
+    def segment_ids(self) -> typing.List[int]:
+        '''Ids of all segment files in the store, in order.'''
+        matches = [SEGMENT_NAME_PATTERN.match(fname) for fname in os.listdir(self.path)]
+        return sorted(int(m.group(1)) for m in matches if m is not None)
+
+    def size_on_disk(self) -> int:
+        '''Total size of all segment files in bytes.'''
+        return sum(self.segment_path(s).stat().st_size for s in self.segment_ids())
+
+    def _open_write_segment(self, segment: int) -> None:
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+        self._write_fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._write_segment = segment
+
+    ################# Reading and Writing #################
+    def encode(self, data: bytes) -> bytes:
+        return self._codec.compress(data) if self._codec is not None else data
+
+    def decode(self, data: bytes) -> bytes:
+        return self._codec.decompress(data) if self._codec is not None else data
+
+    def append(self, data: bytes) -> PackedRef:
+        '''Append a value to the current segment and return its location.'''
+        hash_value = hashlib.md5(data).hexdigest()
+        with self._lock:
+            if self._write_fd is None:
+                existing = self.segment_ids()
+                self._open_write_segment(existing[-1] if existing else 1)
+
+            if fcntl is not None:
+                fcntl.flock(self._write_fd, fcntl.LOCK_EX)
+            try:
+                offset = os.fstat(self._write_fd).st_size
+                if offset > 0 and offset + len(data) > self.segment_size:
+                    # closing the old segment also releases its flock
+                    self._open_write_segment(self._write_segment + 1)
+                    if fcntl is not None:
+                        fcntl.flock(self._write_fd, fcntl.LOCK_EX)
+                    offset = os.fstat(self._write_fd).st_size
+
+                view = memoryview(data)
+                while len(view):
+                    view = view[os.write(self._write_fd, view):]
+                return PackedRef(self._write_segment, offset, len(data), hash_value)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._write_fd, fcntl.LOCK_UN)
+
+    def read(self, ref: PackedRef) -> bytes:
+        '''Read the bytes of a single value.'''
+        try:
+            fd = self._read_fds[ref.segment]
+        except KeyError:
+            fd = os.open(self.segment_path(ref.segment), os.O_RDONLY)
+            self._read_fds[ref.segment] = fd
+
+        data = os.pread(fd, ref.length, ref.offset)
+        if len(data) != ref.length:
+            raise ValueError(f'Segment {ref.segment} is truncated: could not read {ref.to_str()}.')
+        if self.verify and hashlib.md5(data).hexdigest() != ref.hash:
+            raise ValueError(f'Hash mismatch when reading {ref.to_str()}.')
+        return data
+
+    def close(self) -> None:
+        '''Close all cached file descriptors.'''
+        with self._lock:
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
+            if self._write_fd is not None:
+                os.close(self._write_fd)
+            self._write_fd, self._write_segment = None, None
+
+    ################# Compaction #################
+    def start_segment(self) -> typing.List[int]:
+        '''Start writing to a new segment and return the ids of the existing ones. 
+            Used by compaction: live values are copied into the new segments with 
+            copy(), and the old ones deleted with remove_segments() once the 
+            database references have been updated.
+        '''
+        old_segments = self.segment_ids()
+        with self._lock:
+            self._open_write_segment(old_segments[-1] + 1 if old_segments else 1)
+        return old_segments
+
+    def copy(self, ref: PackedRef) -> str:
+        '''Append a copy of a value to the current segment and return its new reference string.'''
+        return self.append(self.read(ref)).to_str()
+
+    def remove_segments(self, segments: typing.Iterable[int]) -> None:
+        '''Delete segment files that no longer hold live values.'''
+        with self._lock:
+            for segment in segments:
+                if segment in self._read_fds:
+                    os.close(self._read_fds.pop(segment))
+                if segment == self._write_segment:
+                    raise ValueError(f'Cannot remove segment {segment} while it is being written to.')
+                self.segment_path(segment).unlink()
+
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import typing
+import datetime
+import json
+import sqlalchemy
+
+def encode_default(obj: typing.Any) -> typing.Any:
+    '''Fallback encoder for values the serializers do not handle natively:
+        numpy scalars and arrays, and datetimes (as ISO 8601 strings).
+    '''
+    if type(obj).__module__ == 'numpy': # checked by name so numpy is never imported here
+        return obj.tolist() if hasattr(obj, 'shape') and obj.shape != () else obj.item()
+    elif isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable.')
+
+
+class Serializer:
+    '''Converts JSON-like values to and from bytes.'''
+    name: str
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> typing.Any:
+        raise NotImplementedError
+
+    def loads_many(self, values: typing.List[typing.Optional[bytes]]) -> typing.List[typing.Any]:
+        '''Decode a whole batch of values (None values are kept as None).'''
+        return [self.loads(v) if v is not None else None for v in values]
+
+class JSONSerializer(Serializer):
+    '''Standard library json.'''
+    name = 'json'
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        return json.dumps(obj, default=encode_default).encode()
+
+    def loads(self, data: bytes) -> typing.Any:
+        return json.loads(data)
+
+    def loads_many(self, values: typing.List[typing.Optional[bytes]]) -> typing.List[typing.Any]:
+        # parse the batch as one json array
+        return json.loads(b'[' + b','.join(v if v is not None else b'null' for v in values) + b']')
+
+class OrjsonSerializer(Serializer):
+    '''orjson, which serializes numpy arrays and datetimes natively.'''
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson # imported here so it is only required when used
+        self.orjson = orjson
+        self.option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        return self.orjson.dumps(obj, default=encode_default, option=self.option)
+
+    def loads(self, data: bytes) -> typing.Any:
+        return self.orjson.loads(data)
+
+    def loads_many(self, values: typing.List[typing.Optional[bytes]]) -> typing.List[typing.Any]:
+        return self.orjson.loads(b'[' + b','.join(v if v is not None else b'null' for v in values) + b']')
+
+class MsgpackSerializer(Serializer):
+    '''msgpack, a compact binary format.'''
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        return self.msgpack.packb(obj, default=encode_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> typing.Any:
+        return self.msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    def loads_many(self, values: typing.List[typing.Optional[bytes]]) -> typing.List[typing.Any]:
+        # values are self-delimiting, so the batch can be unpacked as one stream
+        unpacker = self.msgpack.Unpacker(raw=False, strict_map_key=False, max_buffer_size=0)
+        unpacker.feed(b''.join(v if v is not None else b'\xc0' for v in values)) # 0xc0 is nil
+        return list(unpacker)
+
+
+SERIALIZERS: typing.Dict[str, typing.Type[Serializer]] = {
+    'json': JSONSerializer,
+    'orjson': OrjsonSerializer,
+    'msgpack': MsgpackSerializer,
+}
+_instances: typing.Dict[str, Serializer] = dict()
+
+def get_serializer(serializer: typing.Union[str, Serializer]) -> Serializer:
+    '''Get a serializer by name (json, orjson or msgpack), or pass one through.'''
+    if isinstance(serializer, Serializer):
+        return serializer
+    if serializer not in _instances:
+        try:
+            _instances[serializer] = SERIALIZERS[serializer]()
+        except KeyError as e:
+            raise ValueError(f'Unknown serializer "{serializer}". Choose one of {list(SERIALIZERS)}.') from e
+    return _instances[serializer]
+
+
+class SerializedJSON(sqlalchemy.types.TypeDecorator):
+    '''Stores JSON-like values in a binary column using a selectable serializer
+        (json, orjson or msgpack). Numpy values and datetimes are encoded too, 
+        though datetimes are read back as ISO 8601 strings. Selects through 
+        TableQuery decode each fetched batch with a single call.
+    '''
+    impl = sqlalchemy.types.LargeBinary
+    cache_ok = True
+    batched = True # see TableQuery.select
+
+    def __init__(self, serializer: typing.Union[str, Serializer] = 'json', *arg, **kwargs):
+        self.serializer = get_serializer(serializer)
+        super().__init__(*arg, **kwargs)
+
+    def process_bind_param(self, value: typing.Any, dialect: str):
+        if value is not None:
+            return self.serializer.dumps(value)
+        else:
+            return None
+
+    def process_result_value(self, value: bytes, dialect: str):
+        if value is not None:
+            return self.serializer.loads(value)
+        else:
+            return None
+
+    def read_batch(self, values: typing.List[typing.Optional[bytes]], dialect: str = None) -> typing.List[typing.Any]:
+        return self.serializer.loads_many(values)
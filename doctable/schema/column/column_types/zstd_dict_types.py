@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import json
+import struct
+import threading
+import weakref
+import sqlalchemy
+import sqlalchemy.exc
+
+from .gzip_types import zstd_module
+
+if typing.TYPE_CHECKING:
+    import zstandard
+
+# doctable-managed side table holding trained dictionaries for all columns
+DICT_TABLE_NAME = '_doctable_zstd_dicts'
+dict_metadata = sqlalchemy.MetaData()
+dict_table = sqlalchemy.Table(DICT_TABLE_NAME, dict_metadata,
+    sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column('name', sqlalchemy.String, nullable=False, index=True),
+    sqlalchemy.Column('data', sqlalchemy.LargeBinary, nullable=False),
+)
+
+HEADER = struct.Struct('<I') # id of the dictionary a value was compressed with (0 is none)
+
+class ZstdDictTypeBase(sqlalchemy.types.TypeDecorator):
+    '''Base class for types compressed with a shared, trained zstd dictionary.
+        Each value is stored as the id of its dictionary followed by a zstd frame,
+        so values compressed with older dictionaries stay readable. Train or
+        retrain the dictionary with DBTable.train_zstd_dict.
+    '''
+    impl = sqlalchemy.types.LargeBinary
+    cache_ok = False # the control object is not hashable (subclasses must set this too)
+
+    def __init__(self, zstd_dict_control: ZstdDictControl, *arg, **kwargs):
+        self.control = zstd_dict_control
+        super().__init__(*arg, **kwargs)
+
+    ################# Used by sqlalchemy #################
+    def process_bind_param(self, value: typing.Any, dialect: sqlalchemy.engine.Dialect):
+        if value is not None:
+            return self.control.compress(self.dumps(value), dialect)
+        else:
+            return None
+
+    def process_result_value(self, value: bytes, dialect: sqlalchemy.engine.Dialect):
+        if value is not None:
+            return self.loads(self.control.decompress(value, dialect))
+        else:
+            return None
+
+    ################# Implemented by Subclass #################
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        '''Serialize a value to bytes.'''
+        raise NotImplementedError
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        '''Deserialize a value from bytes.'''
+        raise NotImplementedError
+
+
+class ZstdDictText(ZstdDictTypeBase):
+    cache_ok = False
+
+    @classmethod
+    def dumps(cls, data: str) -> bytes:
+        return data.encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> str:
+        return data.decode()
+
+class ZstdDictJSON(ZstdDictTypeBase):
+    cache_ok = False
+
+    @classmethod
+    def dumps(cls, data: typing.Any) -> bytes:
+        return json.dumps(data).encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> typing.Any:
+        return json.loads(data)
+
+
+@dataclasses.dataclass
+class ZstdDictState:
+    '''Dictionaries of a control in one database.'''
+    engine: weakref.ref # the engine is owned by its ConnectCore
+    dicts: typing.Dict[int, zstandard.ZstdCompressionDict] = dataclasses.field(default_factory=dict)
+    current_id: typing.Optional[int] = None
+    local: threading.local = dataclasses.field(default_factory=threading.local)
+
+
+@dataclasses.dataclass
+class ZstdDictControl:
+    '''Dictionaries of one dictionary-compressed column (or several columns
+        sharing a name). Dictionaries are loaded from the side table of each 
+        database the column is used in, when they are first needed. Values are
+        matched to their database by the dialect sqlalchemy passes to the type,
+        which belongs to a single engine, so one schema can be used with 
+        several databases that each train their own dictionaries.
+    '''
+    name: str # key of the dictionaries in the side table
+    level: int = 3 # zstd compression level
+    _states: weakref.WeakKeyDictionary = dataclasses.field(default_factory=weakref.WeakKeyDictionary, init=False, repr=False, compare=False)
+
+    def bind(self, engine: sqlalchemy.engine.Engine) -> None:
+        '''Load dictionaries for values of this engine from its database.'''
+        if engine.dialect not in self._states:
+            self._states[engine.dialect] = ZstdDictState(engine=weakref.ref(engine))
+
+    def state(self, dialect: sqlalchemy.engine.Dialect) -> ZstdDictState:
+        try:
+            return self._states[dialect]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'zstd dictionary control "{self.name}" is not bound to this database. '
+                'Use it in a table created with ConnectCore.') from e
+
+    ################# Compression #################
+    def compress(self, data: bytes, dialect: sqlalchemy.engine.Dialect) -> bytes:
+        state = self.state(dialect)
+        dict_id = self.current_id(dialect)
+        return HEADER.pack(dict_id) + self.compressor(dict_id, state).compress(data)
+
+    def decompress(self, value: bytes, dialect: sqlalchemy.engine.Dialect) -> bytes:
+        dict_id, = HEADER.unpack_from(value)
+        return self.decompressor(dict_id, self.state(dialect)).decompress(value[HEADER.size:])
+
+    @staticmethod
+    def dict_id(value: bytes) -> int:
+        '''Id of the dictionary a stored value was compressed with.'''
+        return HEADER.unpack_from(value)[0]
+
+    def compressor(self, dict_id: int, state: ZstdDictState) -> zstandard.ZstdCompressor:
+        # zstd (de)compressors may not be shared between threads
+        compressors = state.local.__dict__.setdefault('compressors', dict())
+        if dict_id not in compressors:
+            zstd = zstd_module()
+            if dict_id == 0:
+                compressors[dict_id] = zstd.ZstdCompressor(level=self.level)
+            else:
+                compressors[dict_id] = zstd.ZstdCompressor(level=self.level, dict_data=self.get_dict(dict_id, state))
+        return compressors[dict_id]
+
+    def decompressor(self, dict_id: int, state: ZstdDictState) -> zstandard.ZstdDecompressor:
+        decompressors = state.local.__dict__.setdefault('decompressors', dict())
+        if dict_id not in decompressors:
+            zstd = zstd_module()
+            if dict_id == 0:
+                decompressors[dict_id] = zstd.ZstdDecompressor()
+            else:
+                decompressors[dict_id] = zstd.ZstdDecompressor(dict_data=self.get_dict(dict_id, state))
+        return decompressors[dict_id]
+
+    ################# Dictionaries #################
+    def current_id(self, dialect: sqlalchemy.engine.Dialect) -> int:
+        '''Id of the dictionary used for new values (0 before one is trained).'''
+        state = self.state(dialect)
+        if state.current_id is None:
+            state.current_id = self.query_current_id(state)
+        return state.current_id
+
+    def get_dict(self, dict_id: int, state: ZstdDictState) -> zstandard.ZstdCompressionDict:
+        if dict_id not in state.dicts:
+            q = sqlalchemy.select(dict_table.c.data).where(dict_table.c.id == dict_id)
+            with self.connect(state) as conn:
+                data = conn.execute(q).scalar_one_or_none()
+            if data is None:
+                raise KeyError(f'zstd dictionary {dict_id} of "{self.name}" is not in {DICT_TABLE_NAME}.')
+            state.dicts[dict_id] = zstd_module().ZstdCompressionDict(data)
+        return state.dicts[dict_id]
+
+    def query_current_id(self, state: ZstdDictState) -> int:
+        q = sqlalchemy.select(sqlalchemy.func.max(dict_table.c.id)).where(dict_table.c.name == self.name)
+        with self.connect(state) as conn:
+            try:
+                return conn.execute(q).scalar_one() or 0
+            except sqlalchemy.exc.OperationalError: # side table was never created
+                return 0
+
+    def train(self, samples: typing.List[bytes], dict_size: int, conn: sqlalchemy.engine.Connection) -> int:
+        '''Train a new dictionary and add it to the side table of the connection's
+            database. Returns its id; call set_current() once the transaction has 
+            been committed.
+        '''
+        state = self.state(conn.dialect)
+        zstd_dict = zstd_module().train_dictionary(dict_size, samples, level=self.level)
+        dict_metadata.create_all(conn)
+        result = conn.execute(sqlalchemy.insert(dict_table).values(name=self.name, data=zstd_dict.as_bytes()))
+        dict_id = result.inserted_primary_key[0]
+        state.dicts[dict_id] = zstd_dict
+        return dict_id
+
+    def set_current(self, dict_id: int, dialect: sqlalchemy.engine.Dialect) -> None:
+        '''Compress new values of this database with the given dictionary.'''
+        self.state(dialect).current_id = dict_id
+
+    def connect(self, state: ZstdDictState) -> sqlalchemy.engine.Connection:
+        engine = state.engine()
+        if engine is None:
+            raise ValueError(f'The database of zstd dictionary control "{self.name}" was closed.')
+        return engine.connect()
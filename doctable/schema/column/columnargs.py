@@ -43,6 +43,7 @@ class ColumnArgs:
         type_kwargs: keyword arguments to pass to sqlalchemy type. only used when type inferred from python type hint
         use_type: use this type instead of inferring from python type hint
         sqlalchemy_type: type of column in database using sqlachemy types (any kwargs should be passed directly here)
+        serializer: store JSON-like values in a binary column with this serializer ('json', 'orjson' or 'msgpack')
         autoincrement: whether to autoincrement the column
         nullable: whether the column can be null
         unique: whether the column is unique
@@ -54,6 +55,10 @@ class ColumnArgs:
         server_default: default value for column on server side
         server_onupdate: function to call when column is updated on server side
         comment: comment to add to column in database
+        generated: SQL expression of a generated column, e.g. "length(text)". The
+            value is computed by the database and never inserted.
+        stored: whether a generated column is STORED (True) or VIRTUAL (False). 
+            None uses the database default.
         other_kwargs: see Column.__init__ link above for any other kwargs not listed here
     '''
     order: int = float('inf')
@@ -61,6 +66,7 @@ class ColumnArgs:
     type_kwargs: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
     use_type: typing.Optional[typing.Type] = None
     sqlalchemy_type: typing.Optional[sqlalchemy.TypeClause] = None# provide an sqlalchemy type
+    serializer: typing.Optional[str] = None
     autoincrement: bool = False
     nullable: bool = True
     unique: bool = None
@@ -72,6 +78,8 @@ class ColumnArgs:
     server_default: typing.Union[str, sqlalchemy.FetchedValue, sqlalchemy.Text] = None
     server_onupdate: sqlalchemy.FetchedValue = None
     comment: str = None
+    generated: typing.Optional[str] = None
+    stored: typing.Optional[bool] = None
     other_kwargs: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
 
     def __post_init__(self):
@@ -85,6 +93,24 @@ class ColumnArgs:
         if self.use_type is not None and self.sqlalchemy_type is not None:
             raise ValueError('Only one of use_type and sqlalchemy_type can '
                 f'be provided. Use sqlalchemy_type to pass kwargs to type.')
+        if self.serializer is not None and (self.sqlalchemy_type is not None or self.use_type is not None):
+            raise ValueError('serializer cannot be combined with sqlalchemy_type or use_type. '
+                'Pass the serializer to the type directly instead.')
+        if self.generated is not None and any([
+            self.default is not None, self.server_default is not None,
+            self.onupdate is not None, self.server_onupdate is not None,
+            self.primary_key, self.autoincrement,
+        ]):
+            raise ValueError('Generated columns cannot have defaults, update '
+                'functions, or be primary keys: the database computes their values.')
+        if self.stored is not None and self.generated is None:
+            raise ValueError('stored only applies to generated columns.')
+    
+    def sqlalchemy_computed(self) -> typing.Optional[sqlalchemy.Computed]:
+        '''Get the generated column clause or None.'''
+        if self.generated is None:
+            return None
+        return sqlalchemy.Computed(self.generated, persisted=self.stored)
     
     def sqlalchemy_foreign_key(self) -> typing.Union[sqlalchemy.ForeignKey, None]:
         '''Get a foreign key object or None.'''
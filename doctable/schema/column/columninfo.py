@@ -6,7 +6,7 @@ import sqlalchemy
 import datetime
 
 from .columnargs import ColumnArgs, get_column_args, has_column_args
-from .column_types import ColumnTypeMatcher
+from .column_types import ColumnTypeMatcher, SerializedJSON
 
 
 @dataclasses.dataclass
@@ -27,11 +27,13 @@ class ColumnInfo:
         )
 
     @classmethod
-    def from_field(cls, field: dataclasses.Field, defined_order: int) -> ColumnInfo:
-        '''Get column info from a dataclass field after dataclass is created.'''
+    def from_field(cls, field: dataclasses.Field, defined_order: int, type_hint: typing.Optional[typing.Any] = None) -> ColumnInfo:
+        '''Get column info from a dataclass field after dataclass is created.
+            type_hint is the evaluated annotation, if the field's is a string.
+        '''
         return cls(
             attr_name=field.name,
-            type_hint=field.type,
+            type_hint=type_hint if type_hint is not None else field.type,
             defined_order = defined_order,
             column_args=get_column_args(field) if has_column_args(field) else ColumnArgs(),
         )
@@ -42,23 +44,25 @@ class ColumnInfo:
         '''Get a sqlalchemy column from this column info.
             Raises KeyError if there is no match.
         '''
-        return sqlalchemy.Column(
-            self.final_name(),
-            *self.column_type_args(),
-            **self.column_args.sqlalchemy_column_kwargs(),
+        return self.compile().sqlalchemy_column()
+
+    def compile(self) -> CompiledColumn:
+        '''Resolve the column type and arguments, which can be reused to build columns.'''
+        return CompiledColumn(
+            name=self.final_name(),
+            type_args=self.column_type_args(),
+            column_args=self.column_args,
+            kwargs=self.column_args.sqlalchemy_column_kwargs(),
         )
 
-    def column_type_args(self) -> typing.Union[typing.Tuple[sqlalchemy.ForeignKey], typing.Tuple[sqlalchemy.TypeClause, sqlalchemy.ForeignKey]]:
-        fk = self.column_args.sqlalchemy_foreign_key()
-        if fk is None:
-            fk = tuple()
-        else:
-            fk = (sqlalchemy.ForeignKey(fk),)
-        
+    def column_type_args(self) -> typing.Tuple[sqlalchemy.TypeClause, ...]:
+        '''Column type, or an empty tuple if it is inferred from the foreign key.'''
         if self.column_args.sqlalchemy_type is not None:
-            return (self.column_args.sqlalchemy_type,) + fk
-        elif len(fk):
-            return fk # infer column type from foreign key
+            return (self.column_args.sqlalchemy_type,)
+        elif self.column_args.foreign_key is not None:
+            return tuple() # infer column type from foreign key
+        elif self.column_args.serializer is not None:
+            return (SerializedJSON(self.column_args.serializer, **self.column_args.type_kwargs),)
         elif self.column_args.use_type is not None:
             coltype = ColumnTypeMatcher.type_hint_to_column_type(self.column_args.use_type)
             return (coltype(**self.column_args.type_kwargs),)
@@ -71,6 +75,8 @@ class ColumnInfo:
         '''Guess sqlclehmy type here - use column_type_args for correct version.'''
         if self.column_args.sqlalchemy_type is not None:
             return self.column_args.sqlalchemy_type
+        elif self.column_args.serializer is not None:
+            return SerializedJSON
         elif self.column_args.use_type is not None:
             return ColumnTypeMatcher.type_hint_to_column_type(self.column_args.use_type)
         else:
@@ -105,10 +111,31 @@ class ColumnInfo:
             'Col Name': self.final_name(),
             'Col Type': col_type,
             'Attr Name': self.attr_name,
-            'Hint': self.type_hint.__name__,
+            'Hint': getattr(self.type_hint, '__name__', str(self.type_hint)),
             'Order': self.order_key(),
             'Primary Key': self.column_args.primary_key,
             'Foreign Key': self.column_args.foreign_key is not None,
             'Index': self.column_args.index,
             'Default': default.__name__ if default is not None else None,
+            'Generated': self.column_args.generated,
         }
+
+
+@dataclasses.dataclass
+class CompiledColumn:
+    '''Resolved arguments of a column. Type objects are shared between the 
+        columns built from it, but each column gets its own ForeignKey and 
+        Computed objects.
+    '''
+    name: str
+    type_args: typing.Tuple[sqlalchemy.TypeClause, ...]
+    column_args: ColumnArgs
+    kwargs: typing.Dict[str, typing.Any]
+
+    def sqlalchemy_column(self) -> sqlalchemy.Column:
+        items = self.type_args
+        if self.column_args.foreign_key is not None:
+            items += (self.column_args.sqlalchemy_foreign_key(),)
+        if self.column_args.generated is not None:
+            items += (self.column_args.sqlalchemy_computed(),)
+        return sqlalchemy.Column(self.name, *items, **self.kwargs)
@@ -5,5 +5,7 @@ from .tableschema import TableSchema, get_schema, set_schema
 from .tableschemainspector import TableSchemaInspector, inspect_schema
 
 from .index import Index
+from .fts import FTS
 from .constraints import UniqueConstraint, CheckConstraint, ForeignKey, PrimaryKeyConstraint
 from .general import Container
+from .tuplecontainer import TupleContainer
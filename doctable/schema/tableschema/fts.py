@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import typing
+import dataclasses
+import sqlalchemy
+import sqlalchemy.dialects.sqlite
+
+def FTS(*column_names: typing.List[str], tokenize: typing.Optional[str] = None, suffix: str = '_fts') -> FTSParams:
+    '''Full-text search index passed to table_schema(fts=...). Creates an SQLite
+        FTS5 external-content table over the given text columns, kept in sync
+        with the main table by triggers. Query it with TableQuery.search.
+        Args:
+            column_names: text columns to index.
+            tokenize: FTS5 tokenizer, e.g. "porter unicode61".
+            suffix: the FTS table is named after the main table plus this suffix.
+    '''
+    return FTSParams(
+        column_names=column_names,
+        tokenize=tokenize,
+        suffix=suffix,
+    )
+
+@dataclasses.dataclass
+class FTSParams:
+    '''Information passed by user.'''
+    column_names: typing.Tuple[str, ...]
+    tokenize: typing.Optional[str] = None
+    suffix: str = '_fts'
+
+    def __post_init__(self):
+        if not len(self.column_names):
+            raise ValueError('Provide at least one column to build a full-text search index over.')
+
+    def fts_table_name(self, table_name: str) -> str:
+        return f'{table_name}{self.suffix}'
+
+    @staticmethod
+    def rowid_column(table: sqlalchemy.Table) -> sqlalchemy.Column:
+        '''The INTEGER PRIMARY KEY column of the table. The FTS table is keyed on it 
+            because SQLite may renumber implicit rowids (e.g. on VACUUM).
+        '''
+        pk_cols = list(table.primary_key.columns)
+        if len(pk_cols) != 1 or pk_cols[0].type.compile(dialect=sqlalchemy.dialects.sqlite.dialect()) != 'INTEGER':
+            raise ValueError(f'Full-text search on {table.name} requires a single INTEGER PRIMARY KEY column '
+                '(e.g. id: int = Column(column_args=ColumnArgs(primary_key=True, autoincrement=True))).')
+        return pk_cols[0]
+
+    def ddl(self, table_name: str, rowid_name: str) -> typing.List[str]:
+        '''Statements creating the FTS5 table and the triggers that keep it in sync.'''
+        fts, table, rowid = quote(self.fts_table_name(table_name)), quote(table_name), quote(rowid_name)
+        cols = ', '.join(quote(c) for c in self.column_names)
+        new_cols = ', '.join(f'new.{quote(c)}' for c in self.column_names)
+        old_cols = ', '.join(f'old.{quote(c)}' for c in self.column_names)
+        options = f", content={quote_str(table_name)}, content_rowid={quote_str(rowid_name)}"
+        if self.tokenize is not None:
+            options += f", tokenize={quote_str(self.tokenize)}"
+        delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{rowid}, {old_cols});"
+        insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.{rowid}, {new_cols});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}{options})",
+            f"CREATE TRIGGER IF NOT EXISTS {quote(self.fts_table_name(table_name) + '_ai')} AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {quote(self.fts_table_name(table_name) + '_ad')} AFTER DELETE ON {table} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {quote(self.fts_table_name(table_name) + '_au')} AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+        ]
+
+    def rebuild_statement(self, table_name: str) -> str:
+        '''Statement that reindexes all rows of the main table.'''
+        fts = quote(self.fts_table_name(table_name))
+        return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+    def attach(self, table: sqlalchemy.Table) -> None:
+        '''Create the FTS table and triggers whenever the main table is created (SQLite only).'''
+        missing = [c for c in self.column_names if c not in table.c]
+        if len(missing):
+            raise KeyError(f'Full-text search columns {missing} are not columns of {table.name}.')
+        for statement in self.ddl(table.name, self.rowid_column(table).name):
+            ddl = sqlalchemy.DDL(statement.replace('%', '%%')).execute_if(dialect='sqlite')
+            sqlalchemy.event.listen(table, 'after_create', ddl)
+
+    def sqlalchemy_table(self, table_name: str) -> sqlalchemy.sql.expression.TableClause:
+        '''Lightweight table used to build search queries. Its rowid is the
+            primary key of the main table.
+        '''
+        return sqlalchemy.table(self.fts_table_name(table_name), sqlalchemy.column('rowid'), sqlalchemy.column('rank'))
+
+def quote(name: str) -> str:
+    '''Quote an SQL identifier.'''
+    return '"' + name.replace('"', '""') + '"'
+
+def quote_str(value: str) -> str:
+    '''Quote an SQL string literal.'''
+    return "'" + value.replace("'", "''") + "'"
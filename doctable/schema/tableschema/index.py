@@ -4,17 +4,53 @@ import typing
 import dataclasses
 import sqlalchemy
 
-def Index(*column_names: typing.List[str], **kwargs: typing.Dict[str, typing.Any]) -> IndexParams:
+IndexElement = typing.Union[str, sqlalchemy.sql.expression.ColumnElement, sqlalchemy.sql.expression.TextClause]
+
+def Index(
+    *column_names: typing.List[IndexElement], 
+    where: typing.Optional[typing.Union[str, sqlalchemy.sql.expression.ColumnElement]] = None,
+    desc: typing.Sequence[str] = tuple(),
+    include: typing.Sequence[str] = tuple(),
+    **kwargs: typing.Dict[str, typing.Any],
+) -> IndexParams:
+    '''Parameters of an index passed to table_schema(indices=...).
+        Args:
+            column_names: column names or expressions. Strings that are not plain 
+                names are used as SQL expressions, e.g. "lower(name)" or 
+                "json_extract(meta, '$.source')".
+            where: predicate of a partial index, e.g. "status = 'pending'".
+            desc: names of columns (in column_names) to sort in descending order.
+            include: extra columns appended to the index so queries that only 
+                use them can be answered from the index alone (covering index). 
+                SQLite has no INCLUDE clause, so these only widen the index key; 
+                they cannot be combined with unique=True, which would then 
+                enforce uniqueness over the included columns too.
+            kwargs: passed to sqlalchemy.Index (e.g. unique=True).
+    '''
     return IndexParams(
         column_names=column_names,
         kwargs=kwargs,
+        where=where,
+        desc=tuple(desc),
+        include=tuple(include),
     )
 
 @dataclasses.dataclass
 class IndexParams:
     '''Information passed by user.'''
-    column_names: typing.List[str]
+    column_names: typing.List[IndexElement]
     kwargs: typing.Dict[str, typing.Any]
+    where: typing.Optional[typing.Union[str, sqlalchemy.sql.expression.ColumnElement]] = None
+    desc: typing.Tuple[str, ...] = tuple()
+    include: typing.Tuple[str, ...] = tuple()
+
+    def __post_init__(self):
+        unknown = [c for c in self.desc if c not in self.column_names]
+        if len(unknown):
+            raise ValueError(f'Descending columns {unknown} are not among the index columns {self.column_names}.')
+        if len(self.include) and self.kwargs.get('unique', False):
+            raise ValueError(f'Included columns {list(self.include)} would become part of the unique key. '
+                'Use a separate unique index without include.')
 
     @classmethod
     def default(cls, *column_names: typing.List[str]) -> IndexParams:
@@ -24,7 +60,24 @@ class IndexParams:
         )
     
     def sqlalchemy_index(self, name: str) -> sqlalchemy.Index:
-        return sqlalchemy.Index(name, *self.column_names, **self.kwargs)
+        elements = [self.element(c) for c in self.column_names] + [self.element(c) for c in self.include]
+        kwargs = dict(self.kwargs)
+        if self.where is not None:
+            where = sqlalchemy.text(self.where) if isinstance(self.where, str) else self.where
+            kwargs.setdefault('sqlite_where', where)
+            kwargs.setdefault('postgresql_where', where)
+        return sqlalchemy.Index(name, *elements, **kwargs)
+    
+    def element(self, column: IndexElement) -> IndexElement:
+        '''Column name, or sql expression for expressions and descending columns.'''
+        if not isinstance(column, str):
+            return column
+        elif column in self.desc:
+            return sqlalchemy.text(f'{column} DESC')
+        elif column.isidentifier():
+            return column
+        else:
+            return sqlalchemy.text(column)
     
 @dataclasses.dataclass
 class IndexInfo:
@@ -52,6 +105,15 @@ class IndexInfo:
     def info_dict(self) -> typing.Dict[str, typing.Any]:
         return {
             'name': self.name,
-            'columns': ', '.join(self.params.column_names),
+            'columns': ', '.join(f'{c} DESC' if c in self.params.desc else str(c) for c in self.params.column_names),
+            'include': ', '.join(self.params.include),
+            'where': self.where_str(),
             'kwargs': ', '.join([f'{k}: {v}' for k,v in self.params.kwargs.items()]),
         }
+
+    def where_str(self) -> typing.Optional[str]:
+        '''Predicate of a partial index as SQL.'''
+        where = self.params.where
+        if where is None or isinstance(where, str):
+            return where
+        return str(where.compile(compile_kwargs={'literal_binds': True}))
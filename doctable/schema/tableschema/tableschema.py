@@ -4,12 +4,26 @@ import typing
 import dataclasses
 import sqlalchemy
 import functools
+import weakref
+import copy
 
 from ..column import ColumnInfo
+from ..column.columninfo import CompiledColumn
 from .index import IndexInfo, IndexParams
+from .fts import FTSParams
 from ..missing import MISSING
 
 from .general import set_schema, get_schema, Container
+from .tuplecontainer import TupleContainer
+
+def resolve_type_hints(container_type: typing.Type) -> typing.Dict[str, typing.Any]:
+    '''Evaluate postponed (string) annotations where possible. Returns an empty 
+        dict if any cannot be evaluated, in which case the string hints are used.
+    '''
+    try:
+        return typing.get_type_hints(container_type, include_extras=True)
+    except Exception: # e.g. names only imported under TYPE_CHECKING
+        return dict()
 
 @dataclasses.dataclass
 class AttrColNameMappings:
@@ -18,6 +32,7 @@ class AttrColNameMappings:
     col_to_attr: typing.Dict[str, str]
     empty_col_kwargs: typing.Dict[str, typing.Any]
     empty_attr_kwargs: typing.Dict[str, typing.Any]
+    generated_attrs: typing.FrozenSet[str] # read-only attributes computed by the database
 
     @classmethod
     def from_column_infos(cls, column_infos: typing.List[ColumnInfo]) -> AttrColNameMappings:
@@ -29,6 +44,7 @@ class AttrColNameMappings:
             col_to_attr = col_to_attr, 
             empty_col_kwargs = {k: MISSING for k in col_to_attr.keys()},
             empty_attr_kwargs = {k: MISSING for k in attr_to_col.keys()},
+            generated_attrs = frozenset(ci.attr_name for ci in column_infos if ci.column_args.generated is not None),
         )
 
 @dataclasses.dataclass
@@ -42,6 +58,9 @@ class TableSchema(typing.Generic[Container]):
     constraints: typing.List[sqlalchemy.Constraint]
     table_kwargs: typing.Dict[str, typing.Any] # extra args meant to be passed when creating table
     name_mappings:AttrColNameMappings # attribute name to column mapping
+    fts: typing.Optional[FTSParams] = None # full-text search index
+    _compiled: typing.Optional[typing.List[CompiledColumn]] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    _tables: weakref.WeakKeyDictionary = dataclasses.field(default_factory=weakref.WeakKeyDictionary, init=False, repr=False, compare=False)
 
     @classmethod
     def from_container(cls, 
@@ -50,6 +69,7 @@ class TableSchema(typing.Generic[Container]):
         indices: typing.Dict[str, IndexParams],
         constraints: typing.List[sqlalchemy.Constraint],
         table_kwargs: typing.Dict[str, typing.Any],
+        fts: typing.Optional[FTSParams] = None,
     ) -> TableSchema[Container]:
         '''Create from basic args - called directly from decorator.'''
         column_infos = cls.parse_column_infos(container_type)
@@ -62,27 +82,58 @@ class TableSchema(typing.Generic[Container]):
             constraints=constraints,
             table_kwargs=table_kwargs,
             name_mappings = AttrColNameMappings.from_column_infos(column_infos),
+            fts=fts,
         )
     
     @staticmethod
     def parse_column_infos(container_type: typing.Type[Container]) -> typing.List[ColumnInfo]:
         '''Get column infos from a container type.'''
-        infos = [ColumnInfo.from_field(field, i) for i, field in enumerate(dataclasses.fields(container_type))]
+        hints = resolve_type_hints(container_type)
+        infos = [ColumnInfo.from_field(field, i, hints.get(field.name)) for i, field in enumerate(dataclasses.fields(container_type))]
         return list(sorted(infos, key=lambda ci: ci.order_key()))
 
     #################### Converting to/from Container Types ####################
     def container_from_row(self, row: sqlalchemy.Row) -> Container:
         '''Get a data container from a row.'''
+        return self.container_from_dict(row._mapping)
+    
+    def container_from_dict(self, values: typing.Mapping[str, typing.Any]) -> Container:
+        '''Get a data container from a mapping of column names to values.'''
         col_to_attr = self.name_mappings.col_to_attr
         kwargs = {
             **self.name_mappings.empty_attr_kwargs, 
-            **{col_to_attr[k]:v for k,v in row._mapping.items()}
+            **{col_to_attr[k]:v for k,v in values.items()}
         }
         return self.container_type(**kwargs)
     
+    def container_factory(self, col_names: typing.Sequence[str]) -> typing.Callable[[typing.Iterable[typing.Any]], Container]:
+        '''Get a function that makes a container from the values of one row, 
+            given the names of the selected columns in row order.
+        '''
+        col_to_attr = self.name_mappings.col_to_attr
+        attrs = [col_to_attr[c] for c in col_names]
+        if issubclass(self.container_type, TupleContainer):
+            fields = self.container_type._fields
+            if tuple(attrs) == fields:
+                return self.container_type._make # rows are already in field order
+            positions = [fields.index(a) for a in attrs]
+            empty = [MISSING] * len(fields)
+            def make_tuple(values: typing.Iterable[typing.Any]) -> Container:
+                ordered = list(empty)
+                for i, v in zip(positions, values):
+                    ordered[i] = v
+                return self.container_type._make(ordered)
+            return make_tuple
+        
+        empty = self.name_mappings.empty_attr_kwargs
+        return lambda values: self.container_type(**{**empty, **dict(zip(attrs, values))})
+
     def dict_from_container(self, container: Container) -> typing.Dict[str, typing.Any]:
-        '''Get a dictionary representation of this schema for insertion, ignoring MISSING values.'''
+        '''Get a dictionary representation of this schema for insertion, ignoring 
+            MISSING values and generated columns.
+        '''
         attr_to_col = self.name_mappings.attr_to_col
+        generated = self.name_mappings.generated_attrs
         try:
             # NOTE: this old implementation does recursive serialization
             #values = dataclasses.asdict(container).items()
@@ -90,7 +141,7 @@ class TableSchema(typing.Generic[Container]):
             
             # add type hint?  (Container is dataclasses.DataclassInstance)
             fields = dataclasses.fields(container)
-            return {attr_to_col[f.name]:v for f in fields if (v := getattr(container, f.name)) is not MISSING}
+            return {attr_to_col[f.name]:v for f in fields if (v := getattr(container, f.name)) is not MISSING and f.name not in generated}
             
         except TypeError as e:
             raise TypeError(f'"{container}" is not a recognized container. '
@@ -107,16 +158,40 @@ class TableSchema(typing.Generic[Container]):
         return (self.table_name, self.table_args(), {**self.table_kwargs, **kwargs})
     
     def table_args(self) -> typing.List[typing.Union[sqlalchemy.Column, sqlalchemy.Index, sqlalchemy.Constraint]]:
-        '''Get a list of table args.'''
-        return self.sqlalchemy_columns() + self.sqlalchemy_indices() + list(self.constraints)
+        '''Get a list of table args. These are new objects each time (sqlalchemy 
+            objects belong to a single table), built from the cached compiled columns.
+        '''
+        return self.sqlalchemy_columns() + self.sqlalchemy_indices() + self.sqlalchemy_constraints()
 
     def sqlalchemy_columns(self) -> typing.List[sqlalchemy.Column]:
-        return [ci.sqlalchemy_column() for ci in self.columns]
+        return [cc.sqlalchemy_column() for cc in self.compiled_columns()]
+
+    def compiled_columns(self) -> typing.List[CompiledColumn]:
+        '''Column types and arguments, resolved once per schema.'''
+        if self._compiled is None:
+            self._compiled = [ci.compile() for ci in self.columns]
+        return self._compiled
 
     def sqlalchemy_indices(self) -> typing.List[sqlalchemy.Index]:
         '''Get list of sqlalchemy indices.'''
         return [ii.sqlalchemy_index() for ii in self.indices]
 
+    def sqlalchemy_constraints(self) -> typing.List[sqlalchemy.Constraint]:
+        '''Copies of the constraints, so each table gets its own (the originals 
+            are never attached to a table).
+        '''
+        return [copy.deepcopy(c) for c in self.constraints]
+
+    def cached_table(self, metadata: sqlalchemy.MetaData) -> typing.Optional[sqlalchemy.Table]:
+        '''Table previously built from this schema in metadata, if it is still there.'''
+        table = self._tables.get(metadata)
+        if table is not None and metadata.tables.get(table.key) is table:
+            return table
+        return None
+
+    def cache_table(self, metadata: sqlalchemy.MetaData, table: sqlalchemy.Table) -> None:
+        self._tables[metadata] = table
+
     #################### Column Name Mappings ####################
     @staticmethod
     def get_column_mappings(column_infos: typing.List[ColumnInfo]) -> typing.Tuple[typing.Dict[str, str], typing.Dict[str, str], typing.Set[str]]:
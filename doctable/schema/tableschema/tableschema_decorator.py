@@ -5,11 +5,11 @@ import dataclasses
 import sqlalchemy
 import functools
 
-import copy
-
 from .index import IndexInfo, IndexParams
+from .fts import FTSParams
 
 from .tableschema import TableSchema
+from .tuplecontainer import tuple_container
 from .general import set_schema, get_schema, Container
 
 def table_schema(
@@ -17,6 +17,7 @@ def table_schema(
     table_name: typing.Optional[str] = None,
     indices: typing.Optional[typing.Dict[str, IndexParams]] = None,
     constraints: typing.Optional[typing.List[sqlalchemy.Constraint]] = None,
+    fts: typing.Optional[FTSParams] = None,
     init: bool = True, # these are all dataclass arguments (superset from 3.12)
     repr: bool = True, # passed to dataclasses.dataclass()
     eq: bool = True, # passed to dataclasses.dataclass()
@@ -27,13 +28,23 @@ def table_schema(
     kw_only: typing.Optional[bool] = None, # passed to dataclasses.dataclass()
     slots: typing.Optional[bool] = None, # passed to dataclasses.dataclass()
     weakref_slot: typing.Optional[bool] = None, # passed to dataclasses.dataclass()
+    container: typing.Literal['dataclass', 'tuple'] = 'dataclass',
     **table_kwargs: typing.Dict[str, typing.Any],
 ) -> typing.Callable[[typing.Type[Container]], typing.Type[Container]]:
     '''A decorator to change a regular class into a schema object class.
+        Args:
+            fts: full-text search index over text columns (see doctable.FTS).
+            container: 'dataclass' (default) makes the class a dataclass. 'tuple'
+                makes an immutable tuple subclass with named accessors and no
+                per-instance __dict__ (see TupleContainer), which selects can
+                construct directly from positional rows.
     '''
-    # handle case with no indices or constraints
-    indices = copy.deepcopy(indices) if indices is not None else dict()
-    constraints = copy.deepcopy(constraints) if constraints is not None else list()
+    if container not in ('dataclass', 'tuple'):
+        raise ValueError(f'container must be "dataclass" or "tuple", not "{container}".')
+    
+    # handle case with no indices or constraints (constraints are copied for each table)
+    indices = dict(indices) if indices is not None else dict()
+    constraints = list(constraints) if constraints is not None else list()
     
     #if table_name is None and _Cls is not None:
     #    table_name = _Cls.__name__
@@ -77,6 +88,8 @@ def table_schema(
                 raise e
         
         NewCls = dataclass_decorator(Cls)
+        if container == 'tuple':
+            NewCls = tuple_container(Cls, NewCls)
         
         # NOTE: don't need this since we re-used the original class
         #wrap_decorator = functools.wraps(Cls)
@@ -89,6 +102,7 @@ def table_schema(
             indices = indices,
             constraints = constraints,
             table_kwargs = table_kwargs,
+            fts = fts,
         )
         set_schema(NewCls, schema)
 
@@ -5,7 +5,9 @@ import typing
 import dataclasses
 import sqlalchemy
 import functools
-import pandas as pd
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
 from .general import set_schema, get_schema, Container
 
@@ -36,6 +38,7 @@ class TableSchemaInspector:
     
     def index_info_df(self) -> pd.DataFrame:
         '''Get a dataframe of index information.'''
+        import pandas as pd
         return pd.DataFrame(self.index_info())
     
     def index_info(self) -> typing.List[typing.Dict[str, typing.Any]]:
@@ -44,6 +47,7 @@ class TableSchemaInspector:
     
     def column_info_df(self) -> pd.DataFrame:
         '''Get a dataframe of column information.'''
+        import pandas as pd
         return pd.DataFrame(self.column_info())
     
     def column_info(self) -> typing.List[typing.Dict[str, typing.Any]]:
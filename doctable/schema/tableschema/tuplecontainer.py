@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import typing
+import dataclasses
+import operator
+
+class TupleContainer(tuple):
+    '''Base class of tuple-backed containers made by table_schema(container='tuple').
+        Values are stored in a tuple subclass with no per-instance __dict__, and
+        are accessed by attribute name. Containers are immutable: use _replace()
+        to get a modified copy.
+    '''
+    __slots__ = ()
+    _fields: typing.Tuple[str, ...] = ()
+    _defaults: typing.Dict[str, typing.Callable[[], typing.Any]] = dict()
+
+    def __new__(cls, *args, **kwargs):
+        if len(args) > len(cls._fields):
+            raise TypeError(f'{cls.__name__}() takes {len(cls._fields)} positional arguments but {len(args)} were given')
+        values = list(args)
+        for name in cls._fields[len(args):]:
+            if name in kwargs:
+                values.append(kwargs.pop(name))
+            elif name in cls._defaults:
+                values.append(cls._defaults[name]())
+            else:
+                raise TypeError(f'{cls.__name__}() missing required argument: "{name}"')
+        if len(kwargs):
+            raise TypeError(f'{cls.__name__}() got unexpected or repeated arguments: {list(kwargs)}')
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def _make(cls, values: typing.Iterable[typing.Any]) -> TupleContainer:
+        '''Make a container directly from values in field order.'''
+        return tuple.__new__(cls, values)
+
+    def _asdict(self) -> typing.Dict[str, typing.Any]:
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **kwargs) -> TupleContainer:
+        '''Copy of this container with some values changed.'''
+        return self._make([kwargs.pop(name, v) for name, v in zip(self._fields, self)])
+
+    def __getnewargs__(self) -> typing.Tuple:
+        return tuple(self)
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{name}={v!r}' for name, v in zip(self._fields, self))
+        return f'{type(self).__name__}({values})'
+
+
+def tuple_container(Cls: typing.Type, DataCls: typing.Type) -> typing.Type[TupleContainer]:
+    '''Make a tuple-backed container type from a class body (Cls) and its
+        dataclass version (DataCls), which provides the fields.
+    '''
+    fields = dataclasses.fields(DataCls)
+    names = tuple(f.name for f in fields)
+
+    defaults = dict()
+    for f in fields:
+        if f.default is not dataclasses.MISSING:
+            defaults[f.name] = (lambda v=f.default: v)
+        elif f.default_factory is not dataclasses.MISSING:
+            defaults[f.name] = f.default_factory
+
+    # keep methods and class attributes of the original class body
+    namespace = {k: v for k, v in Cls.__dict__.items() if k not in names and k not in (
+        '__dict__', '__weakref__', '__init__', '__repr__', '__eq__', '__hash__',
+        '__match_args__', '__dataclass_params__', '__slots__',
+    )}
+    namespace.update({name: property(operator.itemgetter(i), doc=f'Alias for field {i}.') for i, name in enumerate(names)})
+    namespace.update({
+        '__slots__': (),
+        '__match_args__': names,
+        '_fields': names,
+        '_defaults': defaults,
+        '__dataclass_fields__': DataCls.__dataclass_fields__, # so dataclasses.fields() still works
+    })
+    return type(Cls.__name__, (TupleContainer,), namespace)
+
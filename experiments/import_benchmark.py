@@ -0,0 +1,36 @@
+'''Measure how long `import doctable` takes in a fresh interpreter.
+    Usage: python import_benchmark.py [num_runs] [max_seconds]
+    Exits with a non-zero status if the median import time exceeds max_seconds.
+'''
+import subprocess
+import statistics
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_CODE = '''
+import time
+start = time.perf_counter()
+import doctable
+print(time.perf_counter() - start)
+'''
+
+def time_import(module_code: str = IMPORT_CODE) -> float:
+    '''Time a single import of doctable in a new process.'''
+    out = subprocess.run([sys.executable, '-c', module_code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+def run_benchmark(num_runs: int = 10, max_seconds: float = None) -> float:
+    times = [time_import() for _ in range(num_runs)]
+    median = statistics.median(times)
+    print(f'import doctable: median={median:0.3f}s min={min(times):0.3f}s max={max(times):0.3f}s ({num_runs} runs)')
+    if max_seconds is not None and median > max_seconds:
+        print(f'median import time exceeded {max_seconds}s')
+        sys.exit(1)
+    return median
+
+if __name__ == '__main__':
+    num_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    run_benchmark(num_runs, max_seconds)
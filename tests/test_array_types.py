@@ -0,0 +1,70 @@
+import os
+import shutil
+import numpy as np
+import sys
+sys.path.append('..')
+import doctable
+from doctable.schema.column.column_types.array_types import encode_array
+
+
+def test_ndarray_type():
+    @doctable.table_schema(table_name='embeddings')
+    class Embedding:
+        vec: np.ndarray
+        mat: 'np.ndarray' = None
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Embedding)
+    assert(isinstance(tab['vec'].type, doctable.NDArray) and isinstance(tab['mat'].type, doctable.NDArray))
+
+    fortran = np.asfortranarray(np.arange(12, dtype=np.int16).reshape(3, 4))
+    data = [
+        Embedding(vec=np.random.rand(16).astype(np.float32), mat=fortran),
+        Embedding(vec=np.array(3.5), mat=np.zeros((0, 3))),
+        Embedding(vec=np.arange(10)[::2], mat=None),
+    ]
+    with tab.query() as q:
+        q.insert_multi(data)
+        results = q.select(order_by=[tab['id']])
+    
+    for d, r in zip(data, results):
+        assert(r.vec.dtype == d.vec.dtype and r.vec.shape == d.vec.shape)
+        assert(np.array_equal(r.vec, d.vec))
+    assert(np.array_equal(results[0].mat, fortran) and results[0].mat.flags.f_contiguous)
+    assert(results[1].mat.shape == (0, 3) and results[2].mat is None)
+    assert(not results[0].vec.flags.writeable) # a view of the fetched bytes
+
+    try:
+        encode_array(np.array([{}, []], dtype=object))
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+def test_ndarray_file_type(folder: str = 'tmp_array_files'):
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    control = doctable.FileTypeControl(folder)
+
+    @doctable.table_schema(table_name='arrays')
+    class Arrays:
+        arr: np.ndarray = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.NDArrayFileType(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Arrays)
+
+    arrays = [np.random.rand(100, 8), np.arange(5, dtype=np.uint8)]
+    with tab.query() as q:
+        q.insert_multi([Arrays(arr=a) for a in arrays])
+        results = q.select(order_by=[tab['id']])
+    for a, r in zip(arrays, results):
+        assert(isinstance(r.arr, np.memmap) and np.array_equal(r.arr, a))
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_ndarray_type()
+    test_ndarray_file_type()
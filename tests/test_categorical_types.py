@@ -0,0 +1,112 @@
+import os
+import sqlalchemy
+import pandas as pd
+import sys
+sys.path.append('..')
+import doctable
+
+
+def categorical_container(control: doctable.CategoryControl):
+    @doctable.table_schema(table_name='tokens', indices={'ix_pos': doctable.Index('pos')})
+    class Token:
+        text: str
+        pos: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.Categorical(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+    return Token
+
+def test_categorical(fname: str = 'test_categorical.db'):
+    if os.path.exists(fname):
+        os.remove(fname)
+
+    control = doctable.CategoryControl('pos')
+    Token = categorical_container(control)
+    core = doctable.ConnectCore.open(target=fname, dialect='sqlite', lock_settings=doctable.LockSettings(busy_timeout=0.1))
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Token)
+
+    tags = ['NOUN', 'VERB', 'ADJ', None]
+    with t.query() as q:
+        q.insert_multi([Token(text=f'w{i}', pos=tags[i % 4]) for i in range(20)])
+        q.insert_single(Token(text='x', pos='ADV'))
+
+        # the main table only stores small ids
+        raw = q.cquery.select([sqlalchemy.type_coerce(t['pos'], sqlalchemy.Integer)]).scalars().all()
+        assert(set(raw) == {1, 2, 3, 4, None})
+
+        tokens = q.select(order_by=[t['id']])
+        assert([tok.pos for tok in tokens[:5]] == ['NOUN', 'VERB', 'ADJ', None, 'NOUN'] and tokens[-1].pos == 'ADV')
+        assert(len(q.select(where=t['pos'] == 'VERB')) == 5)
+        q.update_single({'pos': 'PRON'}, where=t['text'] == 'x')
+        assert(q.select(where=t['text'] == 'x')[0].pos == 'PRON')
+        
+        # comparisons only look categories up, so unknown values match nothing
+        assert(len(q.select(where=t['pos'] == 'UNSEEN')) == 0)
+        assert(len(q.select(where=t['pos'].in_(['VERB', 'UNSEEN']))) == 5)
+    assert(control.categories() == ['NOUN', 'VERB', 'ADJ', 'ADV', 'PRON'])
+
+    # categories added in a rolled back transaction are forgotten
+    with core.query() as q:
+        q.insert_multi(t, [{'text': 'y', 'pos': 'DET'}])
+        q.conn.rollback()
+    assert('DET' not in control.categories())
+
+    # values bound by other statements are added in the transaction that holds the write lock
+    with t.query() as q:
+        q.insert_single(Token(text='z', pos='NUM'))
+        q.cquery.execute_statement(sqlalchemy.update(t.table).where(t['text'] == 'z').values(pos=sqlalchemy.bindparam('npos')), [{'npos': 'INTJ'}])
+        assert(q.select(where=t['text'] == 'z')[0].pos == 'INTJ')
+        q.update_many([{'oldtext': 'z', 'pos': 'SYM'}], where=t['text'] == sqlalchemy.bindparam('oldtext'))
+        assert(q.select(where=t['text'] == 'z')[0].pos == 'SYM')
+        q.cquery.execute_statement(sqlalchemy.insert(t.table).values(text='zz', pos='CONJ'))
+    assert(control.categories()[-4:] == ['NUM', 'INTJ', 'SYM', 'CONJ'])
+
+    # selects to dataframes produce pandas categoricals
+    with core.query() as q:
+        df = q.select(t.all_cols()).df()
+    assert(isinstance(df['pos'].dtype, pd.CategoricalDtype))
+    assert(list(df['pos'].cat.categories) == control.categories())
+    assert(df['pos'].value_counts()['NOUN'] == 5)
+    with core.query() as q:
+        q.execute_statement(sqlalchemy.delete(t.table).where(t['text'].in_(['z', 'zz'])))
+
+    # a new process loads the mapping from the side table
+    core.dispose_engine()
+    control2 = doctable.CategoryControl('pos')
+    core2 = doctable.ConnectCore.open(target=fname, dialect='sqlite')
+    with core2.begin_ddl() as emitter:
+        t2 = emitter.create_table_if_not_exists(categorical_container(control2))
+    with t2.query() as q:
+        assert([tok.pos for tok in q.select(limit=3, order_by=[t2['id']])] == ['NOUN', 'VERB', 'ADJ'])
+    core2.dispose_engine()
+    os.remove(fname)
+
+def test_categorical_databases():
+    control = doctable.CategoryControl('pos')
+    Token = categorical_container(control)
+    tables = list()
+    for tags in (['NOUN'], ['VERB', 'NOUN']):
+        core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+        with core.begin_ddl() as emitter:
+            t = emitter.create_table(Token)
+        with t.query() as q:
+            q.insert_multi([Token(text=tag.lower(), pos=tag) for tag in tags])
+        tables.append(t)
+
+    # each database keeps its own ids
+    a, b = tables
+    with a.query() as q:
+        assert([tok.pos for tok in q.select()] == ['NOUN'])
+        assert(q.select(where=a['pos'] == 'NOUN')[0].text == 'noun')
+    with b.query() as q:
+        assert([tok.pos for tok in q.select(order_by=[b['id']])] == ['VERB', 'NOUN'])
+    assert(control.categories(a.core.engine) == ['NOUN'] and control.categories(b.core.engine) == ['VERB', 'NOUN'])
+    try:
+        control.categories()
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    test_categorical()
+    test_categorical_databases()
@@ -0,0 +1,136 @@
+import os
+import shutil
+import sqlalchemy
+import sys
+sys.path.append('..')
+import doctable
+
+
+def test_compressed_types():
+    @doctable.table_schema(table_name='compressed')
+    class Compressed:
+        text: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.CompressedText()))
+        meta: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.CompressedJSON('gzip', 6)))
+        obj: list = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.CompressedPickle('lzma')))
+        data: bytes = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.CompressedBytes('zstd', 10)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Compressed)
+    
+    text = 'the quick brown fox jumps over the lazy dog. ' * 100
+    with tab.query() as q:
+        q.insert_multi([
+            Compressed(text=text, meta={'a': [1, 2]}, obj=[{'x': 1}], data=b'\x00' * 1000),
+            Compressed(text=None, meta=None, obj=None, data=None),
+        ])
+        results = q.select(order_by=[tab['id']])
+        raw = q.cquery.execute_sql('SELECT text, data FROM compressed WHERE id=1').one()
+    
+    assert(results[0].text == text and results[0].meta == {'a': [1, 2]})
+    assert(results[0].obj == [{'x': 1}] and results[0].data == b'\x00' * 1000)
+    assert(results[1].text is None and results[1].data is None)
+    assert(len(raw[0]) < len(text) / 10 and len(raw[1]) < 100)
+
+    try:
+        doctable.CompressedText('brotli')
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+def test_compressed_files(folder: str = 'tmp_compressed_files'):
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    control = doctable.FileTypeControl(folder, codec='zlib')
+    packed = doctable.PackedStoreControl(os.path.join(folder, 'packed'), codec='gzip')
+
+    @doctable.table_schema(table_name='files')
+    class Files:
+        text: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.TextFileType(control)))
+        obj: list = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.PackedPickleType(packed)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Files)
+    
+    text = 'abc' * 1000
+    with tab.query() as q:
+        q.insert_multi([Files(text=text, obj=[text])])
+        result = q.select()[0]
+    assert(result.text == text and result.obj == [text])
+    
+    # files are named by the hash of the uncompressed text
+    fname = control.get_md5(text)
+    assert(control.exists(fname) and control.joinpath(fname).stat().st_size < 100)
+    assert(packed.size_on_disk() < 100)
+    packed.close()
+    shutil.rmtree(folder)
+
+def test_zstd_dict_types():
+    control = doctable.ZstdDictControl('sentences')
+
+    @doctable.table_schema(table_name='sentences')
+    class Sentence:
+        text: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.ZstdDictText(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Sentence)
+    
+    subjects, verbs = ['The committee', 'Our analysis', 'This report', 'The senator'], ['suggests', 'found', 'argued', 'notes']
+    texts = [f'{subjects[i%4]} {verbs[(i//4)%4]} that policy {i} would affect the federal budget next year.' for i in range(2000)]
+    with tab.query() as q:
+        q.insert_multi([Sentence(text=t) for t in texts])
+    
+    stats = tab.train_zstd_dict('text', sample_size=1000, dict_size=2**12, batch_size=300)
+    assert(stats['dict_id'] == 1 and stats['recompressed'] == 2000)
+    assert(stats['bytes_after'] < stats['bytes_before'] / 2)
+
+    with tab.query() as q:
+        q.insert_multi([Sentence(text='A new sentence.')])
+        assert([s.text for s in q.select(order_by=[tab['id']])] == texts + ['A new sentence.'])
+        raw = q.cquery.execute_sql('SELECT text FROM sentences').scalars().all()
+    assert(all(control.dict_id(r) == 1 for r in raw))
+
+    # retraining keeps values readable while they are recompressed
+    assert(tab.train_zstd_dict('text', recompress=False)['dict_id'] == 2)
+    with tab.query() as q:
+        q.insert_multi([Sentence(text='Another sentence.')])
+        assert(len(q.select()) == 2002)
+    
+    # a second database using the same schema trains its own dictionaries
+    core_b = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core_b.begin_ddl() as emitter:
+        tab_b = emitter.create_table(Sentence)
+    with tab_b.query() as q:
+        q.insert_multi([Sentence(text=t) for t in texts[::-1]])
+    assert(tab_b.train_zstd_dict('text', sample_size=500, dict_size=2**12)['dict_id'] == 1)
+    with tab.query() as q:
+        q.insert_multi([Sentence(text='Written after the other database trained.')])
+        raw = q.cquery.execute_sql('SELECT text FROM sentences ORDER BY id').scalars().all()
+        assert(q.select(order_by=[tab['id']])[-1].text == 'Written after the other database trained.')
+    assert(control.dict_id(raw[-1]) == 2)
+    with tab_b.query() as q:
+        assert([s.text for s in q.select(order_by=[tab_b['id']], limit=2)] == texts[::-1][:2])
+
+    # a fresh control loads dictionaries from the side table
+    other = doctable.ZstdDictControl('sentences')
+    other.bind(core.engine)
+    dialect = core.engine.dialect
+    assert(other.current_id(dialect) == 2 and other.decompress(raw[0], dialect) == texts[0].encode())
+    assert(other.decompress(raw[-1], dialect) == b'Written after the other database trained.')
+
+    try:
+        tab.train_zstd_dict('id')
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    test_compressed_types()
+    test_compressed_files()
+    test_zstd_dict_types()
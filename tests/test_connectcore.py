@@ -163,9 +163,101 @@ def test_new_table2(test_table: str = 'test'):
     assert(test_table in ce.inspect_table_names())
 
 
+def test_reflection_cache(test_fname: str = 'test_cache.db', cache_fname: str = 'test_cache.db.reflect'):
+    for fname in (test_fname, cache_fname):
+        if os.path.exists(fname):
+            os.remove(fname) # clean for test
+    
+    ce = doctable.ConnectCore.open_new(target=test_fname, dialect='sqlite')
+    ce.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY, name TEXT);')
+    ce.execute('CREATE TABLE child (id INTEGER PRIMARY KEY, parent_id INTEGER REFERENCES parent(id));')
+    
+    # first reflection populates the cache
+    ce = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', reflection_cache_path=cache_fname)
+    ce.reflect_sqlalchemy_table('child')
+    assert(os.path.exists(cache_fname))
+    assert(set(ce.reflection_cache().table_names()) == {'parent', 'child'})
+    
+    # tables are rebuilt from the cache: the only query reads the schema fingerprint
+    ce = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', reflection_cache_path=cache_fname)
+    statements = list()
+    sqlalchemy.event.listen(ce.engine, 'before_cursor_execute', lambda conn, cursor, stmt, *args: statements.append(stmt))
+    child = ce.reflect_sqlalchemy_table('child')
+    assert(statements == [doctable.connectcore.SCHEMA_FINGERPRINT_QUERY])
+    assert([c.name for c in child.columns] == ['id', 'parent_id'])
+    assert('parent' in ce.metadata.tables)
+    assert(child.c.id.max is not None)
+    
+    # metadata_reflect marks the cache as complete
+    ce = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', reflection_cache_path=cache_fname)
+    ce.metadata_reflect()
+    assert(ce.reflection_cache().complete)
+    
+    # schema changes invalidate the cache
+    ce.execute('CREATE TABLE other (id INTEGER PRIMARY KEY);')
+    ce = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', reflection_cache_path=cache_fname)
+    assert(not ce.reflection_cache().complete)
+    ce.metadata_reflect()
+    assert(set(ce.metadata_tables.keys()) == {'parent', 'child', 'other'})
+    
+    # a rebuilt file with a different schema at the same version is not read from the cache
+    version = ce.schema_version()
+    ce.dispose_engine()
+    os.remove(test_fname)
+    ce = doctable.ConnectCore.open_new(target=test_fname, dialect='sqlite')
+    ce.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY, title TEXT);')
+    ce.execute('CREATE TABLE child (id INTEGER PRIMARY KEY);')
+    ce.execute('CREATE TABLE other (id INTEGER PRIMARY KEY);')
+    assert(ce.schema_version() == version)
+    ce = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', reflection_cache_path=cache_fname)
+    assert([c.name for c in ce.reflect_sqlalchemy_table('parent').columns] == ['id', 'title'])
+    
+    try:
+        doctable.ConnectCore.open(target=':memory:', dialect='sqlite', reflection_cache_path=cache_fname)
+        raise Exception('Should have raised ValueError.')
+    except ValueError as e:
+        pass
+
+def test_inspector_cache_and_bulk_inspection():
+    ce = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    assert(ce.inspector() is ce.inspector())
+    assert(ce.inspect_table_names() == [])
+    
+    # DDL emitted through the emitter clears the cached inspector
+    ce.create_sqlalchemy_table(
+        table_name = 'mytable', 
+        columns = [
+            sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+            sqlalchemy.Column('name', sqlalchemy.String, nullable=False),
+            sqlalchemy.Column('age', sqlalchemy.Integer),
+            sqlalchemy.Index('age_name_index', 'age', 'name'),
+        ],
+    )
+    with ce.begin_ddl():
+        pass
+    assert(ce.inspect_table_names() == ['mytable'])
+    
+    schema = ce.inspect_schema_bulk()
+    assert(list(schema.keys()) == ['mytable'])
+    assert([c['name'] for c in schema['mytable']['columns']] == ['id', 'name', 'age'])
+    assert(schema['mytable']['columns'][1]['nullable'] == False)
+    assert(schema['mytable']['indices'] == [
+        {'name': 'age_name_index', 'column_names': ['age', 'name'], 'unique': False, 'partial': False}
+    ])
+    assert(len(schema['mytable']['indices']) == len(ce.inspect_indices('mytable')))
+
+    # DDL run on any connection of the engine also clears it
+    with ce.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE other (id INTEGER PRIMARY KEY, name TEXT)')
+        conn.exec_driver_sql('CREATE INDEX ix_lower_name ON other (lower(name), id)')
+    assert(ce.inspect_table_names() == ['mytable', 'other'])
+    assert(ce.inspect_schema_bulk()['other']['indices'][0]['column_names'] == ['id'])
+
 
 if __name__ == '__main__':
     test_new_connectcore()
     test_execute()
     test_newtable_and_insepct()
-    test_new_table2()
\ No newline at end of file
+    test_new_table2()
+    test_reflection_cache()
+    test_inspector_cache_and_bulk_inspection()
\ No newline at end of file
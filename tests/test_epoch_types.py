@@ -0,0 +1,62 @@
+import datetime
+import sqlalchemy
+import sys
+sys.path.append('..')
+import doctable
+
+
+def test_epoch_types():
+    utc = datetime.timezone.utc
+    est = datetime.timezone(datetime.timedelta(hours=-5))
+    dt_type, tz_type, date_type = doctable.EpochDateTime(), doctable.EpochDateTime(timezone=True), doctable.EpochDate()
+
+    dt = datetime.datetime(2021, 3, 4, 5, 6, 7, 891011)
+    assert(dt_type.process_result_value(dt_type.process_bind_param(dt, None), None) == dt)
+    assert(dt_type.process_bind_param(datetime.datetime(1970, 1, 1, 0, 0, 1), None) == 1_000_000)
+    assert(dt_type.process_bind_param(datetime.datetime(1969, 12, 31, 23, 59, 59), None) == -1_000_000)
+
+    # aware datetimes are normalized to UTC
+    assert(dt_type.process_bind_param(datetime.datetime(2021, 1, 1, 7, tzinfo=est), None)
+        == dt_type.process_bind_param(datetime.datetime(2021, 1, 1, 12), None))
+    assert(tz_type.process_result_value(0, None) == datetime.datetime(1970, 1, 1, tzinfo=utc))
+
+    d = datetime.date(2020, 2, 29)
+    assert(date_type.process_bind_param(datetime.date(1970, 1, 2), None) == 1)
+    assert(date_type.process_result_value(date_type.process_bind_param(d, None), None) == d)
+    try:
+        date_type.process_bind_param(dt, None)
+        raise Exception('Should have raised TypeError.')
+    except TypeError:
+        pass
+
+def test_epoch_default_mapping():
+    doctable.ColumnTypeMatcher.use_epoch_types()
+    try:
+        @doctable.table_schema(table_name='events')
+        class Event:
+            when: datetime.datetime
+            day: 'datetime.date' = None
+            id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+        core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+        with core.begin_ddl() as emitter:
+            t = emitter.create_table(Event)
+    finally:
+        doctable.ColumnTypeMatcher.use_epoch_types(False)
+    assert(doctable.ColumnTypeMatcher.type_hint_to_column_type(datetime.datetime) is sqlalchemy.DateTime)
+    assert(isinstance(t['when'].type, doctable.EpochDateTime) and isinstance(t['day'].type, doctable.EpochDate))
+
+    start = datetime.datetime(2022, 1, 1)
+    with t.query() as q:
+        q.insert_multi([Event(start + datetime.timedelta(hours=i), (start + datetime.timedelta(days=i)).date()) for i in range(48)])
+
+        # stored as integers, compared as integers
+        assert(isinstance(q.cquery.execute_sql('SELECT "when" FROM events LIMIT 1').scalar_one(), int))
+        events = q.select(where=(t['when'] >= start + datetime.timedelta(hours=10)) & (t['when'] < start + datetime.timedelta(days=1)), order_by=[t['when'].desc()])
+        assert(len(events) == 14 and events[0].when == datetime.datetime(2022, 1, 1, 23))
+        assert(q.select(where=t['day'] == datetime.date(2022, 1, 3))[0].when == datetime.datetime(2022, 1, 1, 2))
+
+
+if __name__ == '__main__':
+    test_epoch_types()
+    test_epoch_default_mapping()
@@ -0,0 +1,235 @@
+import os
+import pathlib
+import pickle
+import shutil
+import sys
+sys.path.append('..')
+import doctable
+
+
+def file_container(control: doctable.FileTypeControl, table_name: str = 'files'):
+    @doctable.table_schema(table_name=table_name)
+    class FileContainer:
+        text: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.TextFileType(control)))
+        obj: list = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.PickleFileType(control)))
+        meta: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.JSONFileType(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+    return FileContainer
+
+def fresh_folder(folder: str) -> pathlib.Path:
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    return pathlib.Path(folder)
+
+def test_file_types(folder: str = 'tmp_file_types'):
+    path = fresh_folder(folder)
+    control = doctable.FileTypeControl(path, shard_levels=2, shard_width=2)
+    Container = file_container(control)
+    
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Container)
+    
+    with tab.query() as q:
+        q.insert_multi([Container(text='hello', obj=[1, 2], meta={'a': 1}), Container(text='world', obj=[3], meta={})])
+        results = q.select()
+    assert([r.text for r in results] == ['hello', 'world'])
+    assert(results[0].obj == [1, 2] and results[0].meta == {'a': 1})
+    
+    # all files are stored two folders deep
+    stored = list(control.iter_files())
+    assert(len(stored) == 6)
+    assert(all(len(f.relative_to(path).parts) == 3 for f in stored))
+    shutil.rmtree(folder)
+
+def test_migrate_layout(folder: str = 'tmp_file_migrate'):
+    path = fresh_folder(folder)
+    flat = doctable.FileTypeControl(path)
+    flat.create_folder()
+    hashes = list()
+    for i in range(10):
+        h = flat.get_md5(str(i))
+        with flat.open(h, 'w') as f:
+            f.write(str(i))
+        hashes.append(h)
+    assert(len(os.listdir(path)) == 10)
+
+    sharded = doctable.FileTypeControl(path, shard_levels=2, shard_width=1)
+    assert(sharded.migrate_layout() == 10)
+    assert(sharded.migrate_layout() == 0)
+    for i, h in enumerate(hashes):
+        with sharded.open(h, 'r') as f:
+            assert(f.read() == str(i))
+    
+    # and back to flat
+    assert(flat.migrate_layout() == 10)
+    assert(sorted(os.listdir(path)) == sorted(hashes))
+    shutil.rmtree(folder)
+
+def test_batched_file_io(folder: str = 'tmp_file_batched'):
+    path = fresh_folder(folder)
+    control = doctable.FileTypeControl(path, shard_levels=1, workers=4)
+    Container = file_container(control)
+    
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Container)
+    
+    data = [Container(text=f'text {i}', obj=list(range(i)), meta={'i': i}) for i in range(50)]
+    data.append(Container(text=None, obj=None, meta=None))
+    with tab.query() as q:
+        q.insert_multi(data)
+        results = q.select(order_by=[tab['id']])
+        chunks = [r for chunk in q.select_chunks(chunksize=7) for r in chunk]
+    
+    for rs in (results, chunks):
+        assert([r.text for r in rs] == [d.text for d in data])
+        assert([r.obj for r in rs] == [d.obj for d in data])
+        assert([r.meta for r in rs] == [d.meta for d in data])
+    assert(len(list(control.iter_files())) == 150)
+    
+    # raw access skips the thread pool and returns file names
+    control.raw = True
+    with tab.query() as q:
+        names = q.select(['text'], where=tab['id']==1)
+    assert(control.exists(names[0].text))
+    control.close()
+    shutil.rmtree(folder)
+
+def test_read_cache(folder: str = 'tmp_file_cache'):
+    path = fresh_folder(folder)
+    control = doctable.FileTypeControl(path, cache_bytes=200)
+    Container = file_container(control)
+    
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Container)
+    
+    with tab.query() as q:
+        q.insert_multi([Container(text='x'*60 + str(i), obj=[i], meta={'i': i}) for i in range(3)])
+        q.select(['text'])
+        assert(control.cache_info()['misses'] == 3)
+        results = q.select(['text'])
+    info = control.cache_info()
+    assert(info['hits'] == 3 and info['misses'] == 3)
+    assert(results[0].text == 'x'*60 + '0')
+    
+    # each read parses a new object, so changes do not leak into the cache
+    with tab.query() as q:
+        q.select(['obj', 'meta'])[0].meta['i'] = 'changed'
+        assert(q.select(['meta'])[0].meta == {'i': 0})
+    info = control.cache_info()
+    assert(info['misses'] == 9 and info['nbytes'] <= 200)
+    
+    # least recently used entries are evicted to stay within the budget
+    with tab.query() as q:
+        q.select(['text'])
+    assert(control.cache_info()['misses'] > 9)
+
+    # with cache_values, hits return the shared parsed value without unpickling
+    control = doctable.FileTypeControl(path, cache_bytes=1000, cache_values=True)
+    Container = file_container(control)
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Container)
+    loads, calls = pickle.loads, list()
+    pickle.loads = lambda data: calls.append(data) or loads(data)
+    try:
+        with tab.query() as q:
+            q.insert_multi([Container(obj=[i]) for i in range(3)])
+            first = q.select(['obj'])
+            second = q.select(['obj'])
+    finally:
+        pickle.loads = loads
+    assert(len(calls) == 3 and [r.obj for r in second] == [[0], [1], [2]])
+    assert(all(a.obj is b.obj for a, b in zip(first, second)))
+    assert(control.cache_info()['hits'] == 3)
+    shutil.rmtree(folder)
+
+def test_gc_file_columns(folder: str = 'tmp_file_gc'):
+    path = fresh_folder(folder)
+    control = doctable.FileTypeControl(path, shard_levels=1, workers=2)
+    Container = file_container(control)
+    
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Container)
+    
+    with tab.query() as q:
+        q.insert_multi([Container(text=f'text {i}', obj=[i], meta={'i': i}) for i in range(20)])
+        q.insert_multi([Container(text=f'text {i}') for i in range(5)]) # shares files
+        q.delete(where=tab['id'] <= 10)
+        q.update_single({'meta': {'new': 1}}, where=tab['id'] == 11)
+    assert(len(list(control.iter_files())) == 61)
+    names = list(control.iter_sorted_names())
+    assert(names == sorted(names) and len(names) == 61)
+    
+    # rows 1-10 leave 20 orphans (texts 0-4 are still used), plus one replaced meta
+    stats = tab.gc_file_columns(dry_run=True, batch_size=7)
+    assert(stats['orphaned'] == 26 and stats['reclaimed_bytes'] > 0)
+    assert(len(list(control.iter_files())) == 61)
+
+    assert(tab.gc_file_columns(batch_size=7) == stats)
+    assert(len(list(control.iter_files())) == 35)
+    assert(tab.gc_file_columns()['orphaned'] == 0)
+    with tab.query() as q:
+        results = q.select(order_by=[tab['id']])
+    assert(len(results) == 15 and results[0].meta == {'new': 1})
+    assert([r.text for r in results[-5:]] == [f'text {i}' for i in range(5)])
+    control.close()
+    shutil.rmtree(folder)
+
+def test_packed_types(folder: str = 'tmp_packed_types'):
+    path = fresh_folder(folder)
+    control = doctable.PackedStoreControl(path, segment_size=1000)
+
+    @doctable.table_schema(table_name='packed')
+    class PackedContainer:
+        obj: list = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.PackedPickleType(control)))
+        blob: bytes = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.PackedBlobType(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(PackedContainer)
+
+    with tab.query() as q:
+        q.insert_multi([PackedContainer(obj=list(range(i)), blob=bytes(100)) for i in range(20)])
+        results = q.select()
+    assert([r.obj for r in results] == [list(range(i)) for i in range(20)])
+    assert(all(r.blob == bytes(100) for r in results))
+    
+    # values are spread over several segments of bounded size
+    assert(len(control.segment_ids()) > 1)
+    assert(all(control.segment_path(s).stat().st_size <= 1000 for s in control.segment_ids()))
+
+    # compaction drops deleted rows and stores the duplicate blobs once
+    with tab.query() as q:
+        q.delete(where=tab['id'] > 10)
+    stats = tab.compact_packed_column('blob', batch_size=3)
+    assert(stats['live_values'] == 11) # ten lists and one shared blob
+    assert(stats['bytes_after'] < stats['bytes_before'])
+    stats = tab.compact_packed_column('obj') # same store, nothing left to drop
+    assert(stats['live_values'] == 11)
+    assert(stats['bytes_after'] == stats['bytes_before'])
+    with tab.query() as q:
+        results = q.select()
+    assert([r.obj for r in results] == [list(range(i)) for i in range(10)])
+    assert(all(r.blob == bytes(100) for r in results))
+    
+    try:
+        tab.compact_packed_column('id')
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+    control.close()
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_file_types()
+    test_migrate_layout()
+    test_batched_file_io()
+    test_read_cache()
+    test_gc_file_columns()
+    test_packed_types()
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_in_new_interpreter(code: str) -> str:
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.strip()
+
+def test_lazy_imports():
+    '''Importing doctable should not import the optional heavy dependencies.'''
+    loaded = run_in_new_interpreter(
+        'import sys; import doctable; '
+        'print(",".join(m for m in ("pandas", "numpy") if m in sys.modules))'
+    )
+    assert(loaded == '')
+
+    # pandas is loaded once a dataframe is requested
+    loaded = run_in_new_interpreter(
+        'import sys; import doctable; '
+        'core = doctable.ConnectCore.open(target=":memory:", dialect="sqlite"); '
+        'core.query().execute_sql("SELECT 1 AS a").df(); '
+        'print("pandas" in sys.modules)'
+    )
+    assert(loaded == 'True')
+
+def test_import_time(max_overhead: float = 0.5):
+    '''Guards against regressions: doctable should add little on top of sqlalchemy.'''
+    timing = run_in_new_interpreter(
+        'import time; import sqlalchemy; m = time.perf_counter(); '
+        'import doctable; e = time.perf_counter(); print(e - m)'
+    )
+    assert(float(timing) < max_overhead)
+
+
+if __name__ == '__main__':
+    test_lazy_imports()
+    test_import_time()
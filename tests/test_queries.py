@@ -1,5 +1,8 @@
 import datetime
 import os
+import sqlite3
+import threading
+import time
 import sqlalchemy
 
 import sys
@@ -65,7 +68,375 @@ def test_query(test_table: str = 'test1'):
         assert(len(tq.select()) == 6)
 
 
+def test_lock_retry(test_fname: str = 'test_locks.db'):
+    if os.path.exists(test_fname):
+        os.remove(test_fname) # clean for test
+    
+    ce = doctable.ConnectCore.open_new(
+        target = test_fname, 
+        dialect = 'sqlite',
+        lock_settings = doctable.LockSettings(busy_timeout=0, begin_immediate=True, max_retries=100, backoff_base=0.01, backoff_max=0.05),
+    )
+    Container = dummy_container1('test_locks')
+    with ce.begin_ddl() as emitter: 
+        t = emitter.create_table(Container)
+    
+    # another connection holds the write lock for a short time
+    other = sqlite3.connect(test_fname, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN EXCLUSIVE')
+    def release_lock():
+        time.sleep(0.2)
+        other.execute('COMMIT')
+    thread = threading.Thread(target=release_lock)
+    thread.start()
+    
+    with t.query() as tq:
+        tq.insert_single(Container(name='a', age=1), retry=True)
+    thread.join()
+    
+    with t.query() as tq:
+        assert(len(tq.select()) == 1)
+    assert(ce.lock_stats.retries > 0)
+    assert(ce.lock_stats.failures == 0)
+    
+    # statements that are not marked idempotent are not retried
+    other.execute('BEGIN EXCLUSIVE')
+    try:
+        with t.query() as tq:
+            tq.insert_single(Container(name='b', age=2))
+        raise Exception('Should have raised OperationalError.')
+    except sqlalchemy.exc.OperationalError as e:
+        pass
+    other.execute('COMMIT')
+    assert(ce.lock_stats.failures == 1)
+
+    # a reader blocks the COMMIT, which is rolled back instead of retried
+    retries = ce.lock_stats.retries
+    other.execute('BEGIN')
+    other.execute('SELECT * FROM test_locks').fetchall() # holds a SHARED lock
+    try:
+        with t.query() as tq:
+            tq.insert_single(Container(name='c', age=3), retry=True)
+        raise Exception('Should have raised OperationalError.')
+    except sqlalchemy.exc.OperationalError as e:
+        assert('database is locked' in str(e))
+    other.execute('COMMIT')
+    assert(ce.lock_stats.failures == 2 and ce.lock_stats.retries == retries)
+    with t.query() as tq:
+        assert(len(tq.select()) == 1)
+
+    # with a busy timeout the commit waits for the reader instead
+    waiting = doctable.ConnectCore.open(target=test_fname, dialect='sqlite', lock_settings=doctable.LockSettings(busy_timeout=5))
+    other.execute('BEGIN')
+    other.execute('SELECT * FROM test_locks').fetchall()
+    thread = threading.Thread(target=release_lock)
+    thread.start()
+    with waiting.query() as q:
+        q.execute_sql("INSERT INTO test_locks (name, age) VALUES ('d', 4)")
+    thread.join()
+    with t.query() as tq:
+        assert(len(tq.select()) == 2)
+
+def test_attached_databases(main_fname: str = 'test_main.db', other_fname: str = 'test_attached.db'):
+    for fname in (main_fname, other_fname):
+        if os.path.exists(fname):
+            os.remove(fname) # clean for test
+    
+    other = doctable.ConnectCore.open_new(target=other_fname, dialect='sqlite')
+    OtherContainer = dummy_container1('people')
+    with other.begin_ddl() as emitter:
+        t = emitter.create_table(OtherContainer)
+    with t.query() as tq:
+        tq.insert_multi([OtherContainer(name='a', age=1), OtherContainer(name='b', age=20)])
+    
+    ce = doctable.ConnectCore.open_new(target=main_fname, dialect='sqlite')
+    ce.attach(other_fname, 'y2020')
+    Container = dummy_container1('people')
+    with ce.begin_ddl() as emitter:
+        main_tab = emitter.create_table(Container)
+        other_tab = emitter.reflect_table('people', schema='y2020')
+    
+    with main_tab.query() as tq:
+        tq.insert_single(Container(name='a', age=2))
+        tq.insert_from_select(sqlalchemy.select(other_tab['name'], other_tab['age']).where(other_tab['age'] > 10))
+        assert(len(tq.select()) == 2)
+    
+    with ce.query() as q:
+        joined = q.select(
+            [main_tab['name'], other_tab['age']], 
+            where=main_tab['name'] == other_tab['name'],
+            order_by=[other_tab['age']],
+        ).all()
+        assert([tuple(r) for r in joined] == [('a', 1), ('b', 20)])
+    
+    ce.detach('y2020')
+    try:
+        ce.execute('SELECT * FROM y2020.people')
+        raise Exception('Should have raised OperationalError.')
+    except sqlalchemy.exc.OperationalError as e:
+        pass
+
+def test_deferred_select(folder: str = 'tmp_deferred'):
+    import shutil
+    control = doctable.FileTypeControl(folder)
+
+    @doctable.table_schema(table_name='docs')
+    class Doc:
+        title: str
+        tree: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.JSON))
+        body: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.TextFileType(control)))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Doc)
+
+    with t.query() as q:
+        q.insert_multi([Doc(title=f'doc {i}', tree={'n': i}, body=f'body {i}') for i in range(5)])
+        docs = q.select(['title', 'tree', 'body'], defer=['tree', t['body']])
+        assert([d.title for d in docs] == [f'doc {i}' for i in range(5)])
+        assert(isinstance(docs[0].tree, doctable.Deferred) and not docs[0].tree.loaded)
+        assert('not loaded' in repr(docs[0]))
+        
+        # values load on first use
+        assert(docs[2].tree['n'] == 2 and docs[2].tree.loaded)
+        assert(docs[2].tree == {'n': 2})
+        assert(docs[3].body.load() == 'body 3')
+        assert(docs[3].body.startswith('body'))
+        assert(not docs[4].tree.loaded)
+
+        # deferred values of a chunk are loaded together
+        statements = list()
+        sqlalchemy.event.listen(core.engine, 'before_cursor_execute', lambda conn, cursor, stmt, *args: statements.append(stmt))
+        chunks = [d for c in q.select_chunks(chunksize=2, defer=['tree']) for d in c]
+        assert([d.tree.load() for d in chunks] == [{'n': i} for i in range(5)])
+        assert(len([s for s in statements if 'docs.id IN' in s]) == 3)
+
+    # still loads after the query connection is closed
+    q.cquery.conn.close()
+    assert(docs[4].tree.load() == {'n': 4})
+    shutil.rmtree(folder)
+
+def test_tuple_container():
+
+    @doctable.table_schema(table_name='points', container='tuple')
+    class Point:
+        x: int
+        y: int = 0
+        label: str = doctable.Column(column_args=doctable.ColumnArgs(nullable=True))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+        def norm(self) -> int:
+            return abs(self.x) + abs(self.y)
+
+    p = Point(3, y=-4)
+    assert(isinstance(p, tuple) and isinstance(p, doctable.TupleContainer))
+    assert(not hasattr(p, '__dict__'))
+    assert(p.x == 3 and p.y == -4 and p.norm() == 7 and p.id is doctable.MISSING)
+    assert(p._replace(x=1).x == 1 and p._asdict()["y"] == -4)
+    try:
+        Point()
+        raise Exception('Should have raised TypeError.')
+    except TypeError:
+        pass
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Point)
+    assert([c.name for c in t.all_cols()] == ['id', 'x', 'y', 'label'])
+
+    with t.query() as q:
+        q.insert_multi([Point(i, i*2, label=f'p{i}') for i in range(5)])
+        q.insert_single(Point(10))
+        points = q.select(order_by=[t['id']])
+        assert(len(points) == 6 and isinstance(points[0], Point))
+        assert([(p.x, p.y) for p in points[:2]] == [(0, 0), (1, 2)] and points[0].id == 1)
+        assert(points[5].label is None)
+        
+        # subsets of columns leave the others MISSING
+        points = q.select(['y', 'x'], where=t['x'] > 3)
+        assert([(p.x, p.y, p.label) for p in points] == [(4, 8, doctable.MISSING), (10, 0, doctable.MISSING)])
+        
+        chunks = [p for c in q.select_chunks(chunksize=4) for p in c]
+        assert(sorted(p.x for p in chunks) == [0, 1, 2, 3, 4, 10])
+
+def test_full_text_search():
+    @doctable.table_schema(table_name='articles', fts=doctable.FTS('title', 'body', tokenize='porter unicode61'))
+    class Article:
+        title: str
+        body: str
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Article)
+
+    with t.query() as q:
+        q.insert_multi([
+            Article('Rising seas', 'Sea levels are rising due to climate change.'),
+            Article('Markets', 'Economic growth slowed as the economy cooled.'),
+            Article('Climate talks', 'Leaders discussed climate policy and climate finance.'),
+        ])
+        results = q.search('climate')
+        assert([a.id for a in results] == [3, 1]) # ranked by relevance
+        assert(isinstance(results[0], Article) and results[0].title == 'Climate talks')
+        assert([a.id for a in q.search('climate', rank=False)] == [1, 3])
+        assert([a.id for a in q.search('climat*', match_cols=['title'])] == [3])
+        assert([a.id for a in q.search('economies')] == [2]) # porter stemming
+        assert(len(q.search('climate', where=t['id'] < 3)) == 1 and len(q.search('climate', limit=1)) == 1)
+        assert(q.search('seas', cols=['title'])[0].body is doctable.MISSING)
+
+        # triggers keep the index in sync
+        q.update_single({'body': 'Nothing to see.'}, where=t['id'] == 2)
+        assert(len(q.search('economy')) == 0 and len(q.search('nothing')) == 1)
+        q.delete(where=t['id'] == 3)
+        assert([a.id for a in q.search('climate')] == [1])
+    
+    with core.query() as q:
+        q.execute_sql("DELETE FROM articles_fts")
+    t.rebuild_fts()
+    with t.query() as q:
+        assert([a.id for a in q.search('climate')] == [1])
+
+    @doctable.table_schema(table_name='notes')
+    class Note:
+        text: str
+    with core.begin_ddl() as emitter:
+        notes = emitter.create_table(Note)
+    try:
+        notes.query().search('x')
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+    # implicit rowids may be renumbered by VACUUM, so an integer primary key is required
+    @doctable.table_schema(table_name='snippets', fts=doctable.FTS('body'))
+    class Snippet:
+        body: str
+    try:
+        with core.begin_ddl() as emitter:
+            emitter.create_table(Snippet)
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+    ddl = doctable.FTS('body', tokenize='unicode61 remove_diacritics 2').ddl('my table', 'id')
+    assert(ddl[0] == 'CREATE VIRTUAL TABLE IF NOT EXISTS "my table_fts" USING fts5("body", '
+        "content='my table', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+
+def test_explain_and_index_advisor():
+    def job_container(indices: dict):
+        @doctable.table_schema(table_name='jobs', indices=indices)
+        class Job:
+            name: str
+            status: str
+            created: int
+            id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+        return Job
+    
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(job_container({}))
+
+    pending = (t['status'] == 'pending') & (t['created'] > 5)
+    with t.query() as q:
+        plan = q.explain(where=pending, order_by=[t['created'].desc()], limit=10)
+        assert('WHERE jobs.status = ? AND jobs.created > ?' in plan.sql)
+        assert(plan.full_scans() == ['jobs'] and plan.temp_btrees() == ['ORDER BY'])
+        assert(not q.explain(where=t['id'] == 1).full_scans()) # primary key lookup
+        assert(not q.explain(where=t['id'].in_([1, 2, 3])).full_scans())
+        assert('SCAN jobs' in str(plan))
+
+    # capture a workload and get suggestions for it
+    advisor = doctable.IndexAdvisor(core)
+    with advisor.capture() as log:
+        with t.query() as q:
+            for _ in range(3):
+                q.select(where=pending, order_by=[t['created'].desc()])
+            q.select(where=t['name'] == 'a')
+            q.select(where=t['name'].in_(['b', 'c']))
+            q.select(where=t['id'] == 1)
+            q.select(cols=['name'], limit=5)
+    q.select(where=t['name'] == 'b') # not captured
+    assert(len(log.statements) == 7)
+
+    suggestions = advisor.advise(log.statements)
+    assert([s.count for s in suggestions] == [3, 2]) # the IN filter also suggests the name index
+    assert(suggestions[0].column_names == ('status', 'created') and suggestions[0].desc == ('created',))
+    assert(suggestions[1].schema_entry().keys() == {'ix_jobs_name'})
+    assert('full scan' in suggestions[0].info_dict()['reasons'])
+
+    # plans use the bound values: a LIKE prefix can search a NOCASE index
+    @doctable.table_schema(table_name='words', indices={'ix_words_name': doctable.Index('name')})
+    class Word:
+        name: str = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=sqlalchemy.String(collation='NOCASE')))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+    core3 = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core3.begin_ddl() as emitter:
+        w = emitter.create_table(Word)
+    with w.query() as q:
+        plan = q.explain(cols=['name'], where=w['name'].like('abc%'))
+        assert(not plan.full_scans() and 'ix_words_name' in str(plan))
+    word_advisor = doctable.IndexAdvisor(core3)
+    with word_advisor.capture() as word_log:
+        with w.query() as q:
+            q.select(cols=['name'], where=w['name'].like('abc%'))
+    assert(len(word_advisor.advise(word_log.statements)) == 0)
+
+    # the suggested indices remove the scans
+    indices = {k: v for s in suggestions for k, v in s.schema_entry().items()}
+    core2 = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core2.begin_ddl() as emitter:
+        t2 = emitter.create_table(job_container(indices))
+    with t2.query() as q:
+        plan = q.explain(where=(t2['status'] == 'pending') & (t2['created'] > 5), order_by=[t2['created'].desc()])
+        assert(not plan.full_scans() and not plan.temp_btrees() and plan.uses_index())
+    assert(len(doctable.IndexAdvisor(core2).advise(log.statements)) == 0)
+
+
+def test_table_stats():
+    @doctable.table_schema(table_name='readings', indices={'ix_sensor': doctable.Index('sensor')})
+    class Reading:
+        sensor: str
+        value: float = None
+        taken: datetime.date = None
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Reading)
+    with t.query() as q:
+        q.insert_multi([Reading(sensor=f's{i % 50}', value=float(i) if i % 4 else None, taken=datetime.date(2020, 1, 1 + i % 28)) for i in range(2000)])
+
+    # small tables are read entirely, so distinct counts are exact
+    stats = t.stats()
+    assert(stats.row_count == 2000 and stats.sample_size == 2000)
+    assert(stats['sensor'].distinct == 50 and stats['sensor'].distinct_exact)
+    assert(stats['value'].count == 1500 and stats['value'].null_fraction == 0.25)
+    assert(stats['value'].min == 1.0 and stats['value'].max == 1999.0)
+    assert(stats['taken'].min == datetime.date(2020, 1, 1) and stats['taken'].max == datetime.date(2020, 1, 28))
+    assert(stats['sensor'].stored_bytes == sum(len(f's{i % 50}') for i in range(2000)))
+    assert(stats['value'].stored_bytes == 8 * 1500 and stats['taken'].stored_bytes == 10 * 2000)
+    assert(stats['id'].stored_bytes == 0) # rowid alias, stored as NULL in the record
+    assert(len(stats.column_info()) == 4 and stats.chunksize() > 100)
+
+    # larger tables are sampled by rowid and distinct counts estimated
+    stats = t.stats(sample_size=500, seed=0)
+    assert(stats.sample_size == 500 and not stats['id'].distinct_exact)
+    assert(stats['sensor'].distinct == 50 and 1000 <= stats['id'].distinct <= 2000)
+    assert(stats['value'].count == 1500) # aggregates still cover every row
+
+    t.analyze()
+    with core.query() as q:
+        stat1 = q.execute_sql('SELECT idx, stat FROM sqlite_stat1 WHERE tbl = \'readings\'').all()
+    assert(dict(stat1)['ix_sensor'].startswith('2000 40'))
+
 
 if __name__ == '__main__':
     test_query()
-    
\ No newline at end of file
+    test_lock_retry()
+    test_attached_databases()
+    test_deferred_select()
+    test_tuple_container()
+    test_full_text_search()
+    test_explain_and_index_advisor()
+    test_table_stats()
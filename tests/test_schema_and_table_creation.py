@@ -225,10 +225,186 @@ def test_schema_definitions():
     tc = TestContainer3(name='a', age=10)
     print(tc)
     
+def test_type_hint_resolution():
+    import typing
+    match = doctable.ColumnTypeMatcher.type_hint_to_column_type
+    assert(match(int) is sqlalchemy.Integer and match(bool) is sqlalchemy.Integer) # as before hints were memoized
+    assert(match(datetime.datetime) is sqlalchemy.DateTime and match(datetime.date) is sqlalchemy.Date)
+    assert(match(typing.Optional[str]) is sqlalchemy.String)
+    assert(match(typing.Annotated[float, 'meters']) is sqlalchemy.Float)
+    assert(match(typing.Optional[typing.Annotated[int, 'x']]) is sqlalchemy.Integer)
+    assert(match(int | None) is sqlalchemy.Integer)
+    for hint in ('int', "'str'", 'Optional[int]', 'typing.Optional[float]', 'bytes | None', 'Annotated[date, 1]', 'np.ndarray'):
+        assert(match(hint) is not None)
+    assert(match('Optional[datetime.datetime]') is sqlalchemy.DateTime)
+
+    class MyStr(str):
+        pass
+    assert(match(MyStr) is sqlalchemy.String) # found through the MRO
+
+    for hint in (typing.Union[int, str], list, 'Foo'):
+        try:
+            match(hint)
+            raise Exception('Should have raised TypeError.')
+        except TypeError:
+            pass
+    
+    class Point:
+        pass
+    doctable.ColumnTypeMatcher.register(Point, doctable.PickleType)
+    assert(match(Point) is doctable.PickleType and match('Point') is doctable.PickleType)
+    
+    # changing the mapping directly also resets the memoized results
+    mapping = doctable.ColumnTypeMatcher.type_hint_to_column_type_mapping
+    mapping[Point] = doctable.JSON
+    assert(match(Point) is doctable.JSON)
+    del mapping[Point]
+    try:
+        match(Point)
+        raise Exception('Should have raised TypeError.')
+    except TypeError:
+        pass
+    
+    doctable.ColumnTypeMatcher.register(bool, sqlalchemy.Boolean)
+    assert(match(bool) is sqlalchemy.Boolean and match(int) is sqlalchemy.Integer)
+    doctable.ColumnTypeMatcher.register(bool, sqlalchemy.Integer)
+
+    # postponed annotations are evaluated when the schema is created
+    namespace = dict()
+    exec('\n'.join([
+        'from __future__ import annotations',
+        'import typing, datetime, doctable',
+        '@doctable.table_schema(table_name="hints")',
+        'class Hints:',
+        '    a: typing.Optional[int] = None',
+        '    b: typing.Annotated[str, "name"] = None',
+        '    c: datetime.datetime | None = None',
+    ]), namespace)
+    types = [c.type for c in doctable.get_schema(namespace['Hints']).sqlalchemy_table(sqlalchemy.MetaData()).columns]
+    assert([type(t) for t in types] == [sqlalchemy.Integer, sqlalchemy.String, sqlalchemy.DateTime])
+
+def test_schema_compile_cache():
+    @doctable.table_schema(
+        table_name='parents', 
+        constraints=[doctable.UniqueConstraint('name'), doctable.CheckConstraint('age >= 0')],
+        indices={'ix_age': doctable.Index('age')},
+    )
+    class Parent:
+        name: str
+        age: int
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+        parent_id: int = doctable.Column(column_args=doctable.ColumnArgs(foreign_key='parents.id'))
+
+    schema = doctable.get_schema(Parent)
+    tables = list()
+    for _ in range(3): # e.g. one database per tenant
+        core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+        with core.begin_ddl() as emitter:
+            tables.append(emitter.create_table(Parent))
+        
+        # the table is only built once per metadata
+        with core.begin_ddl() as emitter:
+            assert(emitter.create_table_if_not_exists(Parent).table is tables[-1].table)
+        
+        with tables[-1].query() as q:
+            q.insert_single(Parent(name='a', age=1))
+            try:
+                q.insert_single(Parent(name='a', age=2))
+                raise Exception('Should have raised IntegrityError.')
+            except sqlalchemy.exc.IntegrityError:
+                pass
+    
+    # column types are compiled once, but each table gets its own constraints
+    compiled = schema.compiled_columns()
+    assert(schema.compiled_columns() is compiled)
+    assert(tables[0].table.c['age'].type is tables[1].table.c['age'].type)
+    for t in tables:
+        assert(all(c.table is t.table for c in t.table.constraints))
+        assert(len(t.table.constraints) == 4 and len(t.table.indexes) == 1)
+        assert(isinstance(t.table.c['parent_id'].type, sqlalchemy.Integer))
+
+def test_index_options():
+    @doctable.table_schema(table_name='jobs', indices={
+        'ix_pending': doctable.Index('created', where="status = 'pending'"),
+        'ix_done': doctable.Index('created', where=sqlalchemy.column('status') == 'done'),
+        'ix_source': doctable.Index("json_extract(meta, '$.source')"),
+        'ix_name': doctable.Index('lower(name)', unique=True),
+        'ix_recent': doctable.Index('status', 'created', desc=['created'], include=['name']),
+    })
+    class Job:
+        name: str
+        status: str
+        created: int
+        meta: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.JSON))
+    
+    for bad_index in (lambda: doctable.Index('a', desc=['b']), lambda: doctable.Index('email', unique=True, include=['name'])):
+        try:
+            bad_index()
+            raise Exception('Should have raised ValueError.')
+        except ValueError:
+            pass
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Job)
+    
+    with core.query() as q:
+        ddl = {r[0]: r[1] for r in q.execute_sql("SELECT name, sql FROM sqlite_master WHERE type='index'")}
+        assert(ddl['ix_pending'].endswith("(created) WHERE status = 'pending'"))
+        assert(ddl['ix_done'].endswith("(created) WHERE status = 'done'"))
+        assert(ddl['ix_source'].endswith("(json_extract(meta, '$.source'))"))
+        assert(ddl['ix_name'].startswith('CREATE UNIQUE INDEX') and ddl['ix_name'].endswith('(lower(name))'))
+        assert(ddl['ix_recent'].endswith('(status, created DESC, name)'))
+
+        # the planner uses the indices instead of scanning the table
+        plan = q.execute_sql("EXPLAIN QUERY PLAN SELECT * FROM jobs WHERE status = 'pending' AND created > 5").all()
+        assert('USING INDEX' in plan[0][-1])
+        plan = q.execute_sql("EXPLAIN QUERY PLAN SELECT * FROM jobs WHERE json_extract(meta, '$.source') = 'x'").all()
+        assert('ix_source' in plan[0][-1])
+    
+    info = {i['name']: i for i in doctable.inspect_schema(Job).index_info()}
+    assert(info['ix_done']['where'] == "status = 'done'")
+    assert(info['ix_recent']['columns'] == 'status, created DESC' and info['ix_recent']['include'] == 'name')
+
+def test_generated_columns():
+    @doctable.table_schema(table_name='docs', indices={'ix_source': doctable.Index('source')})
+    class Doc:
+        text: str
+        meta: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.JSON))
+        length: int = doctable.Column(column_args=doctable.ColumnArgs(generated='length(text)', stored=True))
+        source: str = doctable.Column(column_args=doctable.ColumnArgs(generated="json_extract(meta, '$.source')"))
+
+    for kwargs in [dict(generated='a + 1', default=1), dict(generated='a + 1', primary_key=True), dict(stored=True)]:
+        try:
+            doctable.ColumnArgs(**kwargs)
+            raise Exception('Should have raised ValueError.')
+        except ValueError:
+            pass
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        t = emitter.create_table(Doc)
+    assert('GENERATED ALWAYS AS (length(text)) STORED' in str(sqlalchemy.schema.CreateTable(t.table)))
+    
+    # generated values are never inserted, even if set on the container
+    doc = Doc('abc', {'source': 'web'}, length=100)
+    assert(t.schema.dict_from_container(doc) == {'text': 'abc', 'meta': {'source': 'web'}})
+    with t.query() as q:
+        q.insert_multi([doc, Doc('hello', {'source': 'mail'})])
+        q.insert_single(Doc('hi', {}))
+        docs = q.select(where=t['source'] == 'mail')
+        assert(len(docs) == 1 and docs[0].length == 5)
+        assert([d.length for d in q.select(order_by=[t['length']])] == [2, 3, 5])
+        assert(q.select(where=t['length'] == 2)[0].source is None)
+
 
 if __name__ == '__main__':
     test_ddl()
     test_new_doctable()
     test_schema_definitions()
+    test_type_hint_resolution()
+    test_schema_compile_cache()
+    test_index_options()
+    test_generated_columns()
     
     
\ No newline at end of file
@@ -0,0 +1,66 @@
+import datetime
+import os
+import shutil
+import numpy as np
+import sys
+sys.path.append('..')
+import doctable
+
+
+def test_serializers():
+    for name in ('json', 'orjson', 'msgpack'):
+        s = doctable.SerializedJSON(name).serializer
+        value = {'a': [1, 2.5, None], 'b': {'c': 'd'}, 'n': np.float32(1.5), 'i': np.int64(3), 
+            'arr': np.arange(3), 'when': datetime.datetime(2020, 1, 2, 3, 4, 5)}
+        expected = {'a': [1, 2.5, None], 'b': {'c': 'd'}, 'n': 1.5, 'i': 3, 
+            'arr': [0, 1, 2], 'when': '2020-01-02T03:04:05'}
+        assert(s.loads(s.dumps(value)) == expected)
+        
+        values = [s.dumps({'x': i}) for i in range(5)] + [None, s.dumps([1, 'a'])]
+        assert(s.loads_many(values) == [{'x': i} for i in range(5)] + [None, [1, 'a']])
+
+    try:
+        doctable.SerializedJSON('yaml')
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+
+def test_serialized_columns(folder: str = 'tmp_serialized'):
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    control = doctable.FileTypeControl(folder)
+
+    @doctable.table_schema(table_name='meta')
+    class Meta:
+        a: dict = doctable.Column(column_args=doctable.ColumnArgs(serializer='msgpack'))
+        b: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.SerializedJSON('orjson')))
+        c: dict = doctable.Column(column_args=doctable.ColumnArgs(sqlalchemy_type=doctable.JSONFileType(control, serializer='msgpack')))
+        id: int = doctable.Column(column_args=doctable.ColumnArgs(order=0, primary_key=True, autoincrement=True))
+
+    core = doctable.ConnectCore.open(target=':memory:', dialect='sqlite')
+    with core.begin_ddl() as emitter:
+        tab = emitter.create_table(Meta)
+    assert(isinstance(tab['a'].type, doctable.SerializedJSON))
+    
+    data = [Meta(a={'i': i, 'v': np.float64(i/2)}, b={'s': str(i)}, c={'l': [i]}) for i in range(10)]
+    data.append(Meta(a=None, b=None, c=None))
+    with tab.query() as q:
+        q.insert_multi(data)
+        results = q.select(order_by=[tab['id']])
+        raw = q.cquery.select([tab['a'], tab['b']], where=tab['id'] == 1).one()
+    assert([r.a for r in results] == [{'i': i, 'v': i/2} for i in range(10)] + [None])
+    assert([r.b for r in results] == [{'s': str(i)} for i in range(10)] + [None])
+    assert([r.c for r in results] == [{'l': [i]} for i in range(10)] + [None])
+    assert(raw.a == {'i': 0, 'v': 0.0} and raw.b == {'s': '0'}) # rows are decoded one at a time here
+    
+    try:
+        doctable.ColumnArgs(serializer='msgpack', sqlalchemy_type=doctable.JSON)
+        raise Exception('Should have raised ValueError.')
+    except ValueError:
+        pass
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    test_serializers()
+    test_serialized_columns()